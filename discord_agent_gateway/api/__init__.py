@@ -1,13 +1,24 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 from fastapi import FastAPI
 
 from .. import __version__
-from ..attachments import AttachmentProxy
+from ..attachment_cache import AttachmentDiskCache
+from ..attachments import AsyncAttachmentProxy, AttachmentURLRefresher
+from ..backfill import BackfillProgress
+from ..coalesce import DownloadCoalescer
 from ..config import Settings
+from ..discord_api import AsyncDiscordAPI
 from ..db import Database
-from ..rate_limit import SlidingWindowRateLimiter
-from ..webhook import GatewayWebhookManager
+from ..ingest import IngestionWriter
+from ..notify import PostNotifier
+from ..outbox import OutboxDispatcher
+from ..rate_limit import DiscordRateLimiter, SlidingWindowRateLimiter
+from ..receipts import ReceiptStore
+from ..webhook import AsyncGatewayWebhookManager
 from .admin_routes import router as admin_router
 from .agent_routes import router as agent_router
 from .doc_routes import router as doc_router
@@ -18,10 +29,37 @@ def create_app(
     *,
     settings: Settings,
     db: Database,
-    webhooks: GatewayWebhookManager,
-    attachments: AttachmentProxy,
+    webhooks: AsyncGatewayWebhookManager,
+    attachments: AsyncAttachmentProxy,
+    notifier: Optional[PostNotifier] = None,
+    ingestion: Optional[IngestionWriter] = None,
+    backfill: Optional[BackfillProgress] = None,
+    discord_rate_limits: Optional[DiscordRateLimiter] = None,
+    discord: Optional[AsyncDiscordAPI] = None,
+    url_refresher: Optional[AttachmentURLRefresher] = None,
+    attachment_cache: Optional[AttachmentDiskCache] = None,
 ) -> FastAPI:
-    app = FastAPI(title="Discord Agent Gateway", version=__version__)
+    notifier = notifier or PostNotifier()
+    outbox = OutboxDispatcher(settings=settings, db=db, webhooks=webhooks, notifier=notifier)
+    receipts = ReceiptStore(db=db, flush_interval_seconds=settings.receipt_flush_interval_seconds)
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        outbox.start()
+        receipts.start()
+        if url_refresher is not None:
+            url_refresher.start()
+        try:
+            yield
+        finally:
+            await outbox.stop()
+            await receipts.stop()
+            if url_refresher is not None:
+                await url_refresher.stop()
+            if discord is not None:
+                await discord.aclose()
+
+    app = FastAPI(title="Discord Agent Gateway", version=__version__, lifespan=lifespan)
     app.state.gateway = GatewayState(
         settings=settings,
         db=db,
@@ -31,6 +69,15 @@ def create_app(
             max_events=settings.register_rate_limit_count,
             window_seconds=settings.register_rate_limit_window_seconds,
         ),
+        notifier=notifier,
+        outbox=outbox,
+        receipts=receipts,
+        downloads=DownloadCoalescer(),
+        ingestion=ingestion,
+        backfill=backfill,
+        discord_rate_limits=discord_rate_limits,
+        url_refresher=url_refresher,
+        attachment_cache=attachment_cache,
     )
 
     app.include_router(doc_router)
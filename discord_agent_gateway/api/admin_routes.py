@@ -55,6 +55,30 @@ def admin_config(
     }
 
 
+@router.get("/v1/admin/stats")
+def admin_stats(
+    _: None = Depends(require_admin),
+    state: GatewayState = Depends(get_gateway_state),
+) -> Dict[str, Any]:
+    return {
+        "db_pool": state.db.pool_stats(),
+        "auth_cache": state.db.auth_cache.stats(),
+        "inbox_buffer": state.db.recent_posts.stats(),
+        "ingestion": state.ingestion.stats() if state.ingestion is not None else None,
+        "backfill": state.backfill.snapshot() if state.backfill is not None else None,
+        "webhooks": state.webhooks.stats(),
+        "attachments": state.attachments.stats(),
+        "attachment_cache": state.attachment_cache.stats() if state.attachment_cache is not None else None,
+        "attachment_downloads": state.downloads.stats(),
+        "attachment_url_refresh": state.url_refresher.stats() if state.url_refresher is not None else None,
+        "outbox": {**state.outbox.stats(), "jobs": state.db.outbox_counts()},
+        "receipts": state.receipts.stats(),
+        "discord_rate_limits": (
+            state.discord_rate_limits.stats() if state.discord_rate_limits is not None else None
+        ),
+    }
+
+
 @router.get("/v1/admin/profile", response_model=ContextOut)
 def admin_get_profile(_: None = Depends(require_admin), profile=Depends(current_profile)) -> ContextOut:
     return ContextOut(name=profile.name, mission=profile.mission, updated_at=profile.updated_at)
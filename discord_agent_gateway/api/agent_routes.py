@@ -1,20 +1,42 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import StreamingResponse
-
-from ..discord_api import DiscordAPIError
-from ..models import Agent
-from ..util import credential_path, split_for_discord, utc_now_iso
-from .deps import current_profile, get_gateway_state, require_agent
-from .schemas import AckIn, AgentRegisterIn, AgentRegisterOut, ContextOut, InboxOut, PostIn, PostOut
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..db import CHANNEL_HEAD_TTL_SECONDS
+from ..discord_api import DiscordAPIError, DownloadStream
+from ..events import render_event
+from ..models import Agent, InboxFilter, InboxPage, OutboxJob
+from ..outbox import send_post_chunk
+from ..util import credential_path, json_dumps_bytes, parse_range_header, sha256_hex, split_for_discord
+from .deps import agent_token, current_profile, get_gateway_state, require_agent
+from .schemas import (
+    AckIn,
+    AgentRegisterIn,
+    AgentRegisterOut,
+    ContextOut,
+    InboxOut,
+    PostIn,
+    PostJobOut,
+    PostOut,
+)
 from .state import GatewayState
 
 
 router = APIRouter()
 
+INBOX_MAX_WAIT_SECONDS = 60.0
+STREAM_PAGE_LIMIT = 200
+STREAM_KEEPALIVE_SECONDS = 15.0
+# The notifier only sees posts written by this process; waiters re-read the inbox at least
+# this often so posts ingested by a separate bot process (`--mode bot`) are picked up.
+LONG_POLL_RECHECK_SECONDS = CHANNEL_HEAD_TTL_SECONDS
+
 
 def _safe_content_disposition_filename(filename: str) -> str:
     cleaned = filename.replace("\n", " ").replace("\r", " ").strip()
@@ -22,6 +44,26 @@ def _safe_content_disposition_filename(filename: str) -> str:
     return cleaned or "attachment"
 
 
+def _content_disposition(filename: str) -> str:
+    return f'attachment; filename="{_safe_content_disposition_filename(filename)}"'
+
+
+def _weak_etag(*parts: Any) -> str:
+    return f'W/"{sha256_hex("|".join(str(p) for p in parts))[:20]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/ prefixes are ignored on both sides.
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
 @router.post("/v1/agents/register", response_model=AgentRegisterOut)
 def register_agent(
     inp: AgentRegisterIn,
@@ -56,17 +98,37 @@ def register_agent(
 
 
 @router.get("/v1/me")
-def me(agent: Agent = Depends(require_agent), state: GatewayState = Depends(get_gateway_state)) -> Dict[str, Any]:
+def me(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    agent: Agent = Depends(require_agent),
+    state: GatewayState = Depends(get_gateway_state),
+) -> Any:
+    last_cursor = state.receipts.get(agent.agent_id)
+    etag = _weak_etag("me", agent.agent_id, agent.name, agent.avatar_url, last_cursor)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
     return {
         "agent_id": agent.agent_id,
         "name": agent.name,
         "avatar_url": agent.avatar_url,
-        "last_cursor": state.db.receipt_get(agent.agent_id),
+        "last_cursor": last_cursor,
     }
 
 
 @router.get("/v1/context", response_model=ContextOut)
-def context(_: Agent = Depends(require_agent), profile=Depends(current_profile)) -> ContextOut:
+def context(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    _: Agent = Depends(require_agent),
+    profile=Depends(current_profile),
+) -> Any:
+    # updated_at only moves on admin edits; name/mission can also come from env or Discord metadata.
+    etag = _weak_etag("context", profile.updated_at, profile.name, profile.mission)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
     return ContextOut(name=profile.name, mission=profile.mission, updated_at=profile.updated_at)
 
 
@@ -89,6 +151,16 @@ def capabilities(_: Agent = Depends(require_agent), state: GatewayState = Depend
             "supported": True,
             "inbox_field": "source_channel_id",
         },
+        "async_post": {
+            "supported": True,
+            "endpoint": "/v1/post?async=true",
+            "status_endpoint": "/v1/post/{job_id}",
+        },
+        "stream": {
+            "supported": True,
+            "endpoint": "/v1/stream",
+            "format": "text/event-stream",
+        },
         "context": {
             "supported": True,
             "endpoint": "/v1/context",
@@ -97,111 +169,404 @@ def capabilities(_: Agent = Depends(require_agent), state: GatewayState = Depend
     }
 
 
+def _inbox_page(
+    *,
+    state: GatewayState,
+    agent: Agent,
+    cursor: int,
+    limit: int,
+    inbox_filter: Optional[InboxFilter] = None,
+) -> InboxPage:
+    channel_id = str(state.settings.discord_channel_id)
+    head_seq = state.db.channel_head(channel_id)
+    if cursor >= head_seq:
+        # Caught up (the common case): no SQLite work at all.
+        return InboxPage(cursor=cursor, next_cursor=cursor, head_seq=head_seq, has_more=False, events=[])
+    # Read before the posts: a rewrite racing this read then changes the next ETag.
+    revision = state.db.channel_revision(channel_id)
+
+    # One extra row tells us whether another page is waiting.
+    entries = state.db.recent_posts.read(
+        channel_id, cursor=cursor, limit=limit + 1, head_seq=head_seq, inbox_filter=inbox_filter
+    )
+    if entries is None:
+        posts = state.db.inbox_fetch(channel_id, cursor, limit + 1, inbox_filter)
+        # Posts carry their serialized event; only rows written before that need attachments.
+        attachments_map = state.db.attachments_for_posts([p.seq for p in posts if p.event_json is None])
+        entries = [(post, tuple(attachments_map.get(post.seq, ()))) for post in posts]
+    has_more = len(entries) > limit
+    next_cursor = cursor
+    events: List[tuple[int, bytes]] = []
+
+    for post, attachments in entries[:limit]:
+        next_cursor = max(next_cursor, post.seq)
+        is_self = post.author_kind == "agent" and post.author_id == agent.agent_id
+        events.append(
+            (post.seq, render_event(post, attachments, is_self=is_self, base_url=state.settings.gateway_base_url))
+        )
+
+    if not has_more:
+        # Everything up to the head has been scanned; skipping filtered-out posts here
+        # means the next poll does not rescan them.
+        next_cursor = max(next_cursor, head_seq)
+
+    return InboxPage(
+        cursor=cursor,
+        next_cursor=next_cursor,
+        head_seq=max(head_seq, next_cursor),
+        has_more=has_more,
+        events=events,
+        revision=revision,
+    )
+
+
+def _inbox_etag(*, agent: Agent, page: InboxPage, limit: int, inbox_filter: InboxFilter) -> str:
+    # A page is fully determined by where it starts, how far the channel goes, its size and
+    # filters, and the channel's rewrite revision (posts claimed by agents, attachments added).
+    return _weak_etag(
+        "inbox",
+        agent.agent_id,
+        page.cursor,
+        page.head_seq,
+        page.revision,
+        limit,
+        inbox_filter.source_channel_id,
+        inbox_filter.author_kinds,
+        inbox_filter.exclude_agent_id,
+    )
+
+
+AUTHOR_KINDS = ("agent", "human", "bot", "webhook")
+
+
+def _inbox_filter(
+    *,
+    agent: Agent,
+    source_channel_id: Optional[str],
+    author_kind: Optional[List[str]],
+    exclude_self: bool,
+    humans_only: bool,
+) -> InboxFilter:
+    kinds: Optional[set[str]] = None
+    if author_kind:
+        kinds = {kind.strip() for value in author_kind for kind in value.split(",") if kind.strip()}
+        unknown = kinds - set(AUTHOR_KINDS)
+        if unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown author_kind: {', '.join(sorted(unknown))} (expected one of {', '.join(AUTHOR_KINDS)})",
+            )
+    if humans_only:
+        kinds = {"human"} if kinds is None else kinds & {"human"}
+    return InboxFilter(
+        source_channel_id=(source_channel_id or "").strip() or None,
+        author_kinds=tuple(sorted(kinds)) if kinds is not None else None,
+        exclude_agent_id=agent.agent_id if exclude_self else None,
+    )
+
+
 @router.get("/v1/inbox", response_model=InboxOut)
-def inbox(
+async def inbox(
     cursor: Optional[int] = Query(None, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    wait: float = Query(0, ge=0, le=INBOX_MAX_WAIT_SECONDS),
+    source_channel_id: Optional[str] = Query(None, max_length=32),
+    author_kind: Optional[List[str]] = Query(None),
+    exclude_self: bool = Query(False),
+    humans_only: bool = Query(False),
+    ack_previous: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
     agent: Agent = Depends(require_agent),
     state: GatewayState = Depends(get_gateway_state),
-) -> InboxOut:
-    if cursor is None:
-        cursor = state.db.receipt_get(agent.agent_id)
+) -> Any:
+    inbox_filter = _inbox_filter(
+        agent=agent,
+        source_channel_id=source_channel_id,
+        author_kind=author_kind,
+        exclude_self=exclude_self,
+        humans_only=humans_only,
+    )
+    if ack_previous is not None:
+        # Ack the batch the agent just processed and continue from it in the same round trip.
+        await run_in_threadpool(state.receipts.advance, agent.agent_id, ack_previous)
+        if cursor is None:
+            cursor = ack_previous
+    elif cursor is None:
+        cursor = await run_in_threadpool(state.receipts.get, agent.agent_id)
+
+    async def read_page() -> InboxPage:
+        return await run_in_threadpool(
+            _inbox_page, state=state, agent=agent, cursor=cursor, limit=limit, inbox_filter=inbox_filter
+        )
 
-    posts = state.db.inbox_fetch(str(state.settings.discord_channel_id), cursor, limit)
-    post_seqs = [p.seq for p in posts]
-    attachments_map = state.db.attachments_for_posts(post_seqs)
-    next_cursor = cursor
-    events: List[Dict[str, Any]] = []
+    page = await read_page()
+    if not page.events and wait > 0:
+        # Long-poll: park until a newer post is announced (or the recheck interval passes),
+        # then read again. With filters a new post may not match, so keep going until the
+        # deadline; the last read happens after the final wait.
+        deadline = time.monotonic() + wait
+        while not page.events:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await state.notifier.wait_for(page.next_cursor, timeout=min(remaining, LONG_POLL_RECHECK_SECONDS))
+            page = await read_page()
+
+    etag = _inbox_etag(agent=agent, page=page, limit=limit, inbox_filter=inbox_filter)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return _inbox_response(page, etag=etag)
+
+
+def _inbox_response(page: InboxPage, *, etag: str) -> Response:
+    # Events are already encoded, so the body is assembled by concatenation instead of
+    # FastAPI re-validating and re-encoding them through `response_model` (kept on the
+    # route for the OpenAPI schema).
+    head = json_dumps_bytes(
+        {
+            "cursor": page.cursor,
+            "next_cursor": page.next_cursor,
+            "head_seq": page.head_seq,
+            "has_more": page.has_more,
+        }
+    )
+    body = b"".join((head[:-1], b',"events":[', b",".join(event for _, event in page.events), b"]}"))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def _sse_frame(seq: int, event: bytes) -> str:
+    return f"id: {seq}\nevent: post\ndata: {event.decode('utf-8')}\n\n"
+
+
+async def _stream_events(
+    *,
+    state: GatewayState,
+    agent: Agent,
+    token: str,
+    cursor: int,
+    auto_ack: bool,
+) -> AsyncIterator[str]:
+    yield f"retry: {int(STREAM_KEEPALIVE_SECONDS * 1000)}\n\n"
+    last_sent = time.monotonic()
+    while True:
+        # Re-check the token on every wakeup (auth cache): a revoked or rotated agent's
+        # stream ends, and the client's reconnect gets 401.
+        if await run_in_threadpool(state.db.agent_by_token, token) is None:
+            return
+        page = await run_in_threadpool(
+            _inbox_page, state=state, agent=agent, cursor=cursor, limit=STREAM_PAGE_LIMIT
+        )
+        if page.events:
+            for seq, event in page.events:
+                yield _sse_frame(seq, event)
+            cursor = page.next_cursor
+            last_sent = time.monotonic()
+            if auto_ack:
+                await run_in_threadpool(state.receipts.advance, agent.agent_id, cursor)
+            continue
+
+        await state.notifier.wait_for(cursor, timeout=LONG_POLL_RECHECK_SECONDS)
+        if time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+
+
+@router.get("/v1/stream")
+async def stream(
+    cursor: Optional[int] = Query(None, ge=0),
+    auto_ack: bool = Query(False),
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+    agent: Agent = Depends(require_agent),
+    token: str = Depends(agent_token),
+    state: GatewayState = Depends(get_gateway_state),
+) -> StreamingResponse:
+    # Resume order: Last-Event-ID (EventSource reconnect) → explicit cursor → stored receipt.
+    if last_event_id and last_event_id.strip().isdigit():
+        cursor = int(last_event_id.strip())
+    elif cursor is None:
+        cursor = await run_in_threadpool(state.receipts.get, agent.agent_id)
 
-    for post in posts:
-        next_cursor = max(next_cursor, post.seq)
+    return StreamingResponse(
+        _stream_events(state=state, agent=agent, token=token, cursor=cursor, auto_ack=auto_ack),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        is_self = post.author_kind == "agent" and post.author_id == agent.agent_id
-        is_human = post.author_kind == "human"
-
-        atts = []
-        for att in attachments_map.get(post.seq, []):
-            atts.append(
-                {
-                    "attachment_id": att.attachment_id,
-                    "filename": att.filename,
-                    "content_type": att.content_type,
-                    "size_bytes": att.size_bytes,
-                    "height": att.height,
-                    "width": att.width,
-                    "download_url": f"{state.settings.gateway_base_url}/v1/attachments/{att.attachment_id}",
-                }
-            )
 
-        events.append(
-            {
-                "seq": post.seq,
-                "author_kind": post.author_kind,
-                "author_id": post.author_id,
-                "author_name": post.author_name,
-                "is_self": is_self,
-                "is_human": is_human,
-                "body": post.body,
-                "source_channel_id": post.source_channel_id,
-                "created_at": post.created_at,
-                "discord_message_id": post.discord_message_id,
-                "attachments": atts,
-            }
-        )
+def _attachment_etag(attachment_id: str, size: Optional[int]) -> str:
+    # Attachment ids are immutable on Discord, so id + size identifies the body.
+    return f'"{attachment_id}-{size}"' if size is not None else f'"{attachment_id}"'
+
 
-    return InboxOut(cursor=cursor, next_cursor=next_cursor, events=events)
+def _range_not_satisfiable(size: int) -> Response:
+    return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"})
 
 
 @router.get("/v1/attachments/{attachment_id}")
-def download_attachment(
+async def download_attachment(
     attachment_id: str,
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
     _: Agent = Depends(require_agent),
     state: GatewayState = Depends(get_gateway_state),
 ):
-    resolved = state.attachments.resolve(attachment_id)
+    cache = state.attachment_cache
+    if cache is not None:
+        cached_path = await run_in_threadpool(cache.lookup, attachment_id)
+        if cached_path is not None:
+            attachment = await run_in_threadpool(state.db.attachment_get, attachment_id)
+            stat_result = None
+            if attachment is not None:
+                try:
+                    stat_result = await run_in_threadpool(os.stat, cached_path)
+                except FileNotFoundError:
+                    pass  # evicted since the lookup: serve it from Discord instead
+            if attachment is not None and stat_result is not None:
+                size = stat_result.st_size
+                etag = _attachment_etag(attachment_id, size)
+                if _etag_matches(if_none_match, etag):
+                    return Response(status_code=304, headers={"ETag": etag, "Accept-Ranges": "bytes"})
+                try:
+                    byte_range = parse_range_header(range_header, size)
+                except ValueError:
+                    return _range_not_satisfiable(size)
+                cache.record_served(byte_range[1] - byte_range[0] + 1 if byte_range else size)
+                # FileResponse serves Range requests itself and lets the server use sendfile.
+                return FileResponse(
+                    cached_path,
+                    stat_result=stat_result,
+                    media_type=attachment.content_type or "application/octet-stream",
+                    headers={
+                        "Content-Disposition": _content_disposition(attachment.filename),
+                        "ETag": etag,
+                        "Accept-Ranges": "bytes",
+                    },
+                )
+
+    resolved = await state.attachments.resolve(attachment_id)
     if resolved is None:
         raise HTTPException(status_code=404, detail="Attachment not found")
 
+    etag = _attachment_etag(attachment_id, resolved.size_bytes)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Accept-Ranges": "bytes"})
+
+    upstream_range: Optional[str] = None
+    if range_header and resolved.size_bytes is not None:
+        try:
+            byte_range = parse_range_header(range_header, resolved.size_bytes)
+        except ValueError:
+            return _range_not_satisfiable(resolved.size_bytes)
+        if byte_range is not None:
+            upstream_range = f"bytes={byte_range[0]}-{byte_range[1]}"
+    elif range_header:
+        # Size unknown locally: let the CDN interpret the range.
+        upstream_range = range_header
+
     headers = {
-        "Content-Disposition": f'attachment; filename="{_safe_content_disposition_filename(resolved.filename)}"',
+        "Content-Disposition": _content_disposition(resolved.filename),
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
     }
-    if resolved.size_bytes is not None:
-        headers["Content-Length"] = str(resolved.size_bytes)
 
-    return StreamingResponse(
-        state.attachments.iter_download(resolved.url),
-        media_type=resolved.content_type,
-        headers=headers,
-    )
+    async def start_full_download() -> DownloadStream:
+        download = await state.attachments.open_download(resolved.url)
+        if cache is not None:
+            # Only complete bodies are written to the local cache.
+            download.chunks = cache.tee(attachment_id, download.chunks)
+        return download
+
+    try:
+        if upstream_range is not None:
+            # Partial reads are cheap and client-specific; they bypass the shared fetch.
+            download = await state.attachments.open_download(resolved.url, byte_range=upstream_range)
+            if download.status_code == 206:
+                if download.content_range:
+                    headers["Content-Range"] = download.content_range
+                if download.content_length is not None:
+                    headers["Content-Length"] = str(download.content_length)
+                return StreamingResponse(
+                    download.chunks, status_code=206, media_type=resolved.content_type, headers=headers
+                )
+            content_length, chunks = download.content_length, download.chunks
+        else:
+            # Concurrent requests for the same attachment share one upstream stream.
+            shared = await state.downloads.open(attachment_id, start_full_download)
+            content_length, chunks = shared.content_length, shared.chunks
+    except DiscordAPIError as exc:
+        if exc.status_code == 416 and resolved.size_bytes is not None:
+            return _range_not_satisfiable(resolved.size_bytes)
+        raise HTTPException(status_code=502, detail={"discord_status": exc.status_code}) from exc
+
+    length = content_length if content_length is not None else resolved.size_bytes
+    if length is not None:
+        headers["Content-Length"] = str(length)
+    return StreamingResponse(chunks, media_type=resolved.content_type, headers=headers)
 
 
 @router.post("/v1/ack")
 def ack(inp: AckIn, agent: Agent = Depends(require_agent), state: GatewayState = Depends(get_gateway_state)) -> Dict[str, Any]:
-    state.db.receipt_set(agent.agent_id, int(inp.cursor))
-    return {"ok": True, "cursor": int(inp.cursor)}
+    # Cursors only move forward; a stale ack is a no-op and reports the stored cursor.
+    cursor = state.receipts.advance(agent.agent_id, int(inp.cursor))
+    return {"ok": True, "cursor": cursor}
+
+
+def _post_job_out(job: OutboxJob) -> PostJobOut:
+    return PostJobOut(
+        job_id=job.job_id,
+        status=job.status,
+        chunks_total=job.chunks_total,
+        chunks_sent=job.chunks_sent,
+        attempts=job.attempts,
+        last_seq=job.last_seq,
+        last_discord_message_id=job.last_discord_message_id,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
 
 
-@router.post("/v1/post", response_model=PostOut)
-def post(inp: PostIn, agent: Agent = Depends(require_agent), state: GatewayState = Depends(get_gateway_state)) -> PostOut:
+@router.post("/v1/post", response_model=Union[PostOut, PostJobOut])
+async def post(
+    inp: PostIn,
+    response: Response,
+    async_delivery: bool = Query(False, alias="async"),
+    agent: Agent = Depends(require_agent),
+    state: GatewayState = Depends(get_gateway_state),
+) -> Union[PostOut, PostJobOut]:
+    chunks = split_for_discord(inp.body, max_len=state.settings.discord_max_message_len)
+
+    if async_delivery:
+        job = await run_in_threadpool(
+            state.db.outbox_enqueue,
+            agent_id=agent.agent_id,
+            body=inp.body,
+            chunks_total=len(chunks),
+        )
+        state.outbox.wake()
+        response.status_code = 202
+        return _post_job_out(job)
+
     try:
-        state.webhooks.get_or_create()
+        await state.webhooks.get_or_create()
     except DiscordAPIError as exc:
         raise HTTPException(
             status_code=502,
             detail={"discord_status": exc.status_code, "discord_error": exc.detail},
         ) from exc
 
-    chunks = split_for_discord(inp.body, max_len=state.settings.discord_max_message_len)
     last_seq: Optional[int] = None
     last_msg_id: Optional[str] = None
 
     for chunk in chunks:
         try:
-            resp = state.webhooks.execute(
-                content=chunk,
-                username=agent.name,
-                avatar_url=agent.avatar_url,
-                wait=True,
+            seq, msg_id = await send_post_chunk(
+                settings=state.settings,
+                db=state.db,
+                webhooks=state.webhooks,
+                notifier=state.notifier,
+                agent=agent,
+                chunk=chunk,
             )
         except DiscordAPIError as exc:
             raise HTTPException(
@@ -209,27 +574,20 @@ def post(inp: PostIn, agent: Agent = Depends(require_agent), state: GatewayState
                 detail={"discord_status": exc.status_code, "discord_error": exc.detail},
             ) from exc
 
-        msg_id = str(resp.get("id") or "") or None
         last_msg_id = msg_id or last_msg_id
-
-        seq = state.db.post_insert(
-            author_kind="agent",
-            author_id=agent.agent_id,
-            author_name=agent.name,
-            body=chunk,
-            created_at=utc_now_iso(),
-            discord_message_id=msg_id,
-            discord_channel_id=str(state.settings.discord_channel_id),
-            source_channel_id=str(state.settings.discord_channel_id),
-        )
-        if seq is None and msg_id:
-            seq = state.db.post_mark_as_agent_by_discord_message_id(
-                discord_message_id=msg_id,
-                discord_channel_id=str(state.settings.discord_channel_id),
-                agent_id=agent.agent_id,
-                agent_name=agent.name,
-            )
         if seq is not None:
             last_seq = seq
 
     return PostOut(last_seq=last_seq, last_discord_message_id=last_msg_id)
+
+
+@router.get("/v1/post/{job_id}", response_model=PostJobOut)
+def post_job_status(
+    job_id: str,
+    agent: Agent = Depends(require_agent),
+    state: GatewayState = Depends(get_gateway_state),
+) -> PostJobOut:
+    job = state.db.outbox_get(job_id)
+    if job is None or job.agent_id != agent.agent_id:
+        raise HTTPException(status_code=404, detail="Post job not found")
+    return _post_job_out(job)
@@ -21,13 +21,17 @@ def get_gateway_state(request: Request) -> GatewayState:
     return request.app.state.gateway
 
 
-def require_agent(
-    authorization: Optional[str] = Header(default=None),
-    state: GatewayState = Depends(get_gateway_state),
-) -> Agent:
+def agent_token(authorization: Optional[str] = Header(default=None)) -> str:
     token = _extract_bearer_token(authorization)
     if not token:
         raise HTTPException(status_code=401, detail="Missing Authorization: Bearer <token>")
+    return token
+
+
+def require_agent(
+    token: str = Depends(agent_token),
+    state: GatewayState = Depends(get_gateway_state),
+) -> Agent:
     agent = state.db.agent_by_token(token)
     if not agent:
         raise HTTPException(status_code=401, detail="Invalid token")
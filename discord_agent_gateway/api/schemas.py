@@ -29,9 +29,24 @@ class PostOut(BaseModel):
     last_discord_message_id: Optional[str]
 
 
+class PostJobOut(BaseModel):
+    job_id: str
+    status: str
+    chunks_total: int
+    chunks_sent: int
+    attempts: int
+    last_seq: Optional[int]
+    last_discord_message_id: Optional[str]
+    error: Optional[str]
+    created_at: str
+    updated_at: str
+
+
 class InboxOut(BaseModel):
     cursor: int
     next_cursor: int
+    head_seq: int
+    has_more: bool
     events: List[Dict[str, Any]]
 
 
@@ -3,15 +3,24 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Optional, Protocol
 
+from ..attachment_cache import AttachmentDiskCache
+from ..attachments import AttachmentURLRefresher
+from ..backfill import BackfillProgress
+from ..coalesce import DownloadCoalescer
 from ..config import Settings
 from ..db import Database
-from ..rate_limit import SlidingWindowRateLimiter
+from ..discord_api import DownloadStream
+from ..ingest import IngestionWriter
+from ..notify import PostNotifier
+from ..outbox import OutboxDispatcher
+from ..rate_limit import DiscordRateLimiter, SlidingWindowRateLimiter
+from ..receipts import ReceiptStore
 
 
 class WebhookManagerProtocol(Protocol):
-    def get_or_create(self) -> Any: ...
+    async def get_or_create(self) -> Any: ...
 
-    def execute(
+    async def execute(
         self,
         *,
         content: str,
@@ -20,11 +29,15 @@ class WebhookManagerProtocol(Protocol):
         wait: bool = True,
     ) -> dict[str, Any]: ...
 
+    def stats(self) -> dict[str, Any]: ...
+
 
 class AttachmentProxyProtocol(Protocol):
-    def resolve(self, attachment_id: str) -> Any: ...
+    async def resolve(self, attachment_id: str) -> Any: ...
+
+    async def open_download(self, url: str, *, byte_range: Optional[str] = None) -> DownloadStream: ...
 
-    def iter_download(self, url: str): ...
+    def stats(self) -> dict[str, Any]: ...
 
 
 @dataclass(frozen=True)
@@ -34,3 +47,12 @@ class GatewayState:
     webhooks: WebhookManagerProtocol
     attachments: AttachmentProxyProtocol
     register_rate_limiter: SlidingWindowRateLimiter
+    notifier: PostNotifier
+    outbox: OutboxDispatcher
+    receipts: ReceiptStore
+    downloads: DownloadCoalescer
+    ingestion: Optional[IngestionWriter] = None
+    backfill: Optional[BackfillProgress] = None
+    discord_rate_limits: Optional[DiscordRateLimiter] = None
+    url_refresher: Optional[AttachmentURLRefresher] = None
+    attachment_cache: Optional[AttachmentDiskCache] = None
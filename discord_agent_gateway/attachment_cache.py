@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Optional
+
+from .util import sha256_hex
+
+
+logger = logging.getLogger("discord_agent_gateway.attachment_cache")
+
+
+class AttachmentDiskCache:
+    """
+    Byte-budgeted on-disk LRU of attachment bodies, keyed by attachment id.
+
+    Files live under `directory` named by the SHA-256 of the attachment id. Upstream
+    downloads are written through `tee()` into a temp file and only become visible once
+    the whole body has been received, so a cached file is always complete. When the
+    total size exceeds `max_bytes`, least recently served files are deleted. The index
+    is rebuilt from the directory on start (file mtime approximates recency; hits touch
+    the file).
+    """
+
+    def __init__(self, *, directory: Path, max_bytes: int):
+        self._directory = Path(directory)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._bytes_from_cache = 0
+        self._bytes_from_upstream = 0
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def _load_index(self) -> None:
+        files = []
+        for entry in os.scandir(self._directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                # Leftover from an interrupted download.
+                os.unlink(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict_locked()
+
+    def _path(self, key: str) -> Path:
+        return self._directory / key
+
+    def lookup(self, attachment_id: str) -> Optional[Path]:
+        """
+        Path of a cached body (counts a hit and marks it recently used), or None.
+
+        Touches the file, so async callers run it in a thread.
+        """
+        key = sha256_hex(attachment_id)
+        with self._lock:
+            size = self._entries.get(key)
+            if size is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._drop_locked(key)
+            return None
+        return path
+
+    def record_served(self, nbytes: int) -> None:
+        """Count bytes sent to a client from a cached file (full body or range)."""
+        with self._lock:
+            self._bytes_from_cache += nbytes
+
+    async def tee(self, attachment_id: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Yield `chunks` unchanged while writing them into the cache (off the event loop).
+
+        The file is committed only if the upstream stream finishes; a client disconnect,
+        an upstream error or a body larger than the whole budget discards it.
+        """
+        key = sha256_hex(attachment_id)
+        fd, tmp_name = await asyncio.to_thread(tempfile.mkstemp, dir=self._directory, prefix=f"{key}.", suffix=".part")
+        tmp = os.fdopen(fd, "wb")
+        written = 0
+        caching = True
+        completed = False
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if caching and written > self._max_bytes:
+                    caching = False
+                if caching:
+                    await asyncio.to_thread(tmp.write, chunk)
+                yield chunk
+            completed = True
+        finally:
+            # Shielded so a cancelled request still closes and commits or removes the file.
+            await asyncio.shield(asyncio.to_thread(self._finish, key, tmp, tmp_name, written, completed and caching))
+
+    def _finish(self, key: str, tmp: BinaryIO, tmp_name: str, written: int, keep: bool) -> None:
+        tmp.close()
+        with self._lock:
+            self._bytes_from_upstream += written
+        if keep:
+            self._commit(key, tmp_name, written)
+        else:
+            os.unlink(tmp_name)
+
+    def _commit(self, key: str, tmp_name: str, size: int) -> None:
+        try:
+            os.replace(tmp_name, self._path(key))
+        except OSError:
+            logger.exception("Failed to store attachment in cache")
+            os.unlink(tmp_name)
+            return
+        with self._lock:
+            self._drop_locked(key, delete=False)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._stores += 1
+            self._evict_locked()
+
+    def _drop_locked(self, key: str, *, delete: bool = True) -> None:
+        size = self._entries.pop(key, None)
+        if size is None:
+            return
+        self._total_bytes -= size
+        if delete:
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self._max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._drop_locked(key)
+            self._evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "bytes_served_from_cache": self._bytes_from_cache,
+                "bytes_served_from_upstream": self._bytes_from_upstream,
+            }
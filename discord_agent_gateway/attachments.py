@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Optional
 from urllib.parse import urlparse
 
 from .db import Database
-from .discord_api import DiscordAPI
+from .discord_api import AsyncDiscordAPI, DiscordAPIError, DownloadStream
 from .models import Attachment
+from .util import cdn_url_expires_at
 
 
+logger = logging.getLogger("discord_agent_gateway.attachments")
+
 ALLOWED_DISCORD_CDN_HOSTS = {
     "cdn.discordapp.com",
     "media.discordapp.net",
@@ -23,62 +32,336 @@ class ResolvedDownload:
     url: str
 
 
-class AttachmentProxy:
-    def __init__(self, *, db: Database, discord: DiscordAPI):
+def validate_cdn_url(url: str) -> str:
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme != "https":
+        raise ValueError("Attachment download URL must be https.")
+    if host not in ALLOWED_DISCORD_CDN_HOSTS:
+        raise ValueError(f"Refusing to proxy non-Discord host: {host}")
+    return url
+
+
+# Signed URLs are treated as expired this long before Discord's `ex`, so a download
+# that starts with a cached URL does not run into the expiry.
+URL_EXPIRY_MARGIN_SECONDS = 300
+URL_CACHE_MAX_ENTRIES = 4096
+
+
+def _urls_from_message(msg: dict[str, Any], attachment_id: str) -> tuple[Optional[str], Optional[str]]:
+    for att in msg.get("attachments", []) or []:
+        if str(att.get("id")) == attachment_id:
+            return (att.get("url") or None), (att.get("proxy_url") or None)
+    return None, None
+
+
+def _stored_url(attachment: Attachment) -> Optional[str]:
+    for candidate in (attachment.url, attachment.proxy_url):
+        if candidate:
+            try:
+                return validate_cdn_url(str(candidate))
+            except ValueError:
+                continue
+    return None
+
+
+def _unexpired(url: Optional[str], *, now: float) -> bool:
+    expires_at = cdn_url_expires_at(url)
+    return expires_at is not None and expires_at - URL_EXPIRY_MARGIN_SECONDS > now
+
+
+def _resolved_download(attachment: Attachment, url: Optional[str]) -> Optional[ResolvedDownload]:
+    if url is None:
+        return None
+    return ResolvedDownload(
+        filename=attachment.filename,
+        content_type=attachment.content_type or "application/octet-stream",
+        size_bytes=attachment.size_bytes,
+        url=url,
+    )
+
+
+class AttachmentURLCache:
+    """
+    Bounded LRU of signed CDN URLs by attachment id, honouring each URL's `ex` expiry.
+
+    Lets repeat downloads skip both the SQLite read of the URL and the Discord API lookup.
+    """
+
+    def __init__(self, *, max_entries: int = URL_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, attachment_id: str) -> Optional[str]:
+        with self._lock:
+            url = self._entries.get(attachment_id)
+            if url is None:
+                return None
+            if not _unexpired(url, now=time.time()):
+                del self._entries[attachment_id]
+                return None
+            self._entries.move_to_end(attachment_id)
+            return url
+
+    def put(self, attachment_id: str, url: str) -> None:
+        if not _unexpired(url, now=time.time()):
+            return
+        with self._lock:
+            self._entries[attachment_id] = url
+            self._entries.move_to_end(attachment_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class AsyncAttachmentProxy:
+    """Resolves attachment downloads for async routes: Discord lookups and downloads never block a worker thread."""
+
+    def __init__(self, *, db: Database, discord: AsyncDiscordAPI, url_cache: Optional[AttachmentURLCache] = None):
         self._db = db
         self._discord = discord
+        self._resolving: dict[str, asyncio.Task[Optional[ResolvedDownload]]] = {}
+        self._url_cache = url_cache or AttachmentURLCache()
+        self._stats_lock = threading.Lock()
+        self._url_memory_hits = 0
+        self._url_db_hits = 0
+        self._url_refreshes = 0
+        self._url_refresh_failures = 0
+        self._resolves_coalesced = 0
 
-    def resolve(self, attachment_id: str) -> Optional[ResolvedDownload]:
-        attachment = self._db.attachment_get(attachment_id)
-        if attachment is None:
-            return None
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _unexpired_url(self, attachment: Attachment) -> Optional[str]:
+        """A still-valid signed URL from memory or the stored row, without calling Discord."""
+        cached = self._url_cache.get(attachment.attachment_id)
+        if cached is not None:
+            self._count("_url_memory_hits")
+            return cached
+
+        now = time.time()
+        for candidate in (attachment.url, attachment.proxy_url):
+            if not candidate or not _unexpired(candidate, now=now):
+                continue
+            try:
+                url = validate_cdn_url(candidate)
+            except ValueError:
+                continue
+            self._url_cache.put(attachment.attachment_id, url)
+            self._count("_url_db_hits")
+            return url
+        return None
 
-        url = self._resolve_url(attachment)
-        if url is None:
+    def _refreshed_url(self, attachment: Attachment, msg: dict[str, Any]) -> tuple[Optional[str], Optional[str], Optional[str]]:
+        """Pick the download URL from a fetched message; returns (download_url, url, proxy_url)."""
+        url, proxy_url = _urls_from_message(msg, attachment.attachment_id)
+        candidate = url or proxy_url
+        if not candidate:
+            return None, None, None
+        download_url = validate_cdn_url(str(candidate))
+        self._url_cache.put(attachment.attachment_id, download_url)
+        self._count("_url_refreshes")
+        return download_url, url, proxy_url
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "url_cache_entries": len(self._url_cache),
+                "url_memory_hits": self._url_memory_hits,
+                "url_db_hits": self._url_db_hits,
+                "url_refreshes": self._url_refreshes,
+                "url_refresh_failures": self._url_refresh_failures,
+                "resolves_coalesced": self._resolves_coalesced,
+            }
+
+    async def resolve(self, attachment_id: str) -> Optional[ResolvedDownload]:
+        """Resolve a download; concurrent calls for the same id share one lookup."""
+        task = self._resolving.get(attachment_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._resolve(attachment_id))
+            self._resolving[attachment_id] = task
+            task.add_done_callback(lambda _t: self._resolving.pop(attachment_id, None))
+        else:
+            self._count("_resolves_coalesced")
+        # Shielded so one caller disconnecting does not cancel the lookup for the others.
+        return await asyncio.shield(task)
+
+    async def _resolve(self, attachment_id: str) -> Optional[ResolvedDownload]:
+        attachment = await asyncio.to_thread(self._db.attachment_get, attachment_id)
+        if attachment is None:
             return None
+        return _resolved_download(attachment, await self._resolve_url(attachment))
 
-        content_type = attachment.content_type or "application/octet-stream"
-        return ResolvedDownload(
-            filename=attachment.filename,
-            content_type=content_type,
-            size_bytes=attachment.size_bytes,
-            url=url,
-        )
+    async def _resolve_url(self, attachment: Attachment) -> Optional[str]:
+        url = self._unexpired_url(attachment)
+        if url is not None:
+            return url
 
-    def _resolve_url(self, attachment: Attachment) -> Optional[str]:
-        # Prefer fresh URLs from the Discord API (some CDN URLs are time-limited).
         try:
-            msg = self._discord.get_channel_message(
+            msg = await self._discord.get_channel_message(
                 channel_id=int(attachment.source_channel_id),
                 message_id=int(attachment.discord_message_id),
             )
-            for att in msg.get("attachments", []) or []:
-                if str(att.get("id")) != attachment.attachment_id:
-                    continue
-                url = att.get("url") or att.get("proxy_url")
-                if url:
-                    return self._validate_cdn_url(str(url))
+            download_url, fresh_url, fresh_proxy_url = self._refreshed_url(attachment, msg)
+            if download_url:
+                await asyncio.to_thread(
+                    self._db.attachment_update_urls,
+                    attachment.attachment_id,
+                    url=fresh_url,
+                    proxy_url=fresh_proxy_url,
+                )
+                return download_url
         except Exception:
-            # Fallback to the stored URLs below.
+            self._count("_url_refresh_failures")
+        return _stored_url(attachment)
+
+    async def open_download(self, url: str, *, byte_range: Optional[str] = None) -> DownloadStream:
+        return await self._discord.open_download(url, byte_range=byte_range)
+
+
+# Discord's refresh-urls endpoint accepts at most 50 URLs per call.
+URL_REFRESH_BATCH_SIZE = 50
+
+
+class AttachmentURLRefresher:
+    """
+    Background re-signing of attachment URLs before they expire.
+
+    Every `interval_seconds` it selects attachments on recent posts (newer than
+    `max_post_age_seconds`) whose signed URL expires within `refresh_ahead_seconds`,
+    re-signs them in batches of 50 via `POST /attachments/refresh-urls`, and stores each
+    batch in one transaction. Downloads then find a valid URL locally instead of calling
+    Discord on the request path. Older posts are left to the lazy per-download refresh,
+    as are URLs Discord would not re-sign (dropped from the background refresh, including
+    whole batches it rejects with a non-retryable 4xx).
+    """
+
+    def __init__(
+        self,
+        *,
+        db: Database,
+        discord: AsyncDiscordAPI,
+        url_cache: AttachmentURLCache,
+        interval_seconds: float,
+        refresh_ahead_seconds: float,
+        max_post_age_seconds: float,
+    ):
+        self._db = db
+        self._discord = discord
+        self._url_cache = url_cache
+        self._interval_seconds = interval_seconds
+        self._refresh_ahead_seconds = refresh_ahead_seconds
+        self._max_post_age_seconds = max_post_age_seconds
+        self._task: Optional[asyncio.Task[None]] = None
+
+        self._stats_lock = threading.Lock()
+        self._runs = 0
+        self._batches = 0
+        self._refreshed = 0
+        self._unrefreshable = 0
+        self._errors = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="attachment-url-refresher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
             pass
+        self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "running": self._task is not None and not self._task.done(),
+                "runs": self._runs,
+                "batches": self._batches,
+                "urls_refreshed": self._refreshed,
+                "urls_unrefreshable": self._unrefreshable,
+                "errors": self._errors,
+            }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Attachment URL refresh failed")
+                with self._stats_lock:
+                    self._errors += 1
+            await asyncio.sleep(self._interval_seconds)
+
+    async def refresh_once(self) -> int:
+        """Refresh everything currently due; returns the number of URLs re-signed."""
+        now = time.time()
+        expires_before = int(now + self._refresh_ahead_seconds)
+        posted_after = datetime.fromtimestamp(now - self._max_post_age_seconds, tz=timezone.utc).isoformat()
+        refreshed_total = 0
+        after: Optional[tuple[int, str]] = None
+
+        while True:
+            due = await asyncio.to_thread(
+                self._db.attachments_expiring,
+                expires_before=expires_before,
+                posted_after=posted_after,
+                limit=URL_REFRESH_BATCH_SIZE,
+                after=after,
+            )
+            if not due:
+                break
+            last_attachment_id, _, last_expires_at = due[-1]
+            after = (last_expires_at, last_attachment_id)
+
+            try:
+                refreshed = await self._discord.refresh_attachment_urls([url for _, url, _ in due])
+            except DiscordAPIError as exc:
+                if not (400 <= exc.status_code < 500) or exc.status_code == 429:
+                    raise
+                # Rejected as a whole: resending the same batch every tick would fail the same way.
+                logger.warning(
+                    "Discord refused to re-sign %s attachment URLs (status %s); leaving them to download-time refresh",
+                    len(due),
+                    exc.status_code,
+                )
+                refreshed = {}
+            by_path = {_url_path(original): new for original, new in refreshed.items()}
+            updates: dict[str, str] = {}
+            missing: list[str] = []
+            for attachment_id, url, _ in due:
+                new_url = refreshed.get(url) or by_path.get(_url_path(url))
+                if new_url:
+                    updates[attachment_id] = new_url
+                else:
+                    missing.append(attachment_id)
+
+            await asyncio.to_thread(self._db.attachments_update_urls, updates)
+            await asyncio.to_thread(self._db.attachments_clear_url_expiry, missing)
+            for attachment_id, new_url in updates.items():
+                self._url_cache.put(attachment_id, new_url)
+
+            refreshed_total += len(updates)
+            with self._stats_lock:
+                self._batches += 1
+                self._refreshed += len(updates)
+                self._unrefreshable += len(missing)
+
+        with self._stats_lock:
+            self._runs += 1
+        return refreshed_total
 
-        for candidate in (attachment.url, attachment.proxy_url):
-            if candidate:
-                try:
-                    return self._validate_cdn_url(str(candidate))
-                except ValueError:
-                    continue
-        return None
 
-    def _validate_cdn_url(self, url: str) -> str:
-        parsed = urlparse(url)
-        host = (parsed.hostname or "").lower()
-        if parsed.scheme != "https":
-            raise ValueError("Attachment download URL must be https.")
-        if host not in ALLOWED_DISCORD_CDN_HOSTS:
-            raise ValueError(f"Refusing to proxy non-Discord host: {host}")
-        return url
-
-    def iter_download(self, url: str):
-        # Let DiscordAPI handle streaming + errors.
-        return self._discord.iter_download(url)
+def _url_path(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{parsed.path}"
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .models import Agent
+
+
+class AgentAuthCache:
+    """
+    Bounded TTL + LRU cache of active agents keyed by token hash.
+
+    Only successful lookups are cached. In-process revocation/rotation must call
+    `invalidate_agent()`; changes made by another process (e.g. the CLI) take effect
+    within `ttl_seconds`.
+    """
+
+    def __init__(self, *, ttl_seconds: float, max_entries: int):
+        self._ttl_seconds = float(ttl_seconds)
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Agent]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        # Bumped on every invalidation so a lookup that raced a revoke cannot re-cache the agent.
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl_seconds > 0 and self._max_entries > 0
+
+    def get(self, token_hash: str) -> Optional[Agent]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token_hash]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token_hash)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, token_hash: str, agent: Agent, *, generation: int) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self._ttl_seconds
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[token_hash] = (expires_at, agent)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_agent(self, agent_id: str) -> None:
+        with self._lock:
+            stale = [key for key, (_, agent) in self._entries.items() if agent.agent_id == agent_id]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "ttl_seconds": self._ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+
+import discord
+
+from .config import Settings
+from .db import Database
+from .ingest import IngestionWriter, ingest_message_from_discord
+from .models import IngestMessage
+
+
+# Discord returns channel history 100 messages per request; each page is one transaction.
+HISTORY_PAGE_SIZE = 100
+
+
+class BackfillProgress:
+    """Thread-safe counters for the startup backfill (read by the admin stats route)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._threads_total = 0
+        self._threads_done = 0
+        self._threads_skipped = 0
+        self._threads_failed = 0
+        self._messages_ingested = 0
+
+    def start(self, *, threads_total: int) -> None:
+        with self._lock:
+            self._started_at = time.monotonic()
+            self._finished_at = None
+            self._threads_total = threads_total
+            self._threads_done = 0
+            self._threads_skipped = 0
+            self._threads_failed = 0
+
+    def add_messages(self, count: int) -> None:
+        with self._lock:
+            self._messages_ingested += count
+
+    def thread_finished(self, *, skipped: bool = False, failed: bool = False) -> None:
+        with self._lock:
+            self._threads_done += 1
+            if skipped:
+                self._threads_skipped += 1
+            if failed:
+                self._threads_failed += 1
+
+    def finish(self) -> None:
+        with self._lock:
+            self._finished_at = time.monotonic()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            elapsed: Optional[float] = None
+            eta: Optional[float] = None
+            if self._started_at is not None:
+                end = self._finished_at if self._finished_at is not None else time.monotonic()
+                elapsed = end - self._started_at
+                remaining = self._threads_total - self._threads_done
+                if self._finished_at is not None or remaining <= 0:
+                    eta = 0.0
+                elif self._threads_done > 0:
+                    eta = elapsed / self._threads_done * remaining
+            return {
+                "running": self._started_at is not None and self._finished_at is None,
+                "threads_total": self._threads_total,
+                "threads_done": self._threads_done,
+                "threads_skipped": self._threads_skipped,
+                "threads_failed": self._threads_failed,
+                "messages_ingested": self._messages_ingested,
+                "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+            }
+
+
+async def backfill_channel(
+    *,
+    channel: discord.abc.Messageable,
+    settings: Settings,
+    db: Database,
+    writer: IngestionWriter,
+    logger: logging.Logger,
+    last_message_id: Optional[str] = None,
+) -> int:
+    """
+    Backfill one channel/thread from its checkpoint. Returns the number of messages queued.
+
+    `last_message_id` may be passed when the caller already read the checkpoint
+    (`""` meaning none); otherwise it is loaded from `ingestion_state`.
+    """
+    source_channel_id = str(getattr(channel, "id", ""))
+    if not source_channel_id:
+        return 0
+
+    if last_message_id is None:
+        # SQLite work stays off the discord.py loop so a slow disk cannot stall heartbeats.
+        last_message_id = await asyncio.to_thread(db.ingestion_state_get, source_channel_id)
+
+    kwargs = {"oldest_first": True}
+    if last_message_id:
+        kwargs["after"] = discord.Object(id=int(last_message_id))
+        kwargs["limit"] = None
+        logger.info("Backfill channel_id=%s after=%s", source_channel_id, last_message_id)
+    else:
+        if settings.backfill_seed_limit <= 0:
+            return 0
+        kwargs["limit"] = settings.backfill_seed_limit
+        logger.info("Backfill channel_id=%s seed_last=%s", source_channel_id, settings.backfill_seed_limit)
+
+    queued = 0
+    page: list[IngestMessage] = []
+    # Each page moves the channel checkpoint, so a page is only submitted once the one
+    # before it has committed: a failed page raises here and stops the channel before a
+    # later page could checkpoint past its messages. The next page is still fetched from
+    # Discord while the previous one commits.
+    in_flight: Optional[Future[list[Optional[int]]]] = None
+
+    async def _submit(records: list[IngestMessage]) -> Future[list[Optional[int]]]:
+        if in_flight is not None:
+            await asyncio.wrap_future(in_flight)
+        return await writer.submit_many_async(records)
+
+    async for message in channel.history(**kwargs):
+        if message.guild is None:
+            continue
+        record = ingest_message_from_discord(message=message, settings=settings)
+        if record is None:
+            continue
+        page.append(record)
+        if len(page) >= HISTORY_PAGE_SIZE:
+            in_flight = await _submit(page)
+            queued += len(page)
+            page = []
+    if page:
+        in_flight = await _submit(page)
+        queued += len(page)
+
+    if in_flight is not None:
+        await asyncio.wrap_future(in_flight)
+    return queued
+
+
+def _snowflake(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+async def backfill_root_and_threads(
+    *,
+    bot: discord.Client,
+    root_channel: discord.TextChannel,
+    settings: Settings,
+    db: Database,
+    writer: IngestionWriter,
+    logger: logging.Logger,
+    progress: Optional[BackfillProgress] = None,
+) -> None:
+    progress = progress or BackfillProgress()
+    try:
+        ingested = await backfill_channel(channel=root_channel, settings=settings, db=db, writer=writer, logger=logger)
+        progress.add_messages(ingested)
+    except Exception:
+        # Threads have their own checkpoints; a failed root channel does not hold them up.
+        logger.exception("Backfill failed for channel_id=%s", root_channel.id)
+
+    checkpoints = await asyncio.to_thread(db.ingestion_state_all)
+
+    # Thread objects we already hold (active/archived listings) avoid a fetch_channel round trip.
+    threads: dict[int, Optional[discord.Thread]] = {}
+
+    # 1) Any threads we have state for (covers archived threads too).
+    for cid in checkpoints:
+        if cid and cid != str(root_channel.id):
+            try:
+                threads.setdefault(int(cid), None)
+            except ValueError:
+                continue
+
+    # 2) Currently active threads in the guild (filter to this channel).
+    try:
+        for thread in await root_channel.guild.active_threads():
+            if getattr(thread, "parent_id", None) == root_channel.id:
+                threads[int(thread.id)] = thread
+    except Exception:
+        logger.exception("Failed to enumerate active threads for backfill.")
+
+    # 3) Recently archived threads (best-effort).
+    limit = settings.backfill_archived_thread_limit
+    if limit > 0:
+        try:
+            async for thread in root_channel.archived_threads(limit=limit):
+                threads[int(thread.id)] = thread
+        except Exception:
+            logger.exception("Failed to enumerate archived public threads for backfill.")
+        try:
+            async for thread in root_channel.archived_threads(private=True, joined=True, limit=limit):
+                threads[int(thread.id)] = thread
+        except Exception:
+            logger.exception("Failed to enumerate archived private threads for backfill.")
+
+    # Most stale first: never-seen threads, then the oldest checkpoints.
+    order = sorted(threads, key=lambda tid: (_snowflake(checkpoints.get(str(tid))), tid))
+    progress.start(threads_total=len(order))
+    semaphore = asyncio.Semaphore(settings.backfill_concurrency)
+
+    async def _run_one(thread_id: int) -> None:
+        async with semaphore:
+            checkpoint = checkpoints.get(str(thread_id))
+            try:
+                ch = threads.get(thread_id) or bot.get_channel(thread_id) or await bot.fetch_channel(thread_id)
+                if not (isinstance(ch, discord.Thread) and getattr(ch, "parent_id", None) == root_channel.id):
+                    progress.thread_finished(skipped=True)
+                    return
+                latest = getattr(ch, "last_message_id", None)
+                if checkpoint and latest is not None and _snowflake(latest) <= _snowflake(checkpoint):
+                    # Nothing newer than our checkpoint; skip the history call entirely.
+                    progress.thread_finished(skipped=True)
+                    return
+                count = await backfill_channel(
+                    channel=ch,
+                    settings=settings,
+                    db=db,
+                    writer=writer,
+                    logger=logger,
+                    last_message_id=checkpoint or "",
+                )
+                progress.add_messages(count)
+                progress.thread_finished()
+            except (discord.Forbidden, discord.NotFound):
+                logger.debug("Skipping thread_id=%s (not accessible)", thread_id, exc_info=True)
+                progress.thread_finished(failed=True)
+            except Exception:
+                logger.exception("Backfill failed for thread_id=%s", thread_id)
+                progress.thread_finished(failed=True)
+
+            snap = progress.snapshot()
+            logger.info(
+                "Backfill progress threads=%s/%s messages=%s eta_s=%s",
+                snap["threads_done"],
+                snap["threads_total"],
+                snap["messages_ingested"],
+                snap["eta_seconds"],
+            )
+
+    await asyncio.gather(*(_run_one(tid) for tid in order))
+    progress.finish()
+    snap = progress.snapshot()
+    logger.info(
+        "Backfill complete threads=%s (skipped=%s failed=%s) messages=%s elapsed_s=%s",
+        snap["threads_total"],
+        snap["threads_skipped"],
+        snap["threads_failed"],
+        snap["messages_ingested"],
+        snap["elapsed_seconds"],
+    )
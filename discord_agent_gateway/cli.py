@@ -3,24 +3,37 @@ from __future__ import annotations
 import argparse
 import logging
 import threading
+from typing import Optional
 
 import uvicorn
 
 from . import __version__
-from .attachments import AttachmentProxy
+from .attachment_cache import AttachmentDiskCache
+from .attachments import AsyncAttachmentProxy, AttachmentURLCache, AttachmentURLRefresher
 from .api import create_app
+from .backfill import BackfillProgress
 from .bot import build_discord_bot
 from .config import Settings
 from .db import Database
-from .discord_api import DiscordAPI
+from .discord_api import AsyncDiscordAPI, DiscordAPI
+from .ingest import IngestionWriter
 from .logging_setup import setup_logging
+from .notify import PostNotifier
 from .profile_sync import sync_discord_channel_profile
 from .util import parse_iso_utc
-from .webhook import GatewayWebhookManager
+from .webhook import AsyncGatewayWebhookManager
+
+
+# How long `--mode run` waits for the API's shutdown (lifespan: receipt flush, outbox stop).
+API_SHUTDOWN_TIMEOUT_SECONDS = 30.0
+
+
+def _uvicorn_server(*, app, host: str, port: int) -> uvicorn.Server:
+    return uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="info"))
 
 
 def _run_uvicorn(*, app, host: str, port: int) -> None:
-    uvicorn.run(app, host=host, port=port, log_level="info")
+    _uvicorn_server(app=app, host=host, port=port).run()
 
 
 def _print_effective_config(settings: Settings) -> None:
@@ -32,6 +45,8 @@ def _print_effective_config(settings: Settings) -> None:
     print(f"- discord_channel_id: {settings.discord_channel_id}")
     print(f"- db_path: {settings.db_path}")
     print(f"- discord_webhook_url_set: {bool(settings.discord_webhook_url)}")
+    print(f"- webhook_pool_size: {settings.webhook_pool_size}")
+    print(f"- outbox_workers: {settings.outbox_workers}")
     print(f"- channel_profile_name: {settings.profile_name}")
     print(f"- channel_profile_mission: {settings.profile_mission}")
     print(f"- registration_mode: {settings.registration_mode}")
@@ -39,9 +54,23 @@ def _print_effective_config(settings: Settings) -> None:
     print(f"- register_rate_limit_count: {settings.register_rate_limit_count}")
     print(f"- register_rate_limit_window_seconds: {settings.register_rate_limit_window_seconds}")
     print(f"- healthz_verbose: {settings.healthz_verbose}")
+    print(f"- auth_cache_ttl_seconds: {settings.auth_cache_ttl_seconds}")
+    print(f"- auth_cache_max_entries: {settings.auth_cache_max_entries}")
+    print(f"- inbox_buffer_size: {settings.inbox_buffer_size}")
+    print(f"- receipt_flush_interval_seconds: {settings.receipt_flush_interval_seconds}")
+    print(f"- attachment_url_refresh_enabled: {settings.attachment_url_refresh_enabled}")
+    print(f"- attachment_url_refresh_interval_seconds: {settings.attachment_url_refresh_interval_seconds}")
+    print(f"- attachment_url_refresh_ahead_seconds: {settings.attachment_url_refresh_ahead_seconds}")
+    print(f"- attachment_url_refresh_max_post_age_hours: {settings.attachment_url_refresh_max_post_age_hours}")
+    print(f"- attachment_cache_dir: {settings.attachment_cache_dir}")
+    print(f"- attachment_cache_max_bytes: {settings.attachment_cache_max_bytes}")
     print(f"- backfill_enabled: {settings.backfill_enabled}")
     print(f"- backfill_seed_limit: {settings.backfill_seed_limit}")
     print(f"- backfill_archived_thread_limit: {settings.backfill_archived_thread_limit}")
+    print(f"- backfill_concurrency: {settings.backfill_concurrency}")
+    print(f"- ingest_batch_max_size: {settings.ingest_batch_max_size}")
+    print(f"- ingest_batch_max_delay_ms: {settings.ingest_batch_max_delay_ms}")
+    print(f"- ingest_queue_max_size: {settings.ingest_queue_max_size}")
     print(f"- log_level: {settings.log_level}")
 
 
@@ -152,7 +181,12 @@ def main(argv: list[str] | None = None) -> None:
         _print_effective_config(settings)
         return
 
-    db = Database(settings.db_path)
+    db = Database(
+        settings.db_path,
+        auth_cache_ttl_seconds=settings.auth_cache_ttl_seconds,
+        auth_cache_max_entries=settings.auth_cache_max_entries,
+        recent_posts_capacity=settings.inbox_buffer_size,
+    )
     db.init_schema()
 
     if _handle_admin_cli(args, db):
@@ -160,30 +194,93 @@ def main(argv: list[str] | None = None) -> None:
 
     discord_api = DiscordAPI(bot_token=settings.discord_bot_token, api_base=settings.discord_api_base)
     sync_discord_channel_profile(settings=settings, db=db, discord=discord_api, logger=logger)
-    webhooks = GatewayWebhookManager(settings=settings, db=db, discord=discord_api)
-    attachments = AttachmentProxy(db=db, discord=discord_api)
+    # The API routes use the async client; both share one rate-limit tracker.
+    async_discord_api = AsyncDiscordAPI(
+        bot_token=settings.discord_bot_token,
+        api_base=settings.discord_api_base,
+        rate_limiter=discord_api.rate_limiter,
+    )
+    webhooks = AsyncGatewayWebhookManager(
+        settings=settings,
+        db=db,
+        discord=async_discord_api,
+        pool_size=settings.webhook_pool_size,
+    )
+    url_cache = AttachmentURLCache()
+    attachments = AsyncAttachmentProxy(db=db, discord=async_discord_api, url_cache=url_cache)
+    attachment_cache: Optional[AttachmentDiskCache] = None
+    if settings.attachment_cache_max_bytes > 0:
+        attachment_cache = AttachmentDiskCache(
+            directory=settings.attachment_cache_dir,
+            max_bytes=settings.attachment_cache_max_bytes,
+        )
+    url_refresher: Optional[AttachmentURLRefresher] = None
+    if settings.attachment_url_refresh_enabled:
+        url_refresher = AttachmentURLRefresher(
+            db=db,
+            discord=async_discord_api,
+            url_cache=url_cache,
+            interval_seconds=settings.attachment_url_refresh_interval_seconds,
+            refresh_ahead_seconds=settings.attachment_url_refresh_ahead_seconds,
+            max_post_age_seconds=settings.attachment_url_refresh_max_post_age_hours * 3600,
+        )
+    notifier = PostNotifier()
+
+    writer: Optional[IngestionWriter] = None
+    backfill_progress: Optional[BackfillProgress] = None
+    if args.mode != "api":
+        backfill_progress = BackfillProgress()
+        writer = IngestionWriter(
+            db=db,
+            notifier=notifier,
+            max_batch_size=settings.ingest_batch_max_size,
+            max_batch_delay_seconds=settings.ingest_batch_max_delay_ms / 1000.0,
+            max_queue_size=settings.ingest_queue_max_size,
+        )
 
-    app = create_app(settings=settings, db=db, webhooks=webhooks, attachments=attachments)
+    app = create_app(
+        settings=settings,
+        db=db,
+        webhooks=webhooks,
+        attachments=attachments,
+        notifier=notifier,
+        ingestion=writer,
+        backfill=backfill_progress,
+        discord_rate_limits=discord_api.rate_limiter,
+        discord=async_discord_api,
+        url_refresher=url_refresher,
+        attachment_cache=attachment_cache,
+    )
 
-    if args.mode == "api":
+    if writer is None:
         logger.info("Starting API only on %s:%s", settings.gateway_host, settings.gateway_port)
         _run_uvicorn(app=app, host=settings.gateway_host, port=settings.gateway_port)
         return
 
-    bot = build_discord_bot(settings=settings, db=db)
+    writer.start()
+    bot = build_discord_bot(settings=settings, db=db, writer=writer, backfill_progress=backfill_progress)
 
-    if args.mode == "bot":
-        logger.info("Starting Discord bot only (no API server).")
-        bot.run(settings.discord_bot_token)
-        return
+    server: Optional[uvicorn.Server] = None
+    api_thread: Optional[threading.Thread] = None
+    try:
+        if args.mode == "bot":
+            logger.info("Starting Discord bot only (no API server).")
+            bot.run(settings.discord_bot_token)
+            return
 
-    logger.info("Starting API server on %s:%s", settings.gateway_host, settings.gateway_port)
-    api_thread = threading.Thread(
-        target=_run_uvicorn,
-        kwargs={"app": app, "host": settings.gateway_host, "port": settings.gateway_port},
-        daemon=True,
-    )
-    api_thread.start()
+        logger.info("Starting API server on %s:%s", settings.gateway_host, settings.gateway_port)
+        # Signal handlers stay with the bot on the main thread; the server is stopped below.
+        server = _uvicorn_server(app=app, host=settings.gateway_host, port=settings.gateway_port)
+        api_thread = threading.Thread(target=server.run, name="api-server", daemon=True)
+        api_thread.start()
 
-    logger.info("Starting Discord bot.")
-    bot.run(settings.discord_bot_token)
+        logger.info("Starting Discord bot.")
+        bot.run(settings.discord_bot_token)
+    finally:
+        if server is not None and api_thread is not None:
+            # Runs the app's lifespan shutdown: final receipt flush, outbox and URL refresher stop.
+            server.should_exit = True
+            api_thread.join(API_SHUTDOWN_TIMEOUT_SECONDS)
+            if api_thread.is_alive():
+                logger.warning("API server did not shut down within %ss", API_SHUTDOWN_TIMEOUT_SECONDS)
+        writer.stop()
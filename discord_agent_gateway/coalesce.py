@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from .discord_api import DownloadStream
+
+
+logger = logging.getLogger("discord_agent_gateway.coalesce")
+
+# Most a flight holds in memory. Until it fills, late requests can join and read from the
+# start; after that the flight is closed to new readers, chunks are dropped behind the
+# slowest reader and the upstream fetch waits for that reader to catch up.
+COALESCE_MAX_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class SharedDownload:
+    content_length: Optional[int]
+    chunks: AsyncIterator[bytes]
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.opened = asyncio.Event()
+        self.changed = asyncio.Event()
+        self.drained = asyncio.Event()  # set when trimming frees buffer space
+        self.task: Optional[asyncio.Task[None]] = None
+        self.error: Optional[BaseException] = None
+        self.content_length: Optional[int] = None
+        self.chunks: list[bytes] = []
+        self.dropped = 0  # chunks trimmed from the front of `chunks`
+        self.buffered_bytes = 0  # bytes currently held in `chunks`
+        self.joinable = True
+        self.done = False
+        # reader id -> absolute index of the next chunk it will read
+        self.readers: dict[int, int] = {}
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def trim(self) -> None:
+        if self.joinable or not self.readers:
+            return
+        drop = min(self.readers.values()) - self.dropped
+        if drop > 0:
+            self.buffered_bytes -= sum(len(chunk) for chunk in self.chunks[:drop])
+            del self.chunks[:drop]
+            self.dropped += drop
+            self.drained.set()
+
+
+class DownloadCoalescer:
+    """
+    Single-flight upstream downloads for concurrent requests of the same attachment.
+
+    The first request for a key starts the upstream fetch in a background task that
+    appends chunks to a shared in-memory buffer; requests arriving while it runs join
+    it and read the same buffer from the start instead of opening their own stream.
+    Upstream errors are raised to every waiter. The fetch is cancelled when its last
+    reader goes away. At most `max_buffer_bytes` (plus one chunk) is held per download:
+    once full, the fetch pauses until the slowest reader has consumed buffered chunks.
+    Everything runs on the API event loop.
+    """
+
+    def __init__(self, *, max_buffer_bytes: int = COALESCE_MAX_BUFFER_BYTES):
+        self._max_buffer_bytes = max_buffer_bytes
+        self._flights: dict[str, _Flight] = {}
+        self._next_reader = 0
+        self._active = 0
+
+        self._stats_lock = threading.Lock()
+        self._started = 0
+        self._joined = 0
+        self._failed = 0
+        self._peak_buffered = 0
+
+    async def open(self, key: str, start: Callable[[], Awaitable[DownloadStream]]) -> SharedDownload:
+        """
+        Join the running download for `key`, or begin one with `start()`.
+
+        Returns once upstream has answered, so errors surface before any response is sent.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.get_running_loop().create_task(self._pump(key, flight, start), name=f"download-{key}")
+            self._count(started=1)
+        else:
+            self._count(joined=1)
+
+        reader = self._next_reader
+        self._next_reader += 1
+        flight.readers[reader] = 0
+        try:
+            await flight.opened.wait()
+        except BaseException:
+            self._leave(key, flight, reader)
+            raise
+        if flight.error is not None:
+            self._leave(key, flight, reader)
+            raise flight.error
+        return SharedDownload(content_length=flight.content_length, chunks=self._read(key, flight, reader))
+
+    def _close(self, key: str, flight: _Flight) -> None:
+        flight.joinable = False
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _pump(self, key: str, flight: _Flight, start: Callable[[], Awaitable[DownloadStream]]) -> None:
+        self._active += 1
+        try:
+            download = await start()
+            flight.content_length = download.content_length
+            flight.opened.set()
+            async for chunk in download.chunks:
+                while flight.buffered_bytes >= self._max_buffer_bytes:
+                    if flight.joinable:
+                        # Full: stop accepting readers so chunks can be dropped behind them.
+                        self._close(key, flight)
+                        flight.trim()
+                        continue
+                    # Backpressure: wait for the slowest reader to free space.
+                    flight.drained.clear()
+                    await flight.drained.wait()
+                flight.chunks.append(chunk)
+                flight.buffered_bytes += len(chunk)
+                with self._stats_lock:
+                    self._peak_buffered = max(self._peak_buffered, flight.buffered_bytes)
+                flight.trim()
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as exc:
+            logger.debug("Shared download failed key=%s", key, exc_info=True)
+            flight.error = exc
+            self._count(failed=1)
+        finally:
+            self._active -= 1
+            flight.done = True
+            self._close(key, flight)
+            flight.opened.set()
+            flight.notify()
+
+    async def _read(self, key: str, flight: _Flight, reader: int) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                index = flight.readers[reader]
+                changed = flight.changed
+                if index - flight.dropped < len(flight.chunks):
+                    chunk = flight.chunks[index - flight.dropped]
+                    flight.readers[reader] = index + 1
+                    flight.trim()
+                    yield chunk
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await changed.wait()
+        finally:
+            self._leave(key, flight, reader)
+
+    def _leave(self, key: str, flight: _Flight, reader: int) -> None:
+        flight.readers.pop(reader, None)
+        if flight.readers or flight.done:
+            flight.trim()
+            return
+        # Nobody is listening any more: stop fetching.
+        self._close(key, flight)
+        if flight.task is not None:
+            flight.task.cancel()
+
+    def _count(self, *, started: int = 0, joined: int = 0, failed: int = 0) -> None:
+        with self._stats_lock:
+            self._started += started
+            self._joined += joined
+            self._failed += failed
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "in_flight": self._active,
+                "upstream_downloads": self._started,
+                "coalesced_requests": self._joined,
+                "failed": self._failed,
+                "peak_buffered_bytes": self._peak_buffered,
+            }
@@ -27,6 +27,8 @@ class Settings(BaseSettings):
     discord_bot_token: str = Field(..., validation_alias="DISCORD_BOT_TOKEN")
     discord_channel_id: int = Field(..., validation_alias="DISCORD_CHANNEL_ID")
     discord_webhook_url: str = Field("", validation_alias="DISCORD_WEBHOOK_URL")
+    webhook_pool_size: int = Field(1, validation_alias="WEBHOOK_POOL_SIZE")
+    outbox_workers: int = Field(4, validation_alias="OUTBOX_WORKERS")
 
     db_path: Path = Field(Path("data/agent_gateway.db"), validation_alias="DB_PATH")
 
@@ -53,9 +55,32 @@ class Settings(BaseSettings):
 
     healthz_verbose: bool = Field(False, validation_alias="HEALTHZ_VERBOSE")
 
+    auth_cache_ttl_seconds: float = Field(30.0, validation_alias="AUTH_CACHE_TTL_SECONDS")
+    auth_cache_max_entries: int = Field(4096, validation_alias="AUTH_CACHE_MAX_ENTRIES")
+
+    inbox_buffer_size: int = Field(512, validation_alias="INBOX_BUFFER_SIZE")
+    receipt_flush_interval_seconds: float = Field(2.0, validation_alias="RECEIPT_FLUSH_INTERVAL_SECONDS")
+
+    attachment_url_refresh_enabled: bool = Field(True, validation_alias="ATTACHMENT_URL_REFRESH_ENABLED")
+    attachment_url_refresh_interval_seconds: float = Field(
+        300.0, validation_alias="ATTACHMENT_URL_REFRESH_INTERVAL_SECONDS"
+    )
+    attachment_url_refresh_ahead_seconds: float = Field(3600.0, validation_alias="ATTACHMENT_URL_REFRESH_AHEAD_SECONDS")
+    attachment_url_refresh_max_post_age_hours: float = Field(
+        72.0, validation_alias="ATTACHMENT_URL_REFRESH_MAX_POST_AGE_HOURS"
+    )
+
+    attachment_cache_dir: Path = Field(Path("data/attachment_cache"), validation_alias="ATTACHMENT_CACHE_DIR")
+    attachment_cache_max_bytes: int = Field(256 * 1024 * 1024, validation_alias="ATTACHMENT_CACHE_MAX_BYTES")
+
     backfill_enabled: bool = Field(True, validation_alias="BACKFILL_ENABLED")
     backfill_seed_limit: int = Field(200, validation_alias="BACKFILL_SEED_LIMIT")
     backfill_archived_thread_limit: int = Field(25, validation_alias="BACKFILL_ARCHIVED_THREAD_LIMIT")
+    backfill_concurrency: int = Field(4, validation_alias="BACKFILL_CONCURRENCY")
+
+    ingest_batch_max_size: int = Field(256, validation_alias="INGEST_BATCH_MAX_SIZE")
+    ingest_batch_max_delay_ms: float = Field(5.0, validation_alias="INGEST_BATCH_MAX_DELAY_MS")
+    ingest_queue_max_size: int = Field(10_000, validation_alias="INGEST_QUEUE_MAX_SIZE")
 
     @model_validator(mode="after")
     def _normalize_and_validate(self) -> "Settings":
@@ -100,6 +125,10 @@ class Settings(BaseSettings):
 
         if not (1 <= self.gateway_port <= 65535):
             errors.append("GATEWAY_PORT must be between 1 and 65535.")
+        if not (1 <= self.webhook_pool_size <= 10):
+            errors.append("WEBHOOK_POOL_SIZE must be between 1 and 10.")
+        if self.outbox_workers <= 0:
+            errors.append("OUTBOX_WORKERS must be > 0.")
         if not (1 <= self.discord_max_message_len <= 2000):
             errors.append("DISCORD_MAX_MESSAGE_LEN must be between 1 and 2000.")
         if self.profile_name and len(self.profile_name) > 120:
@@ -112,10 +141,34 @@ class Settings(BaseSettings):
             errors.append("REGISTER_RATE_LIMIT_COUNT must be > 0.")
         if self.register_rate_limit_window_seconds <= 0:
             errors.append("REGISTER_RATE_LIMIT_WINDOW_SECONDS must be > 0.")
+        if self.auth_cache_ttl_seconds < 0:
+            errors.append("AUTH_CACHE_TTL_SECONDS must be >= 0.")
+        if self.auth_cache_max_entries < 0:
+            errors.append("AUTH_CACHE_MAX_ENTRIES must be >= 0.")
+        if self.inbox_buffer_size < 0:
+            errors.append("INBOX_BUFFER_SIZE must be >= 0.")
+        if self.receipt_flush_interval_seconds < 0:
+            errors.append("RECEIPT_FLUSH_INTERVAL_SECONDS must be >= 0.")
+        if self.attachment_url_refresh_interval_seconds <= 0:
+            errors.append("ATTACHMENT_URL_REFRESH_INTERVAL_SECONDS must be > 0.")
+        if self.attachment_url_refresh_ahead_seconds < 0:
+            errors.append("ATTACHMENT_URL_REFRESH_AHEAD_SECONDS must be >= 0.")
+        if self.attachment_url_refresh_max_post_age_hours <= 0:
+            errors.append("ATTACHMENT_URL_REFRESH_MAX_POST_AGE_HOURS must be > 0.")
+        if self.attachment_cache_max_bytes < 0:
+            errors.append("ATTACHMENT_CACHE_MAX_BYTES must be >= 0.")
         if self.backfill_seed_limit < 0:
             errors.append("BACKFILL_SEED_LIMIT must be >= 0.")
         if self.backfill_archived_thread_limit < 0:
             errors.append("BACKFILL_ARCHIVED_THREAD_LIMIT must be >= 0.")
+        if self.backfill_concurrency <= 0:
+            errors.append("BACKFILL_CONCURRENCY must be > 0.")
+        if self.ingest_batch_max_size <= 0:
+            errors.append("INGEST_BATCH_MAX_SIZE must be > 0.")
+        if self.ingest_batch_max_delay_ms < 0:
+            errors.append("INGEST_BATCH_MAX_DELAY_MS must be >= 0.")
+        if self.ingest_queue_max_size <= 0:
+            errors.append("INGEST_QUEUE_MAX_SIZE must be > 0.")
 
         if errors:
             raise ValueError(" ".join(errors))
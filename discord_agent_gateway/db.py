@@ -2,42 +2,311 @@ from __future__ import annotations
 
 import secrets
 import sqlite3
+import threading
+import time
 import uuid
 from contextlib import contextmanager
+from dataclasses import replace
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
 
+from .auth_cache import AgentAuthCache
+from .events import event_blob
 from .models import (
     Agent,
     AgentAdmin,
     AgentCredentials,
     Attachment,
     ChannelProfile,
+    InboxFilter,
+    IngestMessage,
     Invite,
     InviteCreateResult,
+    OutboxJob,
     Post,
 )
-from .util import sha256_hex, utc_now_iso
+from .post_buffer import PostEntry, RecentPostsBuffer
+from .util import cdn_url_expires_at, sha256_hex, utc_now_iso
+
+
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups.
+_SQL_IN_CHUNK = 500
+
+# How long a cached channel head is trusted before MAX(seq) is re-read, so posts written
+# by another process (`--mode bot` next to `--mode api`) show up within this delay.
+CHANNEL_HEAD_TTL_SECONDS = 1.0
+
+# Channel profile settings are cached for this long; writes through this Database
+# invalidate the cache immediately, changes from another process (the CLI) apply later.
+PROFILE_CACHE_TTL_SECONDS = 5.0
+
+_PROFILE_SETTING_KEYS = (
+    "channel_profile_name",
+    "channel_profile_mission",
+    "channel_profile_updated_at",
+    "discord_channel_name",
+    "discord_channel_topic",
+)
+
+_ATTACHMENT_INSERT_SQL = """
+    INSERT OR IGNORE INTO attachments(
+        attachment_id,post_seq,discord_message_id,source_channel_id,filename,url,proxy_url,content_type,size_bytes,height,width,
+        url_expires_at
+    ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+_INGESTION_STATE_UPSERT_SQL = """
+    INSERT INTO ingestion_state(source_channel_id,last_message_id,updated_at) VALUES(?,?,?)
+    ON CONFLICT(source_channel_id) DO UPDATE SET last_message_id=excluded.last_message_id, updated_at=excluded.updated_at
+"""
+
+
+def _attachment_row(a: Attachment) -> tuple:
+    return (
+        a.attachment_id,
+        a.post_seq,
+        a.discord_message_id,
+        a.source_channel_id,
+        a.filename,
+        a.url,
+        a.proxy_url,
+        a.content_type,
+        a.size_bytes,
+        a.height,
+        a.width,
+        cdn_url_expires_at(a.url),
+    )
+
+
+# Applied once per pooled connection (not per transaction).
+_CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys=ON;",
+    "PRAGMA busy_timeout=30000;",
+    "PRAGMA synchronous=NORMAL;",  # safe with WAL; fsync at checkpoints instead of every commit
+    "PRAGMA cache_size=-16000;",  # KiB, per connection
+    "PRAGMA mmap_size=268435456;",
+)
+
+
+_POST_COLUMNS = (
+    "seq, post_id, author_kind, author_id, author_name, body, created_at, discord_message_id, source_channel_id, event_json"
+)
+
+
+def _post(row: sqlite3.Row, channel_id: str) -> Post:
+    return Post(
+        seq=int(row["seq"]),
+        post_id=str(row["post_id"]),
+        author_kind=str(row["author_kind"]),
+        author_id=str(row["author_id"]),
+        author_name=row["author_name"],
+        body=str(row["body"]),
+        created_at=str(row["created_at"]),
+        discord_message_id=row["discord_message_id"],
+        source_channel_id=str(row["source_channel_id"] or channel_id),
+        event_json=row["event_json"],
+    )
+
+
+_ATTACHMENT_COLUMNS = (
+    "attachment_id,post_seq,discord_message_id,source_channel_id,filename,url,proxy_url,content_type,size_bytes,height,width"
+)
+
+
+def _attachment(row: sqlite3.Row) -> Attachment:
+    return Attachment(
+        attachment_id=str(row["attachment_id"]),
+        post_seq=int(row["post_seq"]),
+        discord_message_id=str(row["discord_message_id"]),
+        source_channel_id=str(row["source_channel_id"]),
+        filename=str(row["filename"]),
+        url=row["url"],
+        proxy_url=row["proxy_url"],
+        content_type=row["content_type"],
+        size_bytes=(int(row["size_bytes"]) if row["size_bytes"] is not None else None),
+        height=(int(row["height"]) if row["height"] is not None else None),
+        width=(int(row["width"]) if row["width"] is not None else None),
+    )
+
+
+def _channel_max_seq(conn: sqlite3.Connection, channel_id: str) -> int:
+    row = conn.execute("SELECT MAX(seq) AS head FROM posts WHERE discord_channel_id=?", (channel_id,)).fetchone()
+    return int(row["head"] or 0)
+
+
+def _channel_revision(conn: sqlite3.Connection, channel_id: str) -> int:
+    row = conn.execute("SELECT revision FROM channel_revisions WHERE discord_channel_id=?", (channel_id,)).fetchone()
+    return int(row["revision"]) if row else 0
+
+
+_CHANNEL_REVISION_BUMP_SQL = """
+    INSERT INTO channel_revisions(discord_channel_id,revision) VALUES(?,1)
+    ON CONFLICT(discord_channel_id) DO UPDATE SET revision=revision + 1
+    RETURNING revision
+"""
+
+
+def _outbox_job(row: sqlite3.Row) -> OutboxJob:
+    return OutboxJob(
+        job_id=str(row["job_id"]),
+        agent_id=str(row["agent_id"]),
+        body=str(row["body"]),
+        status=str(row["status"]),
+        chunks_total=int(row["chunks_total"]),
+        chunks_sent=int(row["chunks_sent"]),
+        attempts=int(row["attempts"]),
+        last_seq=int(row["last_seq"]) if row["last_seq"] is not None else None,
+        last_discord_message_id=row["last_discord_message_id"],
+        error=row["error"],
+        created_at=str(row["created_at"]),
+        updated_at=str(row["updated_at"]),
+    )
 
 
 class Database:
-    def __init__(self, path: Path):
+    """
+    SQLite persistence with a small connection pool.
+
+    - One long-lived writer connection, serialized by a lock (`transaction()`).
+    - One long-lived read-only connection per thread (`reader()`); WAL lets these run
+      concurrently with the writer.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        auth_cache_ttl_seconds: float = 30.0,
+        auth_cache_max_entries: int = 4096,
+        recent_posts_capacity: int = 512,
+    ):
         self.path = path
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.auth_cache = AgentAuthCache(ttl_seconds=auth_cache_ttl_seconds, max_entries=auth_cache_max_entries)
+        self.recent_posts = RecentPostsBuffer(capacity=recent_posts_capacity)
 
-    @contextmanager
-    def transaction(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.path, timeout=30)
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._commit_hooks: Optional[list[Callable[[], None]]] = None
+        self._local = threading.local()
+        self._readers: list[tuple[threading.Thread, sqlite3.Connection]] = []
+        self._readers_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._connections_opened = 0
+        self._read_checkouts = 0
+        self._write_transactions = 0
+        self._writer_wait_seconds_total = 0.0
+        self._writer_wait_seconds_max = 0.0
+
+        # channel id -> (highest seq, rewrite revision, monotonic time they were read from SQLite)
+        self._heads: dict[str, tuple[int, int, float]] = {}
+        self._heads_lock = threading.Lock()
+
+        # (monotonic read time, profile setting values); generation guards against a
+        # read that raced a write re-caching stale values.
+        self._profile_values: Optional[tuple[float, dict[str, str]]] = None
+        self._profile_generation = 0
+        self._profile_lock = threading.Lock()
+
+    def _connect(self, *, query_only: bool) -> sqlite3.Connection:
+        # Pooled connections may be closed from another thread (close() / dead-thread pruning).
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
         conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys=ON;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if query_only:
+            conn.execute("PRAGMA query_only=ON;")
+        else:
+            # Persistent in the file; cannot be changed inside a transaction.
+            conn.execute("PRAGMA journal_mode=WAL;")
+        with self._stats_lock:
+            self._connections_opened += 1
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        wait_started = time.perf_counter()
+        with self._writer_lock:
+            waited = time.perf_counter() - wait_started
+            with self._stats_lock:
+                self._write_transactions += 1
+                self._writer_wait_seconds_total += waited
+                self._writer_wait_seconds_max = max(self._writer_wait_seconds_max, waited)
+
+            if self._writer is None:
+                self._writer = self._connect(query_only=False)
+            conn = self._writer
+            hooks: list[Callable[[], None]] = []
+            self._commit_hooks = hooks
+            try:
+                # Take SQLite's write lock up front (sqlite3 would only BEGIN at the first DML),
+                # so reads made before writing, such as a channel's head, cannot be overtaken
+                # by another process committing in between.
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._commit_hooks = None
+            # Still under the writer lock, so hooks see commits in order.
+            for hook in hooks:
+                hook()
+
+    def _on_commit(self, hook: Callable[[], None]) -> None:
+        """Run `hook` once the current `transaction()` has committed (call inside one)."""
+        assert self._commit_hooks is not None, "_on_commit() outside transaction()"
+        self._commit_hooks.append(hook)
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect(query_only=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._prune_dead_readers_locked()
+                self._readers.append((threading.current_thread(), conn))
+        with self._stats_lock:
+            self._read_checkouts += 1
+        yield conn
+
+    def _prune_dead_readers_locked(self) -> None:
+        alive: list[tuple[threading.Thread, sqlite3.Connection]] = []
+        for thread, conn in self._readers:
+            if thread.is_alive():
+                alive.append((thread, conn))
+            else:
+                conn.close()
+        self._readers = alive
+
+    def close(self) -> None:
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for _, conn in self._readers:
+                conn.close()
+            self._readers = []
+        self._local = threading.local()
+
+    def pool_stats(self) -> dict[str, Any]:
+        with self._readers_lock:
+            self._prune_dead_readers_locked()
+            readers_open = len(self._readers)
+        with self._stats_lock:
+            return {
+                "writer_open": self._writer is not None,
+                "readers_open": readers_open,
+                "connections_opened": self._connections_opened,
+                "read_checkouts": self._read_checkouts,
+                "write_transactions": self._write_transactions,
+                "writer_wait_ms_total": round(self._writer_wait_seconds_total * 1000, 3),
+                "writer_wait_ms_max": round(self._writer_wait_seconds_max * 1000, 3),
+            }
 
     def init_schema(self) -> None:
         schema = """
@@ -71,7 +340,8 @@ class Database:
             created_at TEXT NOT NULL,
             discord_message_id TEXT UNIQUE,
             discord_channel_id TEXT NOT NULL,
-            source_channel_id TEXT
+            source_channel_id TEXT,
+            event_json BLOB                 -- serialized inbox event without per-agent fields
         );
 
         CREATE INDEX IF NOT EXISTS idx_posts_seq ON posts(seq);
@@ -93,11 +363,18 @@ class Database:
             size_bytes INTEGER,
             height INTEGER,
             width INTEGER,
+            url_expires_at INTEGER,         -- unix seconds from the signed CDN URL's `ex`, if any
             FOREIGN KEY(post_seq) REFERENCES posts(seq) ON DELETE CASCADE
         );
 
         CREATE INDEX IF NOT EXISTS idx_attachments_post_seq ON attachments(post_seq);
 
+        -- Bumped whenever stored posts of a channel are rewritten (part of the inbox ETag).
+        CREATE TABLE IF NOT EXISTS channel_revisions (
+            discord_channel_id TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL
+        );
+
         CREATE TABLE IF NOT EXISTS ingestion_state (
             source_channel_id TEXT PRIMARY KEY,
             last_message_id TEXT NOT NULL,
@@ -117,10 +394,27 @@ class Database:
 
         CREATE INDEX IF NOT EXISTS idx_invites_revoked_at ON invites(revoked_at);
         CREATE INDEX IF NOT EXISTS idx_invites_expires_at ON invites(expires_at);
+
+        CREATE TABLE IF NOT EXISTS outbox (
+            job_id TEXT PRIMARY KEY,
+            agent_id TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL,           -- 'queued' | 'sending' | 'sent' | 'failed'
+            chunks_total INTEGER NOT NULL,
+            chunks_sent INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_seq INTEGER,
+            last_discord_message_id TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY(agent_id) REFERENCES agents(agent_id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status);
         """
 
         with self.transaction() as conn:
-            conn.execute("PRAGMA journal_mode=WAL;")
             conn.executescript(schema)
 
             # Lightweight migrations for older DBs.
@@ -130,13 +424,37 @@ class Database:
                 cols.append("source_channel_id")
             if "source_channel_id" in cols:
                 conn.execute("UPDATE posts SET source_channel_id = discord_channel_id WHERE source_channel_id IS NULL;")
+            if "event_json" not in cols:
+                # Older rows keep NULL and are serialized at read time.
+                conn.execute("ALTER TABLE posts ADD COLUMN event_json BLOB;")
 
             agent_cols = [r["name"] for r in conn.execute("PRAGMA table_info(agents)").fetchall()]
             if "revoked_at" not in agent_cols:
                 conn.execute("ALTER TABLE agents ADD COLUMN revoked_at TEXT;")
 
+            attachment_cols = [r["name"] for r in conn.execute("PRAGMA table_info(attachments)").fetchall()]
+            if "url_expires_at" not in attachment_cols:
+                conn.execute("ALTER TABLE attachments ADD COLUMN url_expires_at INTEGER;")
+                rows = conn.execute("SELECT attachment_id, url FROM attachments WHERE url IS NOT NULL").fetchall()
+                conn.executemany(
+                    "UPDATE attachments SET url_expires_at=? WHERE attachment_id=?",
+                    [(cdn_url_expires_at(r["url"]), r["attachment_id"]) for r in rows],
+                )
+            # Keyset order for the background URL refresh (replaces the single-column index).
+            conn.execute("DROP INDEX IF EXISTS idx_attachments_url_expires_at;")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_attachments_url_expiry ON attachments(url_expires_at, attachment_id);"
+            )
+            # Inbox filters (after the source_channel_id migration above).
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_posts_channel_source_seq ON posts(discord_channel_id, source_channel_id, seq);"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_posts_channel_author_seq ON posts(discord_channel_id, author_kind, seq);"
+            )
+
     def setting_get(self, key: str) -> Optional[str]:
-        with self.transaction() as conn:
+        with self.reader() as conn:
             row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
             return str(row["value"]) if row else None
 
@@ -147,6 +465,8 @@ class Database:
                 "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
                 (key, value),
             )
+            if key in _PROFILE_SETTING_KEYS:
+                self._on_commit(self._invalidate_profile)
 
     def _agent_create_in_conn(
         self,
@@ -197,17 +517,35 @@ class Database:
 
     def agent_by_token(self, token: str) -> Optional[Agent]:
         token_hash = sha256_hex(token)
-        with self.transaction() as conn:
+        cached = self.auth_cache.get(token_hash)
+        if cached is not None:
+            return cached
+
+        generation = self.auth_cache.generation
+        with self.reader() as conn:
             row = conn.execute(
                 "SELECT agent_id,name,avatar_url FROM agents WHERE token_sha256=? AND revoked_at IS NULL",
                 (token_hash,),
             ).fetchone()
         if not row:
             return None
+        agent = Agent(agent_id=str(row["agent_id"]), name=str(row["name"]), avatar_url=row["avatar_url"])
+        self.auth_cache.put(token_hash, agent, generation=generation)
+        return agent
+
+    def agent_get(self, agent_id: str) -> Optional[Agent]:
+        """Active (non-revoked) agent by id."""
+        with self.reader() as conn:
+            row = conn.execute(
+                "SELECT agent_id,name,avatar_url FROM agents WHERE agent_id=? AND revoked_at IS NULL",
+                (agent_id,),
+            ).fetchone()
+        if not row:
+            return None
         return Agent(agent_id=str(row["agent_id"]), name=str(row["name"]), avatar_url=row["avatar_url"])
 
     def agents_list(self) -> list[AgentAdmin]:
-        with self.transaction() as conn:
+        with self.reader() as conn:
             rows = conn.execute(
                 """
                 SELECT agent_id,name,avatar_url,created_at,revoked_at
@@ -236,7 +574,9 @@ class Database:
                 """,
                 (utc_now_iso(), agent_id),
             )
-            return cur.rowcount == 1
+            revoked = cur.rowcount == 1
+        self.auth_cache.invalidate_agent(agent_id)
+        return revoked
 
     def agent_rotate_token(self, agent_id: str) -> Optional[str]:
         token = secrets.token_urlsafe(32)
@@ -250,9 +590,9 @@ class Database:
                 """,
                 (token_hash, agent_id),
             )
-            if cur.rowcount != 1:
-                return None
-        return token
+            rotated = cur.rowcount == 1
+        self.auth_cache.invalidate_agent(agent_id)
+        return token if rotated else None
 
     def invite_create(
         self,
@@ -296,7 +636,7 @@ class Database:
         raise RuntimeError("Failed to create invite after retries")
 
     def invite_list(self) -> list[Invite]:
-        with self.transaction() as conn:
+        with self.reader() as conn:
             rows = conn.execute(
                 """
                 SELECT invite_id,label,max_uses,used_count,created_at,expires_at,revoked_at
@@ -330,22 +670,105 @@ class Database:
             return cur.rowcount == 1
 
     def receipt_get(self, agent_id: str) -> int:
-        with self.transaction() as conn:
+        with self.reader() as conn:
             row = conn.execute("SELECT last_seq FROM receipts WHERE agent_id=?", (agent_id,)).fetchone()
             return int(row["last_seq"]) if row else 0
 
-    def receipt_set(self, agent_id: str, last_seq: int) -> None:
+    def receipts_advance(self, cursors: dict[str, int]) -> None:
+        """Write many receipts in one transaction; a stored cursor never moves backwards."""
+        if not cursors:
+            return
         with self.transaction() as conn:
-            conn.execute(
+            conn.executemany(
                 "INSERT INTO receipts(agent_id,last_seq) VALUES(?,?) "
-                "ON CONFLICT(agent_id) DO UPDATE SET last_seq=excluded.last_seq",
-                (agent_id, last_seq),
+                "ON CONFLICT(agent_id) DO UPDATE SET last_seq=MAX(last_seq, excluded.last_seq)",
+                list(cursors.items()),
             )
 
-    def post_exists_by_discord_message_id(self, discord_message_id: str) -> bool:
+    def outbox_enqueue(self, *, agent_id: str, body: str, chunks_total: int) -> OutboxJob:
+        job_id = str(uuid.uuid4())
+        now_iso = utc_now_iso()
         with self.transaction() as conn:
-            row = conn.execute("SELECT 1 FROM posts WHERE discord_message_id=?", (discord_message_id,)).fetchone()
-            return row is not None
+            conn.execute(
+                """
+                INSERT INTO outbox(job_id,agent_id,body,status,chunks_total,created_at,updated_at)
+                VALUES(?,?,?,'queued',?,?,?)
+                """,
+                (job_id, agent_id, body, chunks_total, now_iso, now_iso),
+            )
+            row = conn.execute("SELECT * FROM outbox WHERE job_id=?", (job_id,)).fetchone()
+        return _outbox_job(row)
+
+    def outbox_get(self, job_id: str) -> Optional[OutboxJob]:
+        with self.reader() as conn:
+            row = conn.execute("SELECT * FROM outbox WHERE job_id=?", (job_id,)).fetchone()
+        return _outbox_job(row) if row else None
+
+    def outbox_pending(self, limit: int, *, exclude_agent_ids: Sequence[str] = ()) -> list[OutboxJob]:
+        """
+        Undelivered jobs in submission order ('sending' rows are resumed after a restart),
+        skipping agents whose jobs are already being delivered.
+        """
+        placeholders = ",".join("?" for _ in exclude_agent_ids)
+        with self.reader() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT * FROM outbox
+                WHERE status IN ('queued','sending') AND agent_id NOT IN ({placeholders})
+                ORDER BY rowid ASC
+                LIMIT ?
+                """,
+                (*exclude_agent_ids, limit),
+            ).fetchall()
+        return [_outbox_job(r) for r in rows]
+
+    def outbox_record_chunk(
+        self,
+        job_id: str,
+        *,
+        chunks_sent: int,
+        last_seq: Optional[int],
+        last_discord_message_id: Optional[str],
+    ) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE outbox
+                SET status='sending',
+                    chunks_sent=?,
+                    last_seq=COALESCE(?, last_seq),
+                    last_discord_message_id=COALESCE(?, last_discord_message_id),
+                    updated_at=?
+                WHERE job_id=?
+                """,
+                (chunks_sent, last_seq, last_discord_message_id, utc_now_iso(), job_id),
+            )
+
+    def outbox_record_attempt(self, job_id: str, *, error: str, failed: bool) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE outbox
+                SET attempts=attempts + 1,
+                    error=?,
+                    status=CASE WHEN ? THEN 'failed' ELSE status END,
+                    updated_at=?
+                WHERE job_id=?
+                """,
+                (error, 1 if failed else 0, utc_now_iso(), job_id),
+            )
+
+    def outbox_mark_sent(self, job_id: str) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE outbox SET status='sent', error=NULL, updated_at=? WHERE job_id=?",
+                (utc_now_iso(), job_id),
+            )
+
+    def outbox_counts(self) -> dict[str, int]:
+        with self.reader() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {str(r["status"]): int(r["n"]) for r in rows}
 
     def post_insert(
         self,
@@ -359,18 +782,31 @@ class Database:
         discord_channel_id: str,
         source_channel_id: str,
     ) -> Optional[int]:
-        post_id = str(uuid.uuid4())
+        post = Post(
+            seq=0,  # assigned by the insert; not part of the stored event
+            post_id=str(uuid.uuid4()),
+            author_kind=author_kind,
+            author_id=author_id,
+            author_name=author_name,
+            body=body,
+            created_at=created_at,
+            discord_message_id=discord_message_id,
+            source_channel_id=source_channel_id,
+        )
+        post = replace(post, event_json=event_blob(post, ()))
         try:
             with self.transaction() as conn:
+                prev_head = _channel_max_seq(conn, discord_channel_id)
                 cur = conn.cursor()
                 cur.execute(
                     """
                     INSERT INTO posts(
-                        post_id,author_kind,author_id,author_name,body,created_at,discord_message_id,discord_channel_id,source_channel_id
-                    ) VALUES(?,?,?,?,?,?,?,?,?)
+                        post_id,author_kind,author_id,author_name,body,created_at,discord_message_id,discord_channel_id,source_channel_id,
+                        event_json
+                    ) VALUES(?,?,?,?,?,?,?,?,?,?)
                     """,
                     (
-                        post_id,
+                        post.post_id,
                         author_kind,
                         author_id,
                         author_name,
@@ -379,11 +815,15 @@ class Database:
                         discord_message_id,
                         discord_channel_id,
                         source_channel_id,
+                        post.event_json,
                     ),
                 )
-                return int(cur.lastrowid)
+                seq = int(cur.lastrowid)
+                post = replace(post, seq=seq)
+                self._on_commit(lambda: self._posts_committed(discord_channel_id, prev_head, [(post, ())]))
         except sqlite3.IntegrityError:
             return None
+        return seq
 
     def post_mark_as_agent_by_discord_message_id(
         self,
@@ -410,10 +850,13 @@ class Database:
                 "SELECT seq FROM posts WHERE discord_message_id=? AND discord_channel_id=?",
                 (discord_message_id, discord_channel_id),
             ).fetchone()
-            return int(row["seq"]) if row else None
+            if row is None:
+                return None
+            self._rebuild_events(conn, [int(row["seq"])])
+            return int(row["seq"])
 
     def post_seq_by_discord_message_id(self, *, discord_message_id: str, discord_channel_id: str) -> Optional[int]:
-        with self.transaction() as conn:
+        with self.reader() as conn:
             row = conn.execute(
                 "SELECT seq FROM posts WHERE discord_message_id=? AND discord_channel_id=?",
                 (discord_message_id, discord_channel_id),
@@ -424,88 +867,143 @@ class Database:
         if not attachments:
             return
         with self.transaction() as conn:
-            conn.executemany(
-                """
-                INSERT OR IGNORE INTO attachments(
-                    attachment_id,post_seq,discord_message_id,source_channel_id,filename,url,proxy_url,content_type,size_bytes,height,width
-                ) VALUES(?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                [
-                    (
-                        a.attachment_id,
-                        a.post_seq,
-                        a.discord_message_id,
-                        a.source_channel_id,
-                        a.filename,
-                        a.url,
-                        a.proxy_url,
-                        a.content_type,
-                        a.size_bytes,
-                        a.height,
-                        a.width,
-                    )
-                    for a in attachments
-                ],
-            )
+            conn.executemany(_ATTACHMENT_INSERT_SQL, [_attachment_row(a) for a in attachments])
+            self._rebuild_events(conn, {a.post_seq for a in attachments})
+
+    def _rebuild_events(self, conn: sqlite3.Connection, seqs: Iterable[int]) -> None:
+        """
+        Re-serialize the stored events of existing posts whose row or attachments changed,
+        in the caller's transaction, and replace them in the inbox buffer on commit.
+        """
+        wanted = sorted(set(seqs))
+        rebuilt: list[tuple[str, Post, tuple[Attachment, ...]]] = []
+        for i in range(0, len(wanted), _SQL_IN_CHUNK):
+            chunk = wanted[i : i + _SQL_IN_CHUNK]
+            placeholders = ",".join("?" for _ in chunk)
+            attachments: dict[int, list[Attachment]] = {}
+            for row in conn.execute(
+                f"SELECT {_ATTACHMENT_COLUMNS} FROM attachments WHERE post_seq IN ({placeholders}) ORDER BY post_seq ASC",
+                chunk,
+            ):
+                att = _attachment(row)
+                attachments.setdefault(att.post_seq, []).append(att)
+            for row in conn.execute(f"SELECT {_POST_COLUMNS},discord_channel_id FROM posts WHERE seq IN ({placeholders})", chunk):
+                channel_id = str(row["discord_channel_id"])
+                post = _post(row, channel_id)
+                post_attachments = tuple(attachments.get(post.seq, ()))
+                rebuilt.append((channel_id, replace(post, event_json=event_blob(post, post_attachments)), post_attachments))
+        if not rebuilt:
+            return
+        conn.executemany("UPDATE posts SET event_json=? WHERE seq=?", [(post.event_json, post.seq) for _, post, _ in rebuilt])
+        revisions = {
+            channel_id: int(conn.execute(_CHANNEL_REVISION_BUMP_SQL, (channel_id,)).fetchone()["revision"])
+            for channel_id in sorted({channel_id for channel_id, _, _ in rebuilt})
+        }
+
+        def _on_committed() -> None:
+            for channel_id, post, post_attachments in rebuilt:
+                self.recent_posts.update(channel_id, post, post_attachments)
+            with self._heads_lock:
+                for channel_id, revision in revisions.items():
+                    current = self._heads.get(channel_id)
+                    if current is not None and revision > current[1]:
+                        self._heads[channel_id] = (current[0], revision, current[2])
+
+        self._on_commit(_on_committed)
 
     def attachments_for_posts(self, post_seqs: list[int]) -> dict[int, list[Attachment]]:
         if not post_seqs:
             return {}
         placeholders = ",".join("?" for _ in post_seqs)
         query = f"""
-            SELECT attachment_id,post_seq,discord_message_id,source_channel_id,filename,url,proxy_url,content_type,size_bytes,height,width
+            SELECT {_ATTACHMENT_COLUMNS}
             FROM attachments
             WHERE post_seq IN ({placeholders})
             ORDER BY post_seq ASC
         """
-        with self.transaction() as conn:
+        with self.reader() as conn:
             rows = conn.execute(query, post_seqs).fetchall()
         out: dict[int, list[Attachment]] = {}
         for row in rows:
-            att = Attachment(
-                attachment_id=str(row["attachment_id"]),
-                post_seq=int(row["post_seq"]),
-                discord_message_id=str(row["discord_message_id"]),
-                source_channel_id=str(row["source_channel_id"]),
-                filename=str(row["filename"]),
-                url=row["url"],
-                proxy_url=row["proxy_url"],
-                content_type=row["content_type"],
-                size_bytes=(int(row["size_bytes"]) if row["size_bytes"] is not None else None),
-                height=(int(row["height"]) if row["height"] is not None else None),
-                width=(int(row["width"]) if row["width"] is not None else None),
-            )
+            att = _attachment(row)
             out.setdefault(att.post_seq, []).append(att)
         return out
 
     def attachment_get(self, attachment_id: str) -> Optional[Attachment]:
+        with self.reader() as conn:
+            row = conn.execute(f"SELECT {_ATTACHMENT_COLUMNS} FROM attachments WHERE attachment_id=?", (attachment_id,)).fetchone()
+        if not row:
+            return None
+        return _attachment(row)
+
+    def attachment_update_urls(self, attachment_id: str, *, url: Optional[str], proxy_url: Optional[str]) -> None:
+        """Store refreshed (re-signed) CDN URLs for an attachment."""
         with self.transaction() as conn:
-            row = conn.execute(
+            conn.execute(
                 """
-                SELECT attachment_id,post_seq,discord_message_id,source_channel_id,filename,url,proxy_url,content_type,size_bytes,height,width
-                FROM attachments
+                UPDATE attachments
+                SET url=COALESCE(?, url),
+                    proxy_url=COALESCE(?, proxy_url),
+                    url_expires_at=CASE WHEN ? IS NULL THEN url_expires_at ELSE ? END
                 WHERE attachment_id=?
                 """,
-                (attachment_id,),
-            ).fetchone()
-        if not row:
-            return None
-        return Attachment(
-            attachment_id=str(row["attachment_id"]),
-            post_seq=int(row["post_seq"]),
-            discord_message_id=str(row["discord_message_id"]),
-            source_channel_id=str(row["source_channel_id"]),
-            filename=str(row["filename"]),
-            url=row["url"],
-            proxy_url=row["proxy_url"],
-            content_type=row["content_type"],
-            size_bytes=(int(row["size_bytes"]) if row["size_bytes"] is not None else None),
-            height=(int(row["height"]) if row["height"] is not None else None),
-            width=(int(row["width"]) if row["width"] is not None else None),
-        )
+                (url, proxy_url, url, cdn_url_expires_at(url), attachment_id),
+            )
 
-    def ingestion_state_get(self, source_channel_id: str) -> Optional[str]:
+    def attachments_update_urls(self, urls: dict[str, str]) -> None:
+        """Store a batch of refreshed URLs (attachment_id -> url) in one transaction."""
+        if not urls:
+            return
         with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE attachments SET url=?, url_expires_at=? WHERE attachment_id=?",
+                [(url, cdn_url_expires_at(url), attachment_id) for attachment_id, url in urls.items()],
+            )
+
+    def attachments_clear_url_expiry(self, attachment_ids: list[str]) -> None:
+        """Stop background refresh for URLs Discord would not re-sign (downloads still resolve lazily)."""
+        if not attachment_ids:
+            return
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE attachments SET url_expires_at=NULL WHERE attachment_id=?",
+                [(attachment_id,) for attachment_id in attachment_ids],
+            )
+
+    def attachments_expiring(
+        self,
+        *,
+        expires_before: int,
+        posted_after: str,
+        limit: int,
+        after: Optional[tuple[int, str]] = None,
+    ) -> list[tuple[str, str, int]]:
+        """
+        (attachment_id, url, url_expires_at) for signed URLs expiring before `expires_before`,
+        limited to posts created after `posted_after` (ISO-8601), soonest expiry first.
+
+        Pages by keyset: pass the `(url_expires_at, attachment_id)` of the last row seen.
+        """
+        last_expires_at, last_attachment_id = after if after is not None else (-1, "")
+        with self.reader() as conn:
+            rows = conn.execute(
+                """
+                SELECT a.attachment_id, a.url, a.url_expires_at
+                FROM attachments a
+                JOIN posts p ON p.seq = a.post_seq
+                WHERE a.url_expires_at IS NOT NULL
+                  AND a.url_expires_at < ?
+                  AND (a.url_expires_at, a.attachment_id) > (?, ?)
+                  AND p.created_at > ?
+                ORDER BY a.url_expires_at ASC, a.attachment_id ASC
+                LIMIT ?
+                """,
+                (expires_before, last_expires_at, last_attachment_id, posted_after, limit),
+            ).fetchall()
+        return [(str(r["attachment_id"]), str(r["url"]), int(r["url_expires_at"])) for r in rows]
+
+    def ingestion_state_get(self, source_channel_id: str) -> Optional[str]:
+        with self.reader() as conn:
             row = conn.execute(
                 "SELECT last_message_id FROM ingestion_state WHERE source_channel_id=?",
                 (source_channel_id,),
@@ -514,64 +1012,244 @@ class Database:
 
     def ingestion_state_set(self, *, source_channel_id: str, last_message_id: str) -> None:
         with self.transaction() as conn:
-            conn.execute(
+            conn.execute(_INGESTION_STATE_UPSERT_SQL, (source_channel_id, last_message_id, utc_now_iso()))
+
+    def ingestion_state_all(self) -> dict[str, str]:
+        with self.reader() as conn:
+            rows = conn.execute("SELECT source_channel_id,last_message_id FROM ingestion_state").fetchall()
+            return {str(r["source_channel_id"]): str(r["last_message_id"]) for r in rows}
+
+    def ingest_messages(self, messages: list[IngestMessage]) -> list[Optional[int]]:
+        """
+        Write a batch of Discord messages in one transaction: posts (one executemany),
+        their attachments, and the per-channel ingestion checkpoint.
+
+        Already-ingested messages (same discord_message_id) are not duplicated; their
+        existing seq is returned. Returns one seq per input message, in order.
+        """
+        if not messages:
+            return []
+
+        checkpoints: dict[str, str] = {}
+        for msg in messages:
+            checkpoints[msg.source_channel_id] = msg.discord_message_id
+
+        drafts = [
+            Post(
+                seq=0,  # assigned by the insert; not part of the stored event
+                post_id=str(uuid.uuid4()),
+                author_kind=msg.author_kind,
+                author_id=msg.author_id,
+                author_name=msg.author_name,
+                body=msg.body,
+                created_at=msg.created_at,
+                discord_message_id=msg.discord_message_id,
+                source_channel_id=msg.source_channel_id,
+            )
+            for msg in messages
+        ]
+        drafts = [replace(draft, event_json=event_blob(draft, msg.attachments)) for draft, msg in zip(drafts, messages)]
+        with self.transaction() as conn:
+            prev_heads = {channel_id: _channel_max_seq(conn, channel_id) for channel_id in {m.discord_channel_id for m in messages}}
+            prev_max_seq = max(prev_heads.values())
+            conn.executemany(
                 """
-                INSERT INTO ingestion_state(source_channel_id,last_message_id,updated_at) VALUES(?,?,?)
-                ON CONFLICT(source_channel_id) DO UPDATE SET last_message_id=excluded.last_message_id, updated_at=excluded.updated_at
+                INSERT INTO posts(
+                    post_id,author_kind,author_id,author_name,body,created_at,discord_message_id,discord_channel_id,source_channel_id,
+                    event_json
+                ) VALUES(?,?,?,?,?,?,?,?,?,?)
+                ON CONFLICT(discord_message_id) DO NOTHING
                 """,
-                (source_channel_id, last_message_id, utc_now_iso()),
+                [
+                    (
+                        draft.post_id,
+                        msg.author_kind,
+                        msg.author_id,
+                        msg.author_name,
+                        msg.body,
+                        msg.created_at,
+                        msg.discord_message_id,
+                        msg.discord_channel_id,
+                        msg.source_channel_id,
+                        draft.event_json,
+                    )
+                    for draft, msg in zip(drafts, messages)
+                ],
+            )
+
+            # Resolve seqs for new and previously ingested rows alike.
+            seq_by_key: dict[tuple[str, str], int] = {}
+            message_ids = list({msg.discord_message_id for msg in messages})
+            for i in range(0, len(message_ids), _SQL_IN_CHUNK):
+                chunk = message_ids[i : i + _SQL_IN_CHUNK]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT seq,discord_message_id,discord_channel_id FROM posts WHERE discord_message_id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    seq_by_key[(str(row["discord_message_id"]), str(row["discord_channel_id"]))] = int(row["seq"])
+            seqs = [seq_by_key.get((msg.discord_message_id, msg.discord_channel_id)) for msg in messages]
+
+            # Rows inserted by this batch (seq above the previous maximum) feed the inbox buffer.
+            committed: dict[str, list[PostEntry]] = {}
+            new_seqs: set[int] = set()
+            # Posts stored before this batch that gained an attachment row.
+            rewritten_seqs: set[int] = set()
+            attachment_rows = []
+            for draft, msg, seq in zip(drafts, messages, seqs):
+                if seq is None:
+                    continue
+                attachments = tuple(replace(a, post_seq=seq) for a in msg.attachments)
+                if seq > prev_max_seq and seq not in new_seqs:
+                    new_seqs.add(seq)
+                    attachment_rows.extend(_attachment_row(a) for a in attachments)
+                    post = replace(draft, seq=seq)
+                    committed.setdefault(msg.discord_channel_id, []).append((post, attachments))
+                elif attachments:
+                    # Re-ingests usually find every row present; only a real insert changes the event.
+                    cur = conn.executemany(_ATTACHMENT_INSERT_SQL, [_attachment_row(a) for a in attachments])
+                    if cur.rowcount > 0:
+                        rewritten_seqs.add(seq)
+            if attachment_rows:
+                conn.executemany(_ATTACHMENT_INSERT_SQL, attachment_rows)
+
+            # One checkpoint per source channel per batch (the newest message in it).
+            now_iso = utc_now_iso()
+            conn.executemany(
+                _INGESTION_STATE_UPSERT_SQL,
+                [(source_channel_id, last_message_id, now_iso) for source_channel_id, last_message_id in checkpoints.items()],
             )
 
+            def _on_committed() -> None:
+                for channel_id, entries in committed.items():
+                    entries.sort(key=lambda entry: entry[0].seq)
+                    self._posts_committed(channel_id, prev_heads[channel_id], entries)
+
+            self._on_commit(_on_committed)
+            # After the buffer append above, so buffered entries are replaced too.
+            self._rebuild_events(conn, rewritten_seqs)
+        return seqs
+
     def ingestion_state_source_channels(self) -> list[str]:
-        with self.transaction() as conn:
+        with self.reader() as conn:
             rows = conn.execute("SELECT source_channel_id FROM ingestion_state").fetchall()
             return [str(r["source_channel_id"]) for r in rows]
 
-    def inbox_fetch(self, channel_id: str, cursor: int, limit: int) -> list[Post]:
-        with self.transaction() as conn:
+    def channel_head(self, channel_id: str) -> int:
+        """
+        Highest post seq in a channel (0 when empty), answered from memory.
+
+        Posts written through this `Database` advance the head as soon as they commit.
+        The head is re-read from SQLite at most every `CHANNEL_HEAD_TTL_SECONDS` so that
+        posts written by another process are picked up too.
+        """
+        return self._channel_state(channel_id)[0]
+
+    def channel_revision(self, channel_id: str) -> int:
+        """
+        Counter bumped whenever stored posts of the channel are rewritten (claimed by an
+        agent, attachments added). Cached like `channel_head`.
+        """
+        return self._channel_state(channel_id)[1]
+
+    def _channel_state(self, channel_id: str) -> tuple[int, int]:
+        now = time.monotonic()
+        with self._heads_lock:
+            cached = self._heads.get(channel_id)
+            if cached is not None and now - cached[2] < CHANNEL_HEAD_TTL_SECONDS:
+                return cached[0], cached[1]
+
+        with self.reader() as conn:
+            head = _channel_max_seq(conn, channel_id)
+            revision = _channel_revision(conn, channel_id)
+        rewritten_elsewhere = False
+        with self._heads_lock:
+            current = self._heads.get(channel_id)
+            if current is not None:
+                head = max(head, current[0])
+                # Rewrites through this `Database` bump the cached revision on commit; a
+                # higher one in SQLite means another process rewrote posts we may buffer.
+                rewritten_elsewhere = revision > current[1]
+                revision = max(revision, current[1])
+            self._heads[channel_id] = (head, revision, now)
+        if rewritten_elsewhere:
+            self.recent_posts.discard(channel_id)
+        return head, revision
+
+    def _posts_committed(self, channel_id: str, prev_head: int, entries: list[PostEntry]) -> None:
+        """Commit hook for new posts: advance the channel head and feed the inbox buffer."""
+        last_seq = entries[-1][0].seq
+        with self._heads_lock:
+            current = self._heads.get(channel_id)
+            # Channels not loaded yet are read on first use.
+            if current is not None and last_seq > current[0]:
+                self._heads[channel_id] = (last_seq, current[1], current[2])
+        self.recent_posts.append(channel_id, after_seq=prev_head, entries=entries)
+
+    def inbox_fetch(
+        self,
+        channel_id: str,
+        cursor: int,
+        limit: int,
+        inbox_filter: Optional[InboxFilter] = None,
+    ) -> list[Post]:
+        where = ["discord_channel_id=?", "seq > ?"]
+        params: list[Any] = [channel_id, cursor]
+        if inbox_filter is not None:
+            if inbox_filter.source_channel_id:
+                where.append("source_channel_id=?")
+                params.append(inbox_filter.source_channel_id)
+            if inbox_filter.author_kinds is not None:
+                where.append(f"author_kind IN ({','.join('?' for _ in inbox_filter.author_kinds) or 'NULL'})")
+                params.extend(inbox_filter.author_kinds)
+            if inbox_filter.exclude_agent_id:
+                where.append("NOT (author_kind='agent' AND author_id=?)")
+                params.append(inbox_filter.exclude_agent_id)
+        params.append(limit)
+
+        with self.reader() as conn:
             rows = conn.execute(
-                """
-                SELECT seq, post_id, author_kind, author_id, author_name, body, created_at, discord_message_id, source_channel_id
+                f"""
+                SELECT {_POST_COLUMNS}
                 FROM posts
-                WHERE discord_channel_id=? AND seq > ?
+                WHERE {" AND ".join(where)}
                 ORDER BY seq ASC
                 LIMIT ?
                 """,
-                (channel_id, cursor, limit),
+                params,
             ).fetchall()
+        return [_post(row, channel_id) for row in rows]
 
-        posts: list[Post] = []
-        for row in rows:
-            posts.append(
-                Post(
-                    seq=int(row["seq"]),
-                    post_id=str(row["post_id"]),
-                    author_kind=str(row["author_kind"]),
-                    author_id=str(row["author_id"]),
-                    author_name=row["author_name"],
-                    body=str(row["body"]),
-                    created_at=str(row["created_at"]),
-                    discord_message_id=row["discord_message_id"],
-                    source_channel_id=str(row["source_channel_id"] or channel_id),
-                )
-            )
-        return posts
+    def _invalidate_profile(self) -> None:
+        with self._profile_lock:
+            self._profile_values = None
+            self._profile_generation += 1
 
-    def channel_profile_get(self, *, default_name: str, default_mission: str) -> ChannelProfile:
-        with self.transaction() as conn:
+    def _profile_settings(self) -> dict[str, str]:
+        now = time.monotonic()
+        with self._profile_lock:
+            cached = self._profile_values
+            if cached is not None and now - cached[0] < PROFILE_CACHE_TTL_SECONDS:
+                return cached[1]
+            generation = self._profile_generation
+
+        placeholders = ",".join("?" for _ in _PROFILE_SETTING_KEYS)
+        with self.reader() as conn:
             rows = conn.execute(
-                """
-                SELECT key,value
-                FROM settings
-                WHERE key IN (
-                    'channel_profile_name','channel_profile_mission','channel_profile_updated_at',
-                    'discord_channel_name','discord_channel_topic'
-                )
-                """
+                f"SELECT key,value FROM settings WHERE key IN ({placeholders})",
+                _PROFILE_SETTING_KEYS,
             ).fetchall()
-
         values = {str(r["key"]): str(r["value"]) for r in rows}
 
+        with self._profile_lock:
+            if generation == self._profile_generation:
+                self._profile_values = (now, values)
+        return values
+
+    def channel_profile_get(self, *, default_name: str, default_mission: str) -> ChannelProfile:
+        values = self._profile_settings()
+
         # Resolution order: admin override → env var → Discord metadata → empty
         name = (
             (values.get("channel_profile_name") or "").strip()
@@ -607,5 +1285,6 @@ class Database:
                     ("channel_profile_updated_at", updated_at),
                 ],
             )
+            self._on_commit(self._invalidate_profile)
 
         return ChannelProfile(name=normalized_name, mission=normalized_mission, updated_at=updated_at)
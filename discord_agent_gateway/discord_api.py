@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import time
-from typing import Any, Optional
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
 from urllib.parse import urlparse
 
 import httpx
 
 from . import __version__
+from .rate_limit import DiscordRateLimiter, discord_route_key
 
 
 class DiscordAPIError(RuntimeError):
@@ -15,11 +18,73 @@ class DiscordAPIError(RuntimeError):
         self.status_code = status_code
         self.detail = detail
 
-class DiscordAPI:
-    def __init__(self, *, bot_token: str, api_base: str):
+
+# Longest we will block a caller waiting on a Discord rate limit before failing fast.
+MAX_RATE_LIMIT_WAIT_SECONDS = 10.0
+MAX_ATTEMPTS = 5
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(20.0, connect=10.0)
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.json().get("retry_after"))
+    except Exception:
+        return None
+
+
+def _error_detail(resp: httpx.Response) -> Any:
+    try:
+        return resp.json()
+    except Exception:
+        return {"message": resp.text}
+
+
+def _check_delay(delay: float) -> None:
+    if delay > MAX_RATE_LIMIT_WAIT_SECONDS:
+        raise DiscordAPIError(status_code=429, message="Discord rate limited", detail={"retry_after": round(delay, 3)})
+
+
+def _json_or_raise(resp: httpx.Response, *, message: str) -> dict[str, Any]:
+    if 200 <= resp.status_code < 300:
+        return resp.json() if resp.content else {}
+    raise DiscordAPIError(status_code=resp.status_code, message=message, detail=_error_detail(resp))
+
+
+def _webhook_body(*, content: str, username: Optional[str], avatar_url: Optional[str]) -> dict[str, Any]:
+    body: dict[str, Any] = {
+        "content": content,
+        "allowed_mentions": {"parse": []},
+    }
+    if username:
+        body["username"] = username
+    if avatar_url:
+        body["avatar_url"] = avatar_url
+    return body
+
+
+def _check_download_url(url: str) -> None:
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        raise DiscordAPIError(status_code=400, message="Unsupported URL scheme for download")
+
+
+@dataclass
+class DownloadStream:
+    status_code: int  # 200, or 206 when the CDN honoured a Range request
+    content_length: Optional[int]
+    content_range: Optional[str]
+    chunks: AsyncIterator[bytes]
+
+
+class _DiscordAPIBase:
+    def __init__(self, *, bot_token: str, api_base: str, rate_limiter: Optional[DiscordRateLimiter] = None):
         self._bot_token = bot_token
         self._api_base = api_base.rstrip("/")
-        self._http = httpx.Client(timeout=httpx.Timeout(20.0, connect=10.0))
+        # Shared between the sync and async clients so both see the same buckets.
+        self.rate_limiter = rate_limiter or DiscordRateLimiter()
 
     def _bot_headers(self) -> dict[str, str]:
         return {
@@ -28,38 +93,60 @@ class DiscordAPI:
             "User-Agent": f"discord-agent-gateway/{__version__}",
         }
 
-    def request(
+    def _record(self, route: str, resp: httpx.Response) -> bool:
+        """Feed a response to the tracker; returns True when it was a 429 to retry."""
+        retry_after = _retry_after(resp) if resp.status_code == 429 else None
+        self.rate_limiter.update(route, status_code=resp.status_code, headers=resp.headers, retry_after=retry_after)
+        return resp.status_code == 429
+
+
+class DiscordAPI(_DiscordAPIBase):
+    """Blocking client for the startup calls made before the event loop runs (profile sync)."""
+
+    def __init__(self, *, bot_token: str, api_base: str, rate_limiter: Optional[DiscordRateLimiter] = None):
+        super().__init__(bot_token=bot_token, api_base=api_base, rate_limiter=rate_limiter)
+        self._http = httpx.Client(timeout=_http_timeout())
+
+    def _send(
         self,
         method: str,
         path: str,
         *,
         params: Optional[dict[str, Any]] = None,
         json: Optional[dict[str, Any]] = None,
-    ) -> dict[str, Any]:
-        url = f"{self._api_base}{path}"
-        for _ in range(5):
-            resp = self._http.request(method, url, headers=self._bot_headers(), params=params, json=json)
-
-            if resp.status_code == 429:
-                retry_after = 1.0
-                try:
-                    retry_after = float(resp.json().get("retry_after", 1.0))
-                except Exception:
-                    retry_after = 1.0
-                time.sleep(min(10.0, retry_after))
-                continue
-
-            if 200 <= resp.status_code < 300:
-                return resp.json() if resp.content else {}
-
+    ) -> httpx.Response:
+        """Send one bot-authenticated request through the rate-limit tracker, retrying after 429s."""
+        route = discord_route_key(method, path)
+        headers = self._bot_headers()
+        for _ in range(MAX_ATTEMPTS):
+            delay = self.rate_limiter.reserve(route, global_scope=True)
+            sent = False
             try:
-                err = resp.json()
-            except Exception:
-                err = {"message": resp.text}
-            raise DiscordAPIError(status_code=resp.status_code, message="Discord API error", detail=err)
+                _check_delay(delay)
+                if delay > 0:
+                    time.sleep(delay)
+                sent = True
+                resp = self._http.request(method, f"{self._api_base}{path}", headers=headers, params=params, json=json)
+            except BaseException:
+                # No response to feed back: give the reservation up so the bucket does not leak it.
+                self.rate_limiter.release(route, sent=sent)
+                raise
+            if not self._record(route, resp):
+                return resp
 
         raise DiscordAPIError(status_code=429, message="Discord rate limit retry exhausted")
 
+    def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[dict[str, Any]] = None,
+        json: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        resp = self._send(method, path, params=params, json=json)
+        return _json_or_raise(resp, message="Discord API error")
+
     def get_webhook(self, webhook_id: str) -> Optional[dict[str, Any]]:
         try:
             return self.request("GET", f"/webhooks/{webhook_id}")
@@ -68,33 +155,88 @@ class DiscordAPI:
                 return None
             raise
 
-    def get_webhook_with_token(self, *, webhook_id: str, webhook_token: str) -> Optional[dict[str, Any]]:
-        """
-        Fetch webhook metadata using the webhook token (does not require bot auth).
-        Useful for validating which channel a webhook belongs to.
-        """
-        url = f"{self._api_base}/webhooks/{webhook_id}/{webhook_token}"
-        resp = self._http.get(url)
+    def get_channel(self, *, channel_id: int) -> dict[str, Any]:
+        return self.request("GET", f"/channels/{channel_id}")
+
+
+class AsyncDiscordAPI(_DiscordAPIBase):
+    """
+    Discord client on `httpx.AsyncClient` for the API routes and background workers.
+
+    Rate-limit waits use `asyncio.sleep`, so a slow or throttled Discord call holds no
+    threadpool worker. Pass the sync client's `rate_limiter` to share bucket state.
+    """
+
+    def __init__(self, *, bot_token: str, api_base: str, rate_limiter: Optional[DiscordRateLimiter] = None):
+        super().__init__(bot_token=bot_token, api_base=api_base, rate_limiter=rate_limiter)
+        self._http = httpx.AsyncClient(timeout=_http_timeout())
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        bot_auth: bool,
+        params: Optional[dict[str, Any]] = None,
+        json: Optional[dict[str, Any]] = None,
+    ) -> httpx.Response:
+        route = discord_route_key(method, path)
+        headers = self._bot_headers() if bot_auth else None
+        for _ in range(MAX_ATTEMPTS):
+            delay = self.rate_limiter.reserve(route, global_scope=bot_auth)
+            sent = False
+            try:
+                _check_delay(delay)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent = True
+                resp = await self._http.request(
+                    method, f"{self._api_base}{path}", headers=headers, params=params, json=json
+                )
+            except BaseException:
+                self.rate_limiter.release(route, sent=sent)
+                raise
+            if not self._record(route, resp):
+                return resp
+
+        raise DiscordAPIError(status_code=429, message="Discord rate limit retry exhausted")
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[dict[str, Any]] = None,
+        json: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        resp = await self._send(method, path, bot_auth=True, params=params, json=json)
+        return _json_or_raise(resp, message="Discord API error")
+
+    async def get_webhook_with_token(self, *, webhook_id: str, webhook_token: str) -> Optional[dict[str, Any]]:
+        resp = await self._send("GET", f"/webhooks/{webhook_id}/{webhook_token}", bot_auth=False)
         if resp.status_code == 404:
             return None
-        if 200 <= resp.status_code < 300:
-            return resp.json() if resp.content else {}
-        try:
-            err = resp.json()
-        except Exception:
-            err = {"message": resp.text}
-        raise DiscordAPIError(status_code=resp.status_code, message="Discord webhook error", detail=err)
+        return _json_or_raise(resp, message="Discord webhook error")
 
-    def get_channel(self, *, channel_id: int) -> dict[str, Any]:
-        return self.request("GET", f"/channels/{channel_id}")
+    async def get_channel_message(self, *, channel_id: int, message_id: int) -> dict[str, Any]:
+        return await self.request("GET", f"/channels/{channel_id}/messages/{message_id}")
 
-    def get_channel_message(self, *, channel_id: int, message_id: int) -> dict[str, Any]:
-        return self.request("GET", f"/channels/{channel_id}/messages/{message_id}")
+    async def create_webhook(self, *, channel_id: int, name: str) -> dict[str, Any]:
+        return await self.request("POST", f"/channels/{channel_id}/webhooks", json={"name": name})
 
-    def create_webhook(self, *, channel_id: int, name: str) -> dict[str, Any]:
-        return self.request("POST", f"/channels/{channel_id}/webhooks", json={"name": name})
+    async def refresh_attachment_urls(self, urls: list[str]) -> dict[str, str]:
+        """Re-sign up to 50 CDN URLs; returns {original: refreshed}."""
+        data = await self.request("POST", "/attachments/refresh-urls", json={"attachment_urls": urls})
+        return {
+            str(item["original"]): str(item["refreshed"])
+            for item in data.get("refreshed_urls", []) or []
+            if item.get("original") and item.get("refreshed")
+        }
 
-    def execute_webhook(
+    async def execute_webhook(
         self,
         *,
         webhook_id: str,
@@ -104,46 +246,41 @@ class DiscordAPI:
         avatar_url: Optional[str],
         wait: bool = True,
     ) -> dict[str, Any]:
-        url = f"{self._api_base}/webhooks/{webhook_id}/{webhook_token}"
-        params = {"wait": "true" if wait else "false"}
-        body: dict[str, Any] = {
-            "content": content,
-            "allowed_mentions": {"parse": []},
-        }
-        if username:
-            body["username"] = username
-        if avatar_url:
-            body["avatar_url"] = avatar_url
-
-        for _ in range(5):
-            resp = self._http.post(url, params=params, json=body)
-
-            if resp.status_code == 429:
-                retry_after = 1.0
-                try:
-                    retry_after = float(resp.json().get("retry_after", 1.0))
-                except Exception:
-                    retry_after = 1.0
-                time.sleep(min(10.0, retry_after))
-                continue
-
-            if 200 <= resp.status_code < 300:
-                return resp.json() if (wait and resp.content) else {}
+        resp = await self._send(
+            "POST",
+            f"/webhooks/{webhook_id}/{webhook_token}",
+            bot_auth=False,
+            params={"wait": "true" if wait else "false"},
+            json=_webhook_body(content=content, username=username, avatar_url=avatar_url),
+        )
+        data = _json_or_raise(resp, message="Discord webhook error")
+        return data if wait else {}
 
+    async def open_download(self, url: str, *, byte_range: Optional[str] = None) -> DownloadStream:
+        """
+        Start a CDN download, forwarding `byte_range` as the Range header.
+
+        Upstream errors are raised here, before any bytes are sent to the client.
+        """
+        _check_download_url(url)
+        request = self._http.build_request("GET", url, headers={"Range": byte_range} if byte_range else None)
+        resp = await self._http.send(request, stream=True, follow_redirects=True)
+        if not (200 <= resp.status_code < 300):
+            await resp.aread()
+            await resp.aclose()
+            raise DiscordAPIError(status_code=resp.status_code, message="Download failed", detail=resp.text)
+
+        async def chunks() -> AsyncIterator[bytes]:
             try:
-                err = resp.json()
-            except Exception:
-                err = {"message": resp.text}
-            raise DiscordAPIError(status_code=resp.status_code, message="Discord webhook error", detail=err)
-
-        raise DiscordAPIError(status_code=429, message="Webhook rate limit retry exhausted")
-
-    def iter_download(self, url: str):
-        parsed = urlparse(url)
-        if parsed.scheme not in ("http", "https"):
-            raise DiscordAPIError(status_code=400, message="Unsupported URL scheme for download")
-        with self._http.stream("GET", url, follow_redirects=True) as resp:
-            if not (200 <= resp.status_code < 300):
-                raise DiscordAPIError(status_code=resp.status_code, message="Download failed", detail=resp.text)
-            for chunk in resp.iter_bytes():
-                yield chunk
+                async for chunk in resp.aiter_bytes():
+                    yield chunk
+            finally:
+                await resp.aclose()
+
+        content_length = resp.headers.get("content-length")
+        return DownloadStream(
+            status_code=resp.status_code,
+            content_length=int(content_length) if content_length and content_length.isdigit() else None,
+            content_range=resp.headers.get("content-range"),
+            chunks=chunks(),
+        )
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Iterable
+
+from .models import Attachment, Post
+from .util import json_dumps_bytes
+
+
+ATTACHMENT_DOWNLOAD_PATH = "/v1/attachments/"
+
+# Inside a JSON document an unescaped `"download_url":"` can only be the key itself
+# (quotes in string values are escaped), so relative URLs can be rewritten by replace.
+_RELATIVE_DOWNLOAD_URL = b'"download_url":"' + ATTACHMENT_DOWNLOAD_PATH.encode()
+
+
+def event_payload(post: Post, attachments: Iterable[Attachment]) -> dict[str, Any]:
+    """The agent-independent part of an inbox event (no `seq`, `is_self`; relative download URLs)."""
+    return {
+        "author_kind": post.author_kind,
+        "author_id": post.author_id,
+        "author_name": post.author_name,
+        "is_human": post.author_kind == "human",
+        "body": post.body,
+        "source_channel_id": post.source_channel_id,
+        "created_at": post.created_at,
+        "discord_message_id": post.discord_message_id,
+        "attachments": [
+            {
+                "attachment_id": att.attachment_id,
+                "filename": att.filename,
+                "content_type": att.content_type,
+                "size_bytes": att.size_bytes,
+                "height": att.height,
+                "width": att.width,
+                "download_url": f"{ATTACHMENT_DOWNLOAD_PATH}{att.attachment_id}",
+            }
+            for att in attachments
+        ],
+    }
+
+
+def event_blob(post: Post, attachments: Iterable[Attachment]) -> bytes:
+    """Serialized `event_payload`, stored with the post at write time."""
+    return json_dumps_bytes(event_payload(post, attachments))
+
+
+@lru_cache(maxsize=8)
+def _absolute_download_url(base_url: str) -> bytes:
+    return b'"download_url":"' + json_dumps_bytes(base_url + ATTACHMENT_DOWNLOAD_PATH)[1:-1]
+
+
+def render_event(post: Post, attachments: Iterable[Attachment], *, is_self: bool, base_url: str) -> bytes:
+    """
+    Encoded inbox event for one reader.
+
+    Uses the stored blob when the post has one (built from `attachments` otherwise) and
+    splices in `seq`, the per-agent `is_self` and the gateway's download URL base.
+    """
+    blob = post.event_json if post.event_json is not None else event_blob(post, attachments)
+    head = b'{"seq":%d,"is_self":%s,' % (post.seq, b"true" if is_self else b"false")
+    return head + blob[1:].replace(_RELATIVE_DOWNLOAD_URL, _absolute_download_url(base_url))
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, Optional
+
+import discord
+
+from .config import Settings
+from .db import Database
+from .models import Attachment, IngestMessage
+from .notify import PostNotifier
+
+
+logger = logging.getLogger("discord_agent_gateway.ingest")
+
+
+@dataclass
+class _Pending:
+    messages: list[IngestMessage]
+    # Resolves to one seq for submit()/submit_async(), or a list for submit_many_async().
+    future: Future[Any]
+    enqueued_at: float
+    single: bool
+
+
+class IngestionWriter:
+    """
+    Group-committing writer for Discord messages.
+
+    `submit()` / `submit_async()` enqueue a message and return a future. A single
+    background thread drains the queue, collecting everything that arrives within
+    `max_batch_delay_seconds` (up to `max_batch_size` messages) and writing it with one
+    `Database.ingest_messages` transaction. Futures resolve to the stored seq once the
+    batch has committed.
+
+    The queue is bounded by `max_queue_size`: when SQLite falls behind, producers wait
+    for space (on a worker thread for `submit_async`, so the asyncio loop keeps running).
+    """
+
+    def __init__(
+        self,
+        *,
+        db: Database,
+        notifier: PostNotifier,
+        max_batch_size: int = 256,
+        max_batch_delay_seconds: float = 0.005,
+        max_queue_size: int = 10_000,
+    ):
+        self._db = db
+        self._notifier = notifier
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_batch_delay_seconds = max(0.0, max_batch_delay_seconds)
+        self._queue: queue.Queue[Optional[_Pending]] = queue.Queue(maxsize=max(0, max_queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._backpressure_waits = 0
+        self._max_depth = 0
+        self._batches = 0
+        self._committed = 0
+        self._failed = 0
+        self._max_batch_seen = 0
+        self._latency_seconds_total = 0.0
+        self._latency_seconds_max = 0.0
+        self._latency_seconds_last = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ingestion-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, *, timeout: Optional[float] = 10.0) -> None:
+        """Flush everything already submitted, then stop the writer thread."""
+        if self._thread is None or self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def submit(self, message: IngestMessage) -> Future[Optional[int]]:
+        """Enqueue from a regular thread, blocking while the queue is full."""
+        pending = self._new_pending([message], single=True)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            self._record_backpressure()
+            self._queue.put(pending)
+        self._record_enqueued()
+        return pending.future
+
+    async def submit_async(self, message: IngestMessage) -> Future[Optional[int]]:
+        """Enqueue from the asyncio loop; waits for space off-loop when the queue is full."""
+        return await self._put_async(self._new_pending([message], single=True))
+
+    async def submit_many_async(self, messages: list[IngestMessage]) -> Future[list[Optional[int]]]:
+        """
+        Enqueue a group of messages (e.g. one history page) that is always committed in
+        the same transaction. Resolves to one seq per message.
+        """
+        return await self._put_async(self._new_pending(list(messages), single=False))
+
+    async def _put_async(self, pending: _Pending) -> Future[Any]:
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            self._record_backpressure()
+            await asyncio.to_thread(self._queue.put, pending)
+        self._record_enqueued()
+        return pending.future
+
+    def _new_pending(self, messages: list[IngestMessage], *, single: bool) -> _Pending:
+        if self._thread is None or self._stopping:
+            raise RuntimeError("IngestionWriter is not running")
+        return _Pending(messages=messages, future=Future(), enqueued_at=time.monotonic(), single=single)
+
+    def _record_backpressure(self) -> None:
+        with self._stats_lock:
+            self._backpressure_waits += 1
+
+    def _record_enqueued(self) -> None:
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._enqueued += 1
+            self._max_depth = max(self._max_depth, depth)
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "queue_depth": self._queue.qsize(),
+                "queue_max_depth": self._max_depth,
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self._enqueued,
+                "backpressure_waits": self._backpressure_waits,
+                "batches_committed": self._batches,
+                "messages_committed": self._committed,
+                "messages_failed": self._failed,
+                "max_batch_size_seen": self._max_batch_seen,
+                "commit_latency_ms_avg": (
+                    round(self._latency_seconds_total / self._committed * 1000, 3) if self._committed else None
+                ),
+                "commit_latency_ms_max": round(self._latency_seconds_max * 1000, 3),
+                "commit_latency_ms_last": round(self._latency_seconds_last * 1000, 3),
+            }
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            batch_messages = len(first.messages)
+            stop_after_batch = False
+            deadline = time.monotonic() + self._max_batch_delay_seconds
+            while batch_messages < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop_after_batch = True
+                    break
+                batch.append(nxt)
+                batch_messages += len(nxt.messages)
+
+            try:
+                self._commit(batch)
+            except Exception:
+                # Keep the writer alive for later submissions whatever happens to one batch.
+                logger.exception("Ingestion writer failed to settle a batch")
+            if stop_after_batch:
+                return
+
+    def _commit(self, batch: list[_Pending]) -> None:
+        messages = [msg for pending in batch for msg in pending.messages]
+        try:
+            seqs = self._db.ingest_messages(messages)
+        except Exception as exc:
+            logger.exception("Failed to ingest batch of %s message(s)", len(messages))
+            with self._stats_lock:
+                self._failed += len(messages)
+            for pending in batch:
+                if _claim(pending.future):
+                    pending.future.set_exception(exc)
+            return
+
+        committed_at = time.monotonic()
+        with self._stats_lock:
+            self._batches += 1
+            self._committed += len(messages)
+            self._max_batch_seen = max(self._max_batch_seen, len(messages))
+            for pending in batch:
+                latency = committed_at - pending.enqueued_at
+                self._latency_seconds_total += latency * len(pending.messages)
+                self._latency_seconds_max = max(self._latency_seconds_max, latency)
+            self._latency_seconds_last = committed_at - batch[-1].enqueued_at
+
+        offset = 0
+        for pending in batch:
+            group = seqs[offset : offset + len(pending.messages)]
+            offset += len(pending.messages)
+            if _claim(pending.future):
+                pending.future.set_result(group[0] if pending.single else group)
+
+        committed = [seq for seq in seqs if seq is not None]
+        if committed:
+            self._notifier.notify(max(committed))
+
+
+def _claim(future: Future[Any]) -> bool:
+    """
+    Mark a pending future as running so it can be settled; False if it was cancelled.
+
+    `asyncio.wrap_future` cancels the underlying future when the awaiting task is
+    cancelled (e.g. backfill at shutdown); the write still happened, nobody is waiting.
+    """
+    try:
+        return future.set_running_or_notify_cancel()
+    except RuntimeError:
+        return False  # already settled
+
+
+def ingest_message_from_discord(*, message: discord.Message, settings: Settings) -> Optional[IngestMessage]:
+    root_channel_id = str(settings.discord_channel_id)
+    source_channel_id = str(getattr(message.channel, "id", settings.discord_channel_id))
+
+    if message.id is None:
+        return None
+    msg_id = str(message.id)
+
+    if message.webhook_id is not None:
+        author_kind = "webhook"
+        author_id = str(message.webhook_id)
+    elif message.author.bot:
+        author_kind = "bot"
+        author_id = str(message.author.id)
+    else:
+        author_kind = "human"
+        author_id = str(message.author.id)
+
+    author_name = (
+        getattr(message.author, "display_name", None)
+        or getattr(message.author, "name", None)
+        or str(message.author)
+    )
+
+    body = (message.content or "").strip()
+    created_at = message.created_at.replace(tzinfo=timezone.utc).isoformat()
+
+    attachments = list(getattr(message, "attachments", []) or [])
+
+    if not body and not attachments:
+        return None
+
+    return IngestMessage(
+        author_kind=author_kind,
+        author_id=author_id,
+        author_name=author_name,
+        body=body,
+        created_at=created_at,
+        discord_message_id=msg_id,
+        discord_channel_id=root_channel_id,
+        source_channel_id=source_channel_id,
+        attachments=tuple(
+            Attachment(
+                attachment_id=str(a.id),
+                post_seq=0,  # assigned by Database.ingest_messages
+                discord_message_id=msg_id,
+                source_channel_id=source_channel_id,
+                filename=str(getattr(a, "filename", "")) or "attachment",
+                url=str(getattr(a, "url", "")) or None,
+                proxy_url=str(getattr(a, "proxy_url", "")) or None,
+                content_type=getattr(a, "content_type", None),
+                size_bytes=(int(getattr(a, "size", 0) or 0) or None),
+                height=(int(getattr(a, "height", 0) or 0) or None),
+                width=(int(getattr(a, "width", 0) or 0) or None),
+            )
+            for a in attachments
+        ),
+    )
+
+
+async def enqueue_discord_message(
+    *,
+    message: discord.Message,
+    settings: Settings,
+    writer: IngestionWriter,
+) -> Optional[Future[Optional[int]]]:
+    """Queue a message for the ingestion writer; returns the commit future (None if skipped)."""
+    record = ingest_message_from_discord(message=message, settings=settings)
+    if record is None:
+        return None
+    return await writer.submit_async(record)
@@ -37,6 +37,8 @@ class Post:
     created_at: str
     discord_message_id: Optional[str]
     source_channel_id: str
+    # Serialized event (see events.event_blob); None for rows written before it existed.
+    event_json: Optional[bytes] = None
 
 
 @dataclass(frozen=True)
@@ -54,6 +56,69 @@ class Attachment:
     width: Optional[int]
 
 
+@dataclass(frozen=True)
+class InboxFilter:
+    """Optional inbox restrictions; applied in SQL by `Database.inbox_fetch`."""
+
+    source_channel_id: Optional[str] = None
+    author_kinds: Optional[tuple[str, ...]] = None
+    exclude_agent_id: Optional[str] = None  # drop this agent's own posts
+
+    @property
+    def active(self) -> bool:
+        return bool(self.source_channel_id or self.author_kinds is not None or self.exclude_agent_id)
+
+    def matches(self, post: Post) -> bool:
+        if self.source_channel_id and post.source_channel_id != self.source_channel_id:
+            return False
+        if self.author_kinds is not None and post.author_kind not in self.author_kinds:
+            return False
+        if self.exclude_agent_id and post.author_kind == "agent" and post.author_id == self.exclude_agent_id:
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class InboxPage:
+    cursor: int
+    next_cursor: int
+    head_seq: int
+    has_more: bool
+    events: list[tuple[int, bytes]]  # (seq, encoded event)
+    revision: int = 0  # channel rewrite counter read before the events (see Database.channel_revision)
+
+
+@dataclass(frozen=True)
+class IngestMessage:
+    """A Discord message ready to be written; attachment `post_seq` is assigned at write time."""
+
+    author_kind: str
+    author_id: str
+    author_name: Optional[str]
+    body: str
+    created_at: str
+    discord_message_id: str
+    discord_channel_id: str
+    source_channel_id: str
+    attachments: tuple[Attachment, ...] = ()
+
+
+@dataclass(frozen=True)
+class OutboxJob:
+    job_id: str
+    agent_id: str
+    body: str
+    status: str  # 'queued' | 'sending' | 'sent' | 'failed'
+    chunks_total: int
+    chunks_sent: int
+    attempts: int
+    last_seq: Optional[int]
+    last_discord_message_id: Optional[str]
+    error: Optional[str]
+    created_at: str
+    updated_at: str
+
+
 @dataclass(frozen=True)
 class Invite:
     invite_id: str
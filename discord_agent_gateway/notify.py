@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+
+class PostNotifier:
+    """
+    In-process wakeups for long-polling readers.
+
+    Writers (the Discord bot thread, API worker threads) call `notify(seq)` after a post
+    is committed. Readers park in `wait_for(cursor, timeout)` on the API event loop until
+    a post with `seq > cursor` has been announced or the timeout elapses.
+
+    Only writes made by this process are observed. When the bot runs in a separate
+    process (`--mode api` + `--mode bot`), nothing is announced, so callers must keep
+    each wait short and re-read the DB after every timeout (the API routes do this
+    every `LONG_POLL_RECHECK_SECONDS`).
+    """
+
+    def __init__(self, *, latest_seq: int = 0):
+        self._lock = threading.Lock()
+        self._latest_seq = latest_seq
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = set()
+
+    @property
+    def latest_seq(self) -> int:
+        with self._lock:
+            return self._latest_seq
+
+    def notify(self, seq: int) -> None:
+        with self._lock:
+            if seq <= self._latest_seq:
+                return
+            self._latest_seq = seq
+            waiters = list(self._waiters)
+            self._waiters.clear()
+
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, fut)
+            except RuntimeError:
+                # Loop already closed (shutdown); nothing left to wake.
+                continue
+
+    async def wait_for(self, cursor: int, *, timeout: float) -> bool:
+        """
+        Wait until a post newer than `cursor` has been announced.
+
+        Returns True when woken by a newer post, False on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + max(0.0, timeout)
+
+        while True:
+            fut: asyncio.Future[None] = loop.create_future()
+            entry = (loop, fut)
+            with self._lock:
+                if self._latest_seq > cursor:
+                    return True
+                self._waiters.add(entry)
+
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(fut, timeout=remaining)
+                except asyncio.TimeoutError:
+                    return False
+            finally:
+                with self._lock:
+                    self._waiters.discard(entry)
+
+
+def _resolve(fut: asyncio.Future[None]) -> None:
+    if not fut.done():
+        fut.set_result(None)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import threading
+from typing import Any, Optional
+
+from .config import Settings
+from .db import Database
+from .discord_api import DiscordAPIError
+from .models import Agent, OutboxJob
+from .notify import PostNotifier
+from .util import split_for_discord, utc_now_iso
+
+
+logger = logging.getLogger("discord_agent_gateway.outbox")
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_IDLE_POLL_SECONDS = 5.0
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 1.0
+OUTBOX_RETRY_MAX_SECONDS = 60.0
+
+
+async def send_post_chunk(
+    *,
+    settings: Settings,
+    db: Database,
+    webhooks: Any,
+    notifier: PostNotifier,
+    agent: Agent,
+    chunk: str,
+) -> tuple[Optional[int], Optional[str]]:
+    """
+    Deliver one chunk through the gateway webhook and record it as the agent's post.
+
+    Returns `(seq, discord_message_id)`. Shared by the synchronous `/v1/post` path and
+    the outbox dispatcher.
+    """
+    resp = await webhooks.execute(
+        content=chunk,
+        username=agent.name,
+        avatar_url=agent.avatar_url,
+        wait=True,
+    )
+    return await record_post_chunk(
+        settings=settings,
+        db=db,
+        notifier=notifier,
+        agent=agent,
+        chunk=chunk,
+        discord_message_id=str(resp.get("id") or "") or None,
+    )
+
+
+async def record_post_chunk(
+    *,
+    settings: Settings,
+    db: Database,
+    notifier: PostNotifier,
+    agent: Agent,
+    chunk: str,
+    discord_message_id: Optional[str],
+) -> tuple[Optional[int], Optional[str]]:
+    """Record a chunk Discord accepted as the agent's post; returns `(seq, discord_message_id)`."""
+    msg_id = discord_message_id
+    channel_id = str(settings.discord_channel_id)
+
+    seq = await asyncio.to_thread(
+        db.post_insert,
+        author_kind="agent",
+        author_id=agent.agent_id,
+        author_name=agent.name,
+        body=chunk,
+        created_at=utc_now_iso(),
+        discord_message_id=msg_id,
+        discord_channel_id=channel_id,
+        source_channel_id=channel_id,
+    )
+    if seq is None and msg_id:
+        # The bot ingested the webhook message first; claim it for the agent.
+        seq = await asyncio.to_thread(
+            db.post_mark_as_agent_by_discord_message_id,
+            discord_message_id=msg_id,
+            discord_channel_id=channel_id,
+            agent_id=agent.agent_id,
+            agent_name=agent.name,
+        )
+    if seq is not None:
+        notifier.notify(seq)
+    return seq, msg_id
+
+
+class OutboxDispatcher:
+    """
+    Background delivery for `POST /v1/post?async=true`.
+
+    Jobs are persisted in the `outbox` table before the request returns, then delivered
+    by asyncio tasks on the API loop: one lane per agent delivers that agent's jobs in
+    submission order, and up to `OUTBOX_WORKERS` lanes send at once, so one agent's
+    backoff or slow post does not hold up the others. Progress is checkpointed per
+    chunk, so a restart resumes from the first undelivered chunk (a crash between
+    Discord accepting a chunk and the checkpoint can repeat that chunk); a failed
+    checkpoint is retried without sending the chunk again. Transient Discord failures
+    (429/5xx, network errors) are retried with backoff; other errors fail the job.
+    """
+
+    def __init__(self, *, settings: Settings, db: Database, webhooks: Any, notifier: PostNotifier):
+        self._settings = settings
+        self._db = db
+        self._webhooks = webhooks
+        self._notifier = notifier
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._workers = asyncio.Semaphore(settings.outbox_workers)
+        self._lanes: dict[str, asyncio.Task[None]] = {}
+        # Chunks Discord accepted whose checkpoint may not be in the table yet, by job.
+        self._progress: dict[str, int] = {}
+
+        self._stats_lock = threading.Lock()
+        self._delivered = 0
+        self._failed = 0
+        self._retries = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="outbox-dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Signal that a job was enqueued (call from the API event loop)."""
+        self._wake.set()
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "running": self._task is not None and not self._task.done(),
+                "active_agents": len(self._lanes),
+                "delivered": self._delivered,
+                "failed": self._failed,
+                "retries": self._retries,
+            }
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                self._wake.clear()
+                try:
+                    jobs = await asyncio.to_thread(
+                        self._db.outbox_pending, OUTBOX_BATCH_SIZE, exclude_agent_ids=tuple(self._lanes)
+                    )
+                except Exception:
+                    logger.exception("Failed to load outbox jobs")
+                    jobs = []
+
+                by_agent: dict[str, list[OutboxJob]] = {}
+                for job in jobs:
+                    by_agent.setdefault(job.agent_id, []).append(job)
+                for agent_id, agent_jobs in by_agent.items():
+                    lane = asyncio.create_task(self._drain(agent_jobs), name=f"outbox-agent-{agent_id}")
+                    self._lanes[agent_id] = lane
+                    lane.add_done_callback(functools.partial(self._lane_done, agent_id))
+
+                # Woken by new jobs and by finished lanes (whose agents may have more queued).
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=OUTBOX_IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            lanes = list(self._lanes.values())
+            for lane in lanes:
+                lane.cancel()
+            await asyncio.gather(*lanes, return_exceptions=True)
+
+    def _lane_done(self, agent_id: str, _lane: asyncio.Task[None]) -> None:
+        self._lanes.pop(agent_id, None)
+        self._wake.set()
+
+    async def _drain(self, jobs: list[OutboxJob]) -> None:
+        """Deliver one agent's jobs in order, stopping at the first one to retry later."""
+        for job in jobs:
+            try:
+                async with self._workers:
+                    backoff = await self._deliver(job)
+            except Exception:
+                logger.exception("Outbox bookkeeping failed job_id=%s", job.job_id)
+                backoff = OUTBOX_RETRY_BASE_SECONDS
+            if backoff > 0:
+                # Keep ordering: retry this job before anything the agent queued after it.
+                await asyncio.sleep(backoff)
+                return
+
+    async def _deliver(self, job: OutboxJob) -> float:
+        """Deliver a job; returns a backoff delay when it should be retried later."""
+        agent = await asyncio.to_thread(self._db.agent_get, job.agent_id)
+        if agent is None:
+            await asyncio.to_thread(self._db.outbox_record_attempt, job.job_id, error="Agent revoked", failed=True)
+            self._count(failed=1)
+            return 0.0
+
+        chunks = split_for_discord(job.body, max_len=self._settings.discord_max_message_len)
+        for index in range(max(job.chunks_sent, self._progress.get(job.job_id, 0)), len(chunks)):
+            try:
+                resp = await self._webhooks.execute(
+                    content=chunks[index],
+                    username=agent.name,
+                    avatar_url=agent.avatar_url,
+                    wait=True,
+                )
+            except Exception as exc:
+                return await self._record_failure(job, exc)
+
+            # Discord has the chunk: it is never sent again, even if recording it fails below.
+            self._progress[job.job_id] = index + 1
+            seq, msg_id = await record_post_chunk(
+                settings=self._settings,
+                db=self._db,
+                notifier=self._notifier,
+                agent=agent,
+                chunk=chunks[index],
+                discord_message_id=str(resp.get("id") or "") or None,
+            )
+            await asyncio.to_thread(
+                self._db.outbox_record_chunk,
+                job.job_id,
+                chunks_sent=index + 1,
+                last_seq=seq,
+                last_discord_message_id=msg_id,
+            )
+
+        await asyncio.to_thread(self._db.outbox_mark_sent, job.job_id)
+        self._progress.pop(job.job_id, None)
+        self._count(delivered=1)
+        return 0.0
+
+    async def _record_failure(self, job: OutboxJob, exc: Exception) -> float:
+        if isinstance(exc, DiscordAPIError):
+            error = f"Discord error {exc.status_code}: {exc.detail if exc.detail is not None else exc}"
+            retryable = exc.status_code == 429 or exc.status_code >= 500
+        else:
+            logger.exception("Outbox delivery failed job_id=%s", job.job_id)
+            error = f"{type(exc).__name__}: {exc}"
+            retryable = True
+
+        attempts = job.attempts + 1
+        failed = not retryable or attempts >= OUTBOX_MAX_ATTEMPTS
+        await asyncio.to_thread(self._db.outbox_record_attempt, job.job_id, error=error, failed=failed)
+        if failed:
+            logger.warning("Outbox job failed job_id=%s attempts=%s error=%s", job.job_id, attempts, error)
+            self._progress.pop(job.job_id, None)
+            self._count(failed=1)
+            return 0.0
+        self._count(retries=1)
+        return min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+    def _count(self, *, delivered: int = 0, failed: int = 0, retries: int = 0) -> None:
+        with self._stats_lock:
+            self._delivered += delivered
+            self._failed += failed
+            self._retries += retries
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import sys
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass, field, fields
+from typing import Any, Optional
+
+from .models import Attachment, InboxFilter, Post
+
+
+PostEntry = tuple[Post, tuple[Attachment, ...]]
+
+
+def _approx_size(entry: PostEntry) -> int:
+    post, attachments = entry
+    size = sys.getsizeof(post) + sum(sys.getsizeof(getattr(post, f.name)) for f in fields(post))
+    for att in attachments:
+        size += sys.getsizeof(att) + sum(sys.getsizeof(getattr(att, f.name)) for f in fields(att))
+    return size
+
+
+@dataclass
+class _Window:
+    floor: int  # every post of the channel with floor < seq <= last is held
+    seqs: list[int] = field(default_factory=list)
+    entries: list[PostEntry] = field(default_factory=list)
+    sizes: list[int] = field(default_factory=list)
+
+    @property
+    def last(self) -> int:
+        return self.seqs[-1] if self.seqs else self.floor
+
+
+class RecentPostsBuffer:
+    """
+    Bounded in-memory window of the newest posts per channel, attachments included.
+
+    `Database` feeds it from its commit path while still holding the writer lock, so
+    entries arrive in seq order. Each channel's window holds every post with
+    `floor < seq <= last`; a commit that does not continue from `last` (posts written by
+    another process in between) restarts the window, and `Database` discards it when
+    another process rewrites the channel's posts. Reads inside the window are served from
+    memory; anything older, or a window that is behind the known head, returns None and
+    the caller falls back to SQLite.
+    """
+
+    def __init__(self, *, capacity: int):
+        self._capacity = max(0, capacity)
+        self._lock = threading.Lock()
+        self._windows: dict[str, _Window] = {}
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._resets = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._capacity > 0
+
+    def append(self, channel_id: str, *, after_seq: int, entries: list[PostEntry]) -> None:
+        """Record posts just committed; `after_seq` is the channel's head before them."""
+        if not self.enabled or not entries:
+            return
+        with self._lock:
+            window = self._windows.get(channel_id)
+            if window is None or window.last != after_seq:
+                if window is not None:
+                    self._bytes -= sum(window.sizes)
+                    self._resets += 1
+                window = _Window(floor=after_seq)
+                self._windows[channel_id] = window
+            for entry in entries:
+                size = _approx_size(entry)
+                window.seqs.append(entry[0].seq)
+                window.entries.append(entry)
+                window.sizes.append(size)
+                self._bytes += size
+
+            overflow = len(window.seqs) - self._capacity
+            if overflow > 0:
+                window.floor = window.seqs[overflow - 1]
+                self._bytes -= sum(window.sizes[:overflow])
+                del window.seqs[:overflow]
+                del window.entries[:overflow]
+                del window.sizes[:overflow]
+
+    def update(self, channel_id: str, post: Post, attachments: Optional[tuple[Attachment, ...]] = None) -> None:
+        """
+        Replace a buffered post in place (e.g. a webhook message claimed by an agent),
+        and its attachments when given.
+        """
+        with self._lock:
+            window = self._windows.get(channel_id)
+            if window is None:
+                return
+            index = bisect_right(window.seqs, post.seq) - 1
+            if index < 0 or window.seqs[index] != post.seq:
+                return
+            entry = (post, window.entries[index][1] if attachments is None else attachments)
+            size = _approx_size(entry)
+            self._bytes += size - window.sizes[index]
+            window.entries[index] = entry
+            window.sizes[index] = size
+
+    def discard(self, channel_id: str) -> None:
+        """Forget a channel's window (its posts were rewritten elsewhere); reads fall back until the next append."""
+        with self._lock:
+            window = self._windows.pop(channel_id, None)
+            if window is not None:
+                self._bytes -= sum(window.sizes)
+                self._resets += 1
+
+    def read(
+        self,
+        channel_id: str,
+        *,
+        cursor: int,
+        limit: int,
+        head_seq: int,
+        inbox_filter: Optional[InboxFilter] = None,
+    ) -> Optional[list[PostEntry]]:
+        """Up to `limit` (matching) posts after `cursor`, or None when the window cannot answer."""
+        with self._lock:
+            window = self._windows.get(channel_id)
+            if window is None or cursor < window.floor or window.last != head_seq:
+                self._misses += 1
+                return None
+            self._hits += 1
+            start = bisect_right(window.seqs, cursor)
+            if inbox_filter is None or not inbox_filter.active:
+                return window.entries[start : start + limit]
+            matched: list[PostEntry] = []
+            for entry in window.entries[start:]:
+                if inbox_filter.matches(entry[0]):
+                    matched.append(entry)
+                    if len(matched) >= limit:
+                        break
+            return matched
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            reads = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "capacity_per_channel": self._capacity,
+                "channels": len(self._windows),
+                "entries": sum(len(w.seqs) for w in self._windows.values()),
+                "approx_bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / reads, 4) if reads else None,
+                "resets": self._resets,
+            }
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import bisect
 import threading
 import time
 from collections import deque
+from typing import Any, Mapping, Optional
 
 
 class SlidingWindowRateLimiter:
@@ -23,3 +25,250 @@ class SlidingWindowRateLimiter:
                 return False
             q.append(now)
             return True
+
+
+_MAJOR_PARAM_RESOURCES = {"channels", "guilds", "webhooks"}
+
+
+def discord_route_key(method: str, path: str) -> str:
+    """
+    Normalize a Discord API path into a rate-limit route key.
+
+    Major parameters (channel, guild, webhook ids) are kept because Discord buckets
+    per major parameter; other ids and webhook tokens are collapsed.
+    """
+    segments = [seg for seg in path.split("?", 1)[0].strip("/").split("/") if seg]
+    out: list[str] = []
+    for i, seg in enumerate(segments):
+        prev = segments[i - 1] if i > 0 else ""
+        if prev in _MAJOR_PARAM_RESOURCES:
+            out.append(seg)
+        elif i >= 2 and segments[i - 2] == "webhooks":
+            out.append(":token")
+        elif seg.isdigit():
+            out.append(":id")
+        else:
+            out.append(seg)
+    return f"{method.upper()} /{'/'.join(out)}"
+
+
+def _major_params(route_key: str) -> str:
+    segments = route_key.split(" ", 1)[-1].strip("/").split("/")
+    return "/".join(
+        f"{segments[i - 1]}/{seg}" for i, seg in enumerate(segments) if i > 0 and segments[i - 1] in _MAJOR_PARAM_RESOURCES
+    )
+
+
+class _Bucket:
+    __slots__ = (
+        "limit",
+        "remaining",
+        "window_seconds",
+        "window_start",
+        "reset_at",
+        "inflight",
+        "requests",
+        "delayed",
+        "delay_seconds_total",
+        "rate_limited",
+    )
+
+    def __init__(self) -> None:
+        self.limit = 1
+        self.remaining = 1
+        self.window_seconds = 1.0
+        self.window_start = 0.0
+        self.reset_at = 0.0
+        self.inflight = 0
+        self.requests = 0
+        self.delayed = 0
+        self.delay_seconds_total = 0.0
+        self.rate_limited = 0
+
+
+class DiscordRateLimiter:
+    """
+    Proactive tracker for Discord's per-route buckets and the global limit.
+
+    Callers `reserve()` a slot before each request and sleep for the returned delay
+    (time.sleep or asyncio.sleep), then feed the response back via `update()`, or call
+    `release()` when no response arrives (the wait was refused, the request failed or
+    was cancelled).
+    Buckets are learned from `X-RateLimit-*` headers; until a route's bucket is known,
+    requests on it are not delayed. State is shared across threads behind one lock.
+    """
+
+    def __init__(self, *, global_per_second: int = 50):
+        self._lock = threading.Lock()
+        self._global_per_second = global_per_second
+        self._global_sends: list[float] = []
+        self._global_blocked_until = 0.0
+        self._global_delayed = 0
+        self._global_rate_limited = 0
+        self._route_buckets: dict[str, str] = {}
+        self._buckets: dict[str, _Bucket] = {}
+
+    def _bucket_key_locked(self, route_key: str) -> Optional[str]:
+        bucket_hash = self._route_buckets.get(route_key)
+        if bucket_hash is None:
+            return None
+        return f"{bucket_hash}:{_major_params(route_key)}"
+
+    def reserve(self, route_key: str, *, global_scope: bool = True) -> float:
+        """Claim a request slot and return how many seconds to wait before sending."""
+        now = time.monotonic()
+        with self._lock:
+            send_at = now
+
+            bucket_key = self._bucket_key_locked(route_key)
+            bucket = self._buckets.get(bucket_key) if bucket_key else None
+            if bucket is not None:
+                if now >= bucket.reset_at:
+                    bucket.window_start = now
+                    bucket.reset_at = now + bucket.window_seconds
+                    bucket.remaining = bucket.limit
+                if bucket.remaining <= 0:
+                    # Schedule into the next window instead of sending into a 429.
+                    bucket.window_start = bucket.reset_at
+                    bucket.reset_at = bucket.window_start + bucket.window_seconds
+                    bucket.remaining = bucket.limit
+                bucket.remaining -= 1
+                bucket.inflight += 1
+                send_at = max(send_at, bucket.window_start)
+
+            if global_scope:
+                bucket_send_at = send_at
+                send_at = max(send_at, self._global_blocked_until)
+                # Scheduled send times stay sorted; keep the last second plus anything queued ahead.
+                while self._global_sends and self._global_sends[0] <= now - 1.0:
+                    self._global_sends.pop(0)
+                if len(self._global_sends) >= self._global_per_second:
+                    send_at = max(send_at, self._global_sends[-self._global_per_second] + 1.0)
+                bisect.insort(self._global_sends, send_at)
+                if send_at > bucket_send_at:
+                    self._global_delayed += 1
+
+            delay = send_at - now
+            if bucket is not None:
+                bucket.requests += 1
+                if delay > 0:
+                    bucket.delayed += 1
+                    bucket.delay_seconds_total += delay
+            return max(0.0, delay)
+
+    def release(self, route_key: str, *, sent: bool = False) -> None:
+        """
+        Drop a reservation that will never see a response.
+
+        Unless the request may have reached Discord (`sent`), its slot is also given back
+        to the current window.
+        """
+        with self._lock:
+            bucket_key = self._bucket_key_locked(route_key)
+            bucket = self._buckets.get(bucket_key) if bucket_key else None
+            if bucket is None:
+                return
+            bucket.inflight = max(0, bucket.inflight - 1)
+            if not sent:
+                bucket.remaining = min(bucket.limit, bucket.remaining + 1)
+
+    def peek_delay(self, route_key: str, *, global_scope: bool = True) -> float:
+        """Delay a `reserve()` on this route would get right now, without claiming a slot."""
+        now = time.monotonic()
+        with self._lock:
+            ready_at = now
+            bucket_key = self._bucket_key_locked(route_key)
+            bucket = self._buckets.get(bucket_key) if bucket_key else None
+            if bucket is not None and now < bucket.reset_at:
+                ready_at = bucket.window_start if bucket.remaining > 0 else bucket.reset_at
+            if global_scope:
+                ready_at = max(ready_at, self._global_blocked_until)
+            return max(0.0, ready_at - now)
+
+    def update(
+        self,
+        route_key: str,
+        *,
+        status_code: int,
+        headers: Mapping[str, str],
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """Learn bucket state from a response (and back off after a 429)."""
+        now = time.monotonic()
+        bucket_hash = headers.get("x-ratelimit-bucket")
+        limit = _parse_float(headers.get("x-ratelimit-limit"))
+        remaining = _parse_float(headers.get("x-ratelimit-remaining"))
+        reset_after = _parse_float(headers.get("x-ratelimit-reset-after"))
+        is_global = str(headers.get("x-ratelimit-global", "")).lower() == "true"
+        if retry_after is None:
+            retry_after = _parse_float(headers.get("retry-after"))
+
+        with self._lock:
+            if status_code == 429 and is_global:
+                self._global_rate_limited += 1
+                self._global_blocked_until = max(self._global_blocked_until, now + (retry_after or 1.0))
+                return
+
+            if bucket_hash:
+                self._route_buckets[route_key] = bucket_hash
+            elif status_code == 429:
+                # 429 without bucket headers: track the route on its own so retries still wait.
+                self._route_buckets.setdefault(route_key, route_key)
+            bucket_key = self._bucket_key_locked(route_key)
+            if bucket_key is None:
+                return
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = _Bucket()
+
+            bucket.inflight = max(0, bucket.inflight - 1)
+            if limit is not None:
+                bucket.limit = max(1, int(limit))
+            if reset_after is not None:
+                bucket.window_seconds = max(bucket.window_seconds, reset_after)
+                # Only trust server counters for the window we are currently sending in;
+                # reservations already scheduled into a later window keep their slots.
+                if bucket.window_start <= now:
+                    bucket.reset_at = now + reset_after
+                    if remaining is not None:
+                        # Requests still in flight are not yet reflected in the server's count.
+                        bucket.remaining = max(0, int(remaining) - bucket.inflight)
+
+            if status_code == 429:
+                bucket.rate_limited += 1
+                bucket.remaining = 0
+                bucket.window_start = now
+                bucket.reset_at = max(bucket.reset_at, now + (retry_after or reset_after or 1.0))
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "global": {
+                    "blocked_for_seconds": round(max(0.0, self._global_blocked_until - now), 3),
+                    "delayed": self._global_delayed,
+                    "rate_limited": self._global_rate_limited,
+                },
+                "routes": dict(self._route_buckets),
+                "buckets": {
+                    key: {
+                        "limit": b.limit,
+                        "remaining": max(0, b.remaining) if b.reset_at > now else b.limit,
+                        "reset_in_seconds": round(max(0.0, b.reset_at - now), 3),
+                        "requests": b.requests,
+                        "delayed": b.delayed,
+                        "delay_seconds_total": round(b.delay_seconds_total, 3),
+                        "rate_limited": b.rate_limited,
+                    }
+                    for key, b in self._buckets.items()
+                },
+            }
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from .db import Database
+
+
+logger = logging.getLogger("discord_agent_gateway.receipts")
+
+
+class ReceiptStore:
+    """
+    In-memory agent cursors with batched write-back.
+
+    Reads are answered from memory once an agent's receipt has been loaded. Acks only
+    ever move a cursor forward and mark it dirty; dirty cursors are written in one
+    transaction every `flush_interval_seconds` and when the API shuts down. A crash can
+    lose at most one interval of acks, which agents see as re-delivered events
+    (at-least-once). With `flush_interval_seconds <= 0` every ack is written through.
+
+    Receipts are only written by the API process, so memory stays authoritative.
+    """
+
+    def __init__(self, *, db: Database, flush_interval_seconds: float):
+        self._db = db
+        self._flush_interval_seconds = flush_interval_seconds
+        self._lock = threading.Lock()
+        self._cursors: dict[str, int] = {}
+        self._dirty: dict[str, int] = {}
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task[None]] = None
+
+        self._reads = 0
+        self._loads = 0
+        self._acks = 0
+        self._stale_acks = 0
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._flush_failures = 0
+        self._last_flush_ms: Optional[float] = None
+
+    @property
+    def write_through(self) -> bool:
+        return self._flush_interval_seconds <= 0
+
+    def get(self, agent_id: str) -> int:
+        with self._lock:
+            self._reads += 1
+            cursor = self._cursors.get(agent_id)
+        if cursor is not None:
+            return cursor
+        return self._load(agent_id)
+
+    def _load(self, agent_id: str) -> int:
+        stored = self._db.receipt_get(agent_id)
+        with self._lock:
+            self._loads += 1
+            # An ack may have landed while we were reading.
+            cursor = max(stored, self._cursors.get(agent_id, 0))
+            self._cursors[agent_id] = cursor
+            return cursor
+
+    def advance(self, agent_id: str, cursor: int) -> int:
+        """Move the agent's cursor forward to `cursor`; returns the stored cursor."""
+        current = self.get(agent_id)
+        with self._lock:
+            self._acks += 1
+            current = max(current, self._cursors.get(agent_id, 0))
+            if cursor <= current:
+                self._stale_acks += int(cursor < current)
+                return current
+            self._cursors[agent_id] = cursor
+            self._dirty[agent_id] = cursor
+        if self.write_through:
+            self.flush()
+        return cursor
+
+    def flush(self) -> int:
+        """Write dirty cursors in one transaction; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+            started = time.perf_counter()
+            try:
+                self._db.receipts_advance(dirty)
+            except Exception:
+                with self._lock:
+                    for agent_id, cursor in dirty.items():
+                        self._dirty[agent_id] = max(cursor, self._dirty.get(agent_id, 0))
+                    self._flush_failures += 1
+                raise
+            with self._lock:
+                self._flushes += 1
+                self._rows_flushed += len(dirty)
+                self._last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+            return len(dirty)
+
+    def start(self) -> None:
+        if self._task is None and not self.write_through:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="receipt-flusher")
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still dirty."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval_seconds)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                logger.exception("Failed to flush receipts; will retry")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "flush_interval_seconds": self._flush_interval_seconds,
+                "agents_cached": len(self._cursors),
+                "dirty": len(self._dirty),
+                "reads": self._reads,
+                "loads": self._loads,
+                "acks": self._acks,
+                "stale_acks": self._stale_acks,
+                "flushes": self._flushes,
+                "rows_flushed": self._rows_flushed,
+                "flush_failures": self._flush_failures,
+                "last_flush_ms": self._last_flush_ms,
+            }
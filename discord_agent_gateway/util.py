@@ -1,7 +1,13 @@
 import hashlib
+import json
 from datetime import datetime, timezone
-from typing import List
-from urllib.parse import urlparse
+from typing import Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import orjson
+except ImportError:  # optional: pip install "discord-agent-gateway[fast]"
+    orjson = None
 
 
 def utc_now_iso() -> str:
@@ -12,6 +18,13 @@ def sha256_hex(value: str) -> str:
     return hashlib.sha256(value.encode("utf-8")).hexdigest()
 
 
+def json_dumps_bytes(value: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when installed (same output as FastAPI's JSONResponse)."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
 def gateway_slug(base_url: str) -> str:
     """Derive a filesystem-safe directory name from a gateway base URL.
 
@@ -43,6 +56,55 @@ def parse_iso_utc(value: str | None) -> str | None:
     return parsed.astimezone(timezone.utc).isoformat()
 
 
+def cdn_url_expires_at(url: str | None) -> Optional[int]:
+    """
+    Expiry (unix seconds) of a signed Discord CDN URL, from its hex `ex` parameter.
+
+    Returns None for unsigned URLs (no `ex`/`hm`) or unparseable values.
+    """
+    if not url:
+        return None
+    params = parse_qs(urlparse(url).query)
+    ex = (params.get("ex") or [""])[0]
+    if not ex or not params.get("hm"):
+        return None
+    try:
+        return int(ex, 16)
+    except ValueError:
+        return None
+
+
+def parse_range_header(value: str | None, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header against a body of `size` bytes.
+
+    Returns the inclusive `(start, end)` to serve, or None when the header is absent,
+    malformed or asks for several ranges (serve the whole body). Raises ValueError when
+    the range cannot be satisfied (respond 416).
+    """
+    unit, sep, spec = (value or "").strip().partition("=")
+    if not sep or unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = (part.strip() for part in spec.partition("-"))
+    if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+
+    if not first:
+        # Suffix range: the final N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None  # syntactically invalid, ignored per RFC 9110
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
 def split_for_discord(text: str, *, max_len: int) -> List[str]:
     """
     Split long messages into Discord-safe chunks.
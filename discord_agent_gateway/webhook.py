@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-import threading
+import asyncio
+import logging
 from dataclasses import dataclass
 from typing import Any, Optional
 
 from .config import Settings
 from .db import Database
-from .discord_api import DiscordAPI, DiscordAPIError
+from .discord_api import AsyncDiscordAPI, DiscordAPIError
+from .rate_limit import discord_route_key
+
+
+logger = logging.getLogger("discord_agent_gateway.webhook")
 
 
 @dataclass(frozen=True)
@@ -26,65 +31,179 @@ def parse_webhook_url(url: str) -> WebhookCredentials:
     return WebhookCredentials(webhook_id=webhook_id, webhook_token=webhook_token)
 
 
-class GatewayWebhookManager:
-    def __init__(self, *, settings: Settings, db: Database, discord: DiscordAPI):
+def _check_configured_webhook(info: Optional[dict[str, Any]], *, settings: Settings) -> None:
+    """Validate that DISCORD_WEBHOOK_URL exists and posts into DISCORD_CHANNEL_ID."""
+    if info is None:
+        raise DiscordAPIError(status_code=400, message="Invalid DISCORD_WEBHOOK_URL (webhook not found)")
+    webhook_channel_id = str(info.get("channel_id") or "")
+    if webhook_channel_id and webhook_channel_id != str(settings.discord_channel_id):
+        raise DiscordAPIError(
+            status_code=400,
+            message="DISCORD_WEBHOOK_URL points to a different channel than DISCORD_CHANNEL_ID",
+            detail={
+                "webhook_channel_id": webhook_channel_id,
+                "discord_channel_id": str(settings.discord_channel_id),
+            },
+        )
+
+
+def _stored_webhook_usable(info: Optional[dict[str, Any]], *, settings: Settings) -> bool:
+    if info is None:
+        return False
+    webhook_channel_id = str(info.get("channel_id") or "")
+    return bool(webhook_channel_id) and webhook_channel_id == str(settings.discord_channel_id)
+
+
+def _slot_setting_keys(slot: int) -> tuple[str, str]:
+    """Settings keys for a pooled webhook; slot 0 keeps the original single-webhook keys."""
+    if slot == 0:
+        return "gateway_webhook_id", "gateway_webhook_token"
+    return f"gateway_webhook_id_{slot}", f"gateway_webhook_token_{slot}"
+
+
+def _stored_credentials(db: Database, slot: int = 0) -> Optional[WebhookCredentials]:
+    id_key, token_key = _slot_setting_keys(slot)
+    webhook_id = db.setting_get(id_key)
+    webhook_token = db.setting_get(token_key)
+    if webhook_id and webhook_token:
+        return WebhookCredentials(webhook_id=webhook_id, webhook_token=webhook_token)
+    return None
+
+
+def _store_created_webhook(db: Database, webhook: dict[str, Any], slot: int = 0) -> WebhookCredentials:
+    creds = WebhookCredentials(webhook_id=str(webhook["id"]), webhook_token=str(webhook["token"]))
+    id_key, token_key = _slot_setting_keys(slot)
+    db.setting_set(id_key, creds.webhook_id)
+    db.setting_set(token_key, creds.webhook_token)
+    return creds
+
+
+def webhook_route_key(creds: WebhookCredentials) -> str:
+    return discord_route_key("POST", f"/webhooks/{creds.webhook_id}/{creds.webhook_token}")
+
+
+class AsyncGatewayWebhookManager:
+    """
+    Pool of up to `pool_size` gateway webhooks for async routes.
+
+    Each webhook is its own Discord rate-limit bucket. `execute()` sends through the
+    webhook the shared rate-limit tracker expects to be free soonest; when every webhook
+    in the pool is currently limited and the pool is not full, another webhook is created
+    on the channel and stored in `settings` (`gateway_webhook_id_<n>` /
+    `gateway_webhook_token_<n>`). SQLite settings I/O runs in worker threads.
+    """
+
+    def __init__(self, *, settings: Settings, db: Database, discord: AsyncDiscordAPI, pool_size: int = 1):
         self._settings = settings
         self._db = db
         self._discord = discord
-        self._lock = threading.Lock()
+        self._pool_size = max(1, pool_size)
+        self._lock = asyncio.Lock()
         self._cached: Optional[WebhookCredentials] = None
+        self._pool: list[WebhookCredentials] = []
+        self._pool_loaded = False
+        self._can_grow = True
+        self._next = 0
+        self._sends: dict[str, int] = {}
 
-    def get_or_create(self) -> WebhookCredentials:
-        with self._lock:
+    async def get_or_create(self) -> WebhookCredentials:
+        if self._cached is not None:
+            return self._cached
+
+        async with self._lock:
             if self._cached is not None:
                 return self._cached
 
             if self._settings.discord_webhook_url:
                 creds = parse_webhook_url(self._settings.discord_webhook_url)
-                info = self._discord.get_webhook_with_token(
+                info = await self._discord.get_webhook_with_token(
                     webhook_id=creds.webhook_id,
                     webhook_token=creds.webhook_token,
                 )
-                if info is None:
-                    raise DiscordAPIError(status_code=400, message="Invalid DISCORD_WEBHOOK_URL (webhook not found)")
-                webhook_channel_id = str(info.get("channel_id") or "")
-                if webhook_channel_id and webhook_channel_id != str(self._settings.discord_channel_id):
-                    raise DiscordAPIError(
-                        status_code=400,
-                        message="DISCORD_WEBHOOK_URL points to a different channel than DISCORD_CHANNEL_ID",
-                        detail={
-                            "webhook_channel_id": webhook_channel_id,
-                            "discord_channel_id": str(self._settings.discord_channel_id),
-                        },
-                    )
+                _check_configured_webhook(info, settings=self._settings)
                 self._cached = creds
                 return self._cached
 
-            webhook_id = self._db.setting_get("gateway_webhook_id")
-            webhook_token = self._db.setting_get("gateway_webhook_token")
-            if webhook_id and webhook_token:
-                creds = WebhookCredentials(webhook_id=webhook_id, webhook_token=webhook_token)
-                info = self._discord.get_webhook_with_token(
+            self._cached = await self._load_or_create_slot(0)
+            return self._cached
+
+    async def _load_or_create_slot(self, slot: int) -> WebhookCredentials:
+        creds = await asyncio.to_thread(_stored_credentials, self._db, slot)
+        if creds is not None:
+            info = await self._discord.get_webhook_with_token(
+                webhook_id=creds.webhook_id,
+                webhook_token=creds.webhook_token,
+            )
+            if _stored_webhook_usable(info, settings=self._settings):
+                return creds
+
+        webhook = await self._discord.create_webhook(
+            channel_id=self._settings.discord_channel_id,
+            name="AgentGateway",
+        )
+        return await asyncio.to_thread(_store_created_webhook, self._db, webhook, slot)
+
+    async def _ensure_pool_loaded(self) -> None:
+        primary = await self.get_or_create()
+        if self._pool_loaded:
+            return
+        async with self._lock:
+            if self._pool_loaded:
+                return
+            pool = [primary]
+            # Reuse extra webhooks created by earlier runs; new ones are only created on demand.
+            for slot in range(1, self._pool_size):
+                creds = await asyncio.to_thread(_stored_credentials, self._db, slot)
+                if creds is None:
+                    break
+                info = await self._discord.get_webhook_with_token(
                     webhook_id=creds.webhook_id,
                     webhook_token=creds.webhook_token,
                 )
-                if info is not None:
-                    webhook_channel_id = str(info.get("channel_id") or "")
-                    if webhook_channel_id and webhook_channel_id == str(self._settings.discord_channel_id):
-                        self._cached = creds
-                        return self._cached
+                if not _stored_webhook_usable(info, settings=self._settings):
+                    break
+                pool.append(creds)
+            self._pool = pool
+            self._pool_loaded = True
 
-            webhook = self._discord.create_webhook(channel_id=self._settings.discord_channel_id, name="AgentGateway")
-            webhook_id = str(webhook["id"])
-            webhook_token = str(webhook["token"])
+    def _delay(self, creds: WebhookCredentials) -> float:
+        return self._discord.rate_limiter.peek_delay(webhook_route_key(creds), global_scope=False)
 
-            self._db.setting_set("gateway_webhook_id", webhook_id)
-            self._db.setting_set("gateway_webhook_token", webhook_token)
+    def _least_limited(self) -> tuple[WebhookCredentials, float]:
+        # Rotate the starting point so ties spread posts across the pool.
+        start = self._next % len(self._pool)
+        self._next += 1
+        ordered = self._pool[start:] + self._pool[:start]
+        best = min(ordered, key=self._delay)
+        return best, self._delay(best)
 
-            self._cached = WebhookCredentials(webhook_id=webhook_id, webhook_token=webhook_token)
-            return self._cached
+    async def _pick(self) -> WebhookCredentials:
+        await self._ensure_pool_loaded()
+        creds, delay = self._least_limited()
+        if delay <= 0 or not self._can_grow or len(self._pool) >= self._pool_size:
+            return creds
 
-    def execute(
+        async with self._lock:
+            creds, delay = self._least_limited()
+            if delay <= 0 or not self._can_grow or len(self._pool) >= self._pool_size:
+                return creds
+            slot = len(self._pool)
+            try:
+                webhook = await self._discord.create_webhook(
+                    channel_id=self._settings.discord_channel_id,
+                    name="AgentGateway",
+                )
+            except DiscordAPIError as exc:
+                # e.g. missing Manage Webhooks with DISCORD_WEBHOOK_URL; keep using the pool we have.
+                logger.warning("Could not grow webhook pool (status=%s); using %s webhook(s)", exc.status_code, slot)
+                self._can_grow = False
+                return creds
+            created = await asyncio.to_thread(_store_created_webhook, self._db, webhook, slot)
+            self._pool.append(created)
+            logger.info("Webhook pool grew to %s webhook(s)", len(self._pool))
+            return created
+
+    async def execute(
         self,
         *,
         content: str,
@@ -92,8 +211,9 @@ class GatewayWebhookManager:
         avatar_url: Optional[str],
         wait: bool = True,
     ) -> dict[str, Any]:
-        creds = self.get_or_create()
-        return self._discord.execute_webhook(
+        creds = await self._pick()
+        self._sends[creds.webhook_id] = self._sends.get(creds.webhook_id, 0) + 1
+        return await self._discord.execute_webhook(
             webhook_id=creds.webhook_id,
             webhook_token=creds.webhook_token,
             content=content,
@@ -101,3 +221,16 @@ class GatewayWebhookManager:
             avatar_url=avatar_url,
             wait=wait,
         )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pool_size": self._pool_size,
+            "webhooks": [
+                {
+                    "webhook_id": creds.webhook_id,
+                    "sends": self._sends.get(creds.webhook_id, 0),
+                    "rate_limited_for_seconds": round(self._delay(creds), 3),
+                }
+                for creds in self._pool
+            ],
+        }
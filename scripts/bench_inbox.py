@@ -0,0 +1,194 @@
+"""
+Benchmark inbox page serialization at limit=200 with attachments.
+
+Compares the old path (build every event dict per request, validate `InboxOut`, then
+FastAPI's `response_model` serialization) with the current one (splice stored event
+blobs into the response), and times full requests through the app. Run it from a
+checkout (install `[fast]` to include orjson):
+
+    python scripts/bench_inbox.py [--posts 400] [--attachments 2] [--rounds 200] [--buffer-size 512]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+# Make the checkout importable without installing the package or setting PYTHONPATH.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from discord_agent_gateway import util
+from discord_agent_gateway.api import create_app
+from discord_agent_gateway.api.agent_routes import _inbox_page, _inbox_response
+from discord_agent_gateway.api.schemas import InboxOut
+from discord_agent_gateway.config import Settings
+from discord_agent_gateway.db import Database
+from discord_agent_gateway.models import Agent, Attachment, IngestMessage
+
+LIMIT = 200
+
+
+class _NoWebhooks:
+    async def get_or_create(self):
+        raise RuntimeError("benchmark")
+
+    async def execute(self, **_kwargs):
+        raise RuntimeError("benchmark")
+
+    def stats(self):
+        return {}
+
+
+class _NoAttachments:
+    async def resolve(self, _attachment_id: str):
+        return None
+
+    async def open_download(self, _url: str, *, byte_range=None):
+        raise RuntimeError("benchmark")
+
+    def stats(self):
+        return {}
+
+
+def _seed(db: Database, *, posts: int, attachments: int) -> None:
+    messages = []
+    for i in range(posts):
+        msg_id = str(10_000 + i)
+        messages.append(
+            IngestMessage(
+                author_kind="human",
+                author_id="u1",
+                author_name="Human",
+                body=f"message {i} " + "lorem ipsum dolor sit amet " * 8,
+                created_at="2024-01-01T00:00:00+00:00",
+                discord_message_id=msg_id,
+                discord_channel_id="123",
+                source_channel_id="123",
+                attachments=tuple(
+                    Attachment(
+                        attachment_id=f"{msg_id}{j}",
+                        post_seq=0,
+                        discord_message_id=msg_id,
+                        source_channel_id="123",
+                        filename=f"image-{j}.png",
+                        url=f"https://cdn.discordapp.com/attachments/123/{msg_id}/image-{j}.png",
+                        proxy_url=None,
+                        content_type="image/png",
+                        size_bytes=123_456,
+                        height=768,
+                        width=1024,
+                    )
+                    for j in range(attachments)
+                ),
+            )
+        )
+    db.ingest_messages(messages)
+
+
+def _legacy_page(db: Database, agent: Agent, *, base_url: str, cursor: int) -> InboxOut:
+    posts = db.inbox_fetch("123", cursor, LIMIT)
+    attachments_map = db.attachments_for_posts([p.seq for p in posts])
+    events: list[dict[str, Any]] = []
+    for post in posts:
+        events.append(
+            {
+                "seq": post.seq,
+                "author_kind": post.author_kind,
+                "author_id": post.author_id,
+                "author_name": post.author_name,
+                "is_self": post.author_kind == "agent" and post.author_id == agent.agent_id,
+                "is_human": post.author_kind == "human",
+                "body": post.body,
+                "source_channel_id": post.source_channel_id,
+                "created_at": post.created_at,
+                "discord_message_id": post.discord_message_id,
+                "attachments": [
+                    {
+                        "attachment_id": att.attachment_id,
+                        "filename": att.filename,
+                        "content_type": att.content_type,
+                        "size_bytes": att.size_bytes,
+                        "height": att.height,
+                        "width": att.width,
+                        "download_url": f"{base_url}/v1/attachments/{att.attachment_id}",
+                    }
+                    for att in attachments_map.get(post.seq, [])
+                ],
+            }
+        )
+    last = posts[-1].seq if posts else cursor
+    return InboxOut(cursor=cursor, next_cursor=last, head_seq=last, has_more=False, events=events)
+
+
+def _time(label: str, rounds: int, fn: Callable[[], object]) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    per_call_ms = (time.perf_counter() - started) * 1000 / rounds
+    print(f"  {label:<44} {per_call_ms:8.3f} ms")
+    return per_call_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=400)
+    parser.add_argument("--attachments", type=int, default=2, help="attachments per post")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--buffer-size", type=int, default=512, help="INBOX_BUFFER_SIZE (0 reads from SQLite)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            _env_file=None,
+            DISCORD_BOT_TOKEN="x",
+            DISCORD_CHANNEL_ID=123,
+            DB_PATH=str(Path(tmp) / "bench.db"),
+            REGISTRATION_MODE="open",
+        )
+        db = Database(Path(tmp) / "bench.db", recent_posts_capacity=args.buffer_size)
+        db.init_schema()
+        _seed(db, posts=args.posts, attachments=args.attachments)
+
+        app = create_app(settings=settings, db=db, webhooks=_NoWebhooks(), attachments=_NoAttachments())
+        with TestClient(app) as client:
+            token = client.post("/v1/agents/register", json={"name": "bench", "avatar_url": None}).json()["token"]
+            state = app.state.gateway
+            agent = db.agent_by_token(token)
+            cursor = args.posts - LIMIT  # the newest page, inside the recent-posts buffer
+            page = _inbox_page(state=state, agent=agent, cursor=cursor, limit=LIMIT)
+
+            print(f"inbox limit={LIMIT}, {len(page.events)} events x {args.attachments} attachments")
+            print(f"json encoder: {'orjson' if util.orjson is not None else 'stdlib json'}")
+            base_url = settings.gateway_base_url
+            print("SQLite read + page build + serialization:")
+            old = _time(
+                "event dicts + InboxOut + response_model",
+                args.rounds,
+                lambda: JSONResponse(jsonable_encoder(_legacy_page(db, agent, base_url=base_url, cursor=cursor))),
+            )
+            new = _time(
+                "stored blobs (_inbox_page + _inbox_response)",
+                args.rounds,
+                lambda: _inbox_response(
+                    _inbox_page(state=state, agent=agent, cursor=cursor, limit=LIMIT), etag='W/"x"'
+                ),
+            )
+            print(f"  speedup: {old / new:.1f}x")
+
+            print("full request:")
+            headers = {"Authorization": f"Bearer {token}"}
+            params = {"cursor": cursor, "limit": LIMIT}
+            _time("GET /v1/inbox", args.rounds, lambda: client.get("/v1/inbox", params=params, headers=headers))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,122 @@
+import asyncio
+import json
+import sqlite3
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest import mock
 
 from fastapi.testclient import TestClient
 
 from discord_agent_gateway.api import create_app
+from discord_agent_gateway.api.agent_routes import _stream_events
+from discord_agent_gateway.attachment_cache import AttachmentDiskCache
+from discord_agent_gateway.attachments import ResolvedDownload
 from discord_agent_gateway.config import Settings
 from discord_agent_gateway.db import Database
+from discord_agent_gateway.discord_api import DiscordAPIError, DownloadStream
+from discord_agent_gateway.models import Attachment, IngestMessage
 
 
 class _StubWebhooks:
-    def get_or_create(self):
+    async def get_or_create(self):
         raise RuntimeError("no webhook configured")
 
-    def execute(self, **_kwargs):
+    async def execute(self, **_kwargs):
         raise RuntimeError("no webhook configured")
 
+    def stats(self):
+        return {}
+
 
 class _StubAttachments:
-    def resolve(self, _attachment_id: str):
+    async def resolve(self, _attachment_id: str):
         return None
 
-    def iter_download(self, _url: str):
+    async def open_download(self, _url: str, *, byte_range=None):
         raise RuntimeError("no downloads")
 
+    def stats(self):
+        return {}
+
 
-def _build_client(tmp_dir: str, *, registration_mode: str = "open", admin_api_token: str = "") -> TestClient:
+class _RecordingWebhooks:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def get_or_create(self):
+        return None
+
+    async def execute(self, *, content: str, **_kwargs):
+        self.sent.append(content)
+        return {"id": str(900 + len(self.sent))}
+
+    def stats(self):
+        return {"sends": len(self.sent)}
+
+
+class _RateLimitedWebhooks(_RecordingWebhooks):
+    """Rejects one agent's posts with 429s; delivers everyone else's."""
+
+    def __init__(self, limited_username: str) -> None:
+        super().__init__()
+        self.limited_username = limited_username
+
+    async def execute(self, *, content: str, username: str, **kwargs):
+        if username == self.limited_username:
+            raise DiscordAPIError(status_code=429, message="rate limited")
+        return await super().execute(content=content, username=username, **kwargs)
+
+
+class _ServingAttachments:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.downloads = 0
+        self.ranges: list = []
+
+    async def resolve(self, attachment_id: str):
+        return ResolvedDownload(
+            filename="notes.txt",
+            content_type="text/plain",
+            size_bytes=len(self.body),
+            url=f"https://cdn.discordapp.com/attachments/1/2/{attachment_id}",
+        )
+
+    async def open_download(self, _url: str, *, byte_range=None):
+        self.downloads += 1
+        self.ranges.append(byte_range)
+        body = self.body
+        status_code, content_range = 200, None
+        if byte_range:
+            start, end = (int(part) for part in byte_range.removeprefix("bytes=").split("-"))
+            body = self.body[start : end + 1]
+            status_code, content_range = 206, f"bytes {start}-{end}/{len(self.body)}"
+
+        async def chunks():
+            yield body
+
+        return DownloadStream(
+            status_code=status_code,
+            content_length=len(body),
+            content_range=content_range,
+            chunks=chunks(),
+        )
+
+    def stats(self):
+        return {}
+
+
+def _build_client(
+    tmp_dir: str,
+    *,
+    registration_mode: str = "open",
+    admin_api_token: str = "",
+    webhooks=None,
+    attachments=None,
+    attachment_cache=None,
+) -> TestClient:
     db = Database(Path(tmp_dir) / "test.db")
     db.init_schema()
 
@@ -40,10 +131,24 @@ def _build_client(tmp_dir: str, *, registration_mode: str = "open", admin_api_to
         ADMIN_API_TOKEN=admin_api_token,
     )
 
-    app = create_app(settings=settings, db=db, webhooks=_StubWebhooks(), attachments=_StubAttachments())
+    app = create_app(
+        settings=settings,
+        db=db,
+        webhooks=webhooks or _StubWebhooks(),
+        attachments=attachments or _StubAttachments(),
+        attachment_cache=attachment_cache,
+    )
     return TestClient(app)
 
 
+def _wait_for_job(client: TestClient, token: str, job: dict, *, timeout: float = 2.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while job["status"] not in ("sent", "failed") and time.monotonic() < deadline:
+        time.sleep(0.02)
+        job = client.get(f"/v1/post/{job['job_id']}", headers={"Authorization": f"Bearer {token}"}).json()
+    return job
+
+
 class TestAPI(unittest.TestCase):
     def test_register_and_poll_open_mode(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
@@ -80,6 +185,485 @@ class TestAPI(unittest.TestCase):
             self.assertEqual(health.status_code, 200)
             self.assertEqual(health.json(), {"ok": True})
 
+    def test_inbox_reports_head_and_has_more(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = _build_client(tmp, registration_mode="open")
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            db = client.app.state.gateway.db
+            seqs = [
+                db.post_insert(
+                    author_kind="human",
+                    author_id="u1",
+                    author_name="Human",
+                    body=f"post {i}",
+                    created_at="2024-01-01T00:00:00+00:00",
+                    discord_message_id=f"m{i}",
+                    discord_channel_id="123",
+                    source_channel_id="123",
+                )
+                for i in range(3)
+            ]
+
+            first = client.get("/v1/inbox", params={"limit": 2}, headers=headers).json()
+            self.assertEqual([e["seq"] for e in first["events"]], seqs[:2])
+            self.assertEqual((first["head_seq"], first["has_more"]), (seqs[2], True))
+
+            second = client.get("/v1/inbox", params={"cursor": first["next_cursor"], "limit": 2}, headers=headers).json()
+            self.assertEqual([e["seq"] for e in second["events"]], seqs[2:])
+            self.assertFalse(second["has_more"])
+
+            caught_up = client.get("/v1/inbox", params={"cursor": seqs[2]}, headers=headers).json()
+            self.assertEqual(caught_up["events"], [])
+            self.assertEqual((caught_up["next_cursor"], caught_up["head_seq"]), (seqs[2], seqs[2]))
+
+    def test_inbox_ack_previous_acks_and_reads_on(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = _build_client(tmp, registration_mode="open")
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            db = client.app.state.gateway.db
+            seqs = [
+                db.post_insert(
+                    author_kind="human",
+                    author_id="u1",
+                    author_name="Human",
+                    body=f"post {i}",
+                    created_at="2024-01-01T00:00:00+00:00",
+                    discord_message_id=f"m{i}",
+                    discord_channel_id="123",
+                    source_channel_id="123",
+                )
+                for i in range(3)
+            ]
+
+            first = client.get("/v1/inbox", params={"limit": 2}, headers=headers).json()
+            second = client.get("/v1/inbox", params={"ack_previous": first["next_cursor"]}, headers=headers).json()
+            self.assertEqual([e["seq"] for e in second["events"]], seqs[2:])
+            self.assertEqual(client.get("/v1/me", headers=headers).json()["last_cursor"], first["next_cursor"])
+
+            # Acks never move the cursor backwards.
+            stale = client.post("/v1/ack", json={"cursor": seqs[0]}, headers=headers).json()
+            self.assertEqual(stale["cursor"], first["next_cursor"])
+
+    def test_inbox_filters(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = _build_client(tmp, registration_mode="open")
+            reg = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()
+            headers = {"Authorization": f"Bearer {reg['token']}"}
+            db = client.app.state.gateway.db
+            for i, (kind, author, source) in enumerate(
+                [("human", "u1", "123"), ("agent", reg["agent_id"], "123"), ("bot", "b1", "777"), ("human", "u2", "777")]
+            ):
+                db.post_insert(
+                    author_kind=kind,
+                    author_id=author,
+                    author_name=author,
+                    body=f"post {i}",
+                    created_at="2024-01-01T00:00:00+00:00",
+                    discord_message_id=f"m{i}",
+                    discord_channel_id="123",
+                    source_channel_id=source,
+                )
+
+            def bodies(**params) -> list[str]:
+                resp = client.get("/v1/inbox", params=params, headers=headers)
+                self.assertEqual(resp.status_code, 200, resp.text)
+                return [e["body"] for e in resp.json()["events"]]
+
+            self.assertEqual(bodies(exclude_self=True), ["post 0", "post 2", "post 3"])
+            self.assertEqual(bodies(humans_only=True), ["post 0", "post 3"])
+            self.assertEqual(bodies(source_channel_id="777", author_kind="bot"), ["post 2"])
+            self.assertEqual(bodies(author_kind=["bot", "agent"]), ["post 1", "post 2"])
+
+            # Nothing after seq 3 is a bot post: the cursor still moves to the head.
+            page = client.get("/v1/inbox", params={"author_kind": "bot", "cursor": 3}, headers=headers).json()
+            self.assertEqual((page["events"], page["next_cursor"]), ([], 4))
+            bad = client.get("/v1/inbox", params={"author_kind": "robot"}, headers=headers)
+            self.assertEqual(bad.status_code, 422)
+
+    def test_conditional_get_returns_304_until_state_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            admin_token = "admin-secret"
+            client = _build_client(tmp, registration_mode="open", admin_api_token=admin_token)
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            for path in ("/v1/inbox", "/v1/context", "/v1/me"):
+                first = client.get(path, headers=headers)
+                etag = first.headers["etag"]
+                again = client.get(path, headers={**headers, "If-None-Match": etag})
+                self.assertEqual(again.status_code, 304, path)
+                self.assertEqual(again.content, b"")
+
+            inbox_etag = client.get("/v1/inbox", headers=headers).headers["etag"]
+            client.app.state.gateway.db.post_insert(
+                author_kind="human",
+                author_id="u1",
+                author_name="Human",
+                body="new",
+                created_at="2024-01-01T00:00:00+00:00",
+                discord_message_id="m1",
+                discord_channel_id="123",
+                source_channel_id="123",
+            )
+            changed = client.get("/v1/inbox", headers={**headers, "If-None-Match": inbox_etag})
+            self.assertEqual(changed.status_code, 200)
+            self.assertEqual(len(changed.json()["events"]), 1)
+
+            # Rewriting a post already on the page (same cursor and head) changes the ETag too.
+            inbox_etag = changed.headers["etag"]
+            agent_id = client.get("/v1/me", headers=headers).json()["agent_id"]
+            client.app.state.gateway.db.post_mark_as_agent_by_discord_message_id(
+                discord_message_id="m1", discord_channel_id="123", agent_id=agent_id, agent_name="A"
+            )
+            claimed = client.get("/v1/inbox", headers={**headers, "If-None-Match": inbox_etag})
+            self.assertEqual(claimed.status_code, 200)
+            self.assertTrue(claimed.json()["events"][0]["is_self"])
+
+            # ... including rewrites by another process (e.g. the bot adding attachments).
+            inbox_etag = claimed.headers["etag"]
+            other_process = Database(Path(tmp) / "test.db")
+            seq = claimed.json()["events"][0]["seq"]
+            other_process.attachments_insert(
+                [
+                    Attachment(
+                        attachment_id="a9",
+                        post_seq=seq,
+                        discord_message_id="m1",
+                        source_channel_id="123",
+                        filename="late.txt",
+                        url=None,
+                        proxy_url=None,
+                        content_type="text/plain",
+                        size_bytes=1,
+                        height=None,
+                        width=None,
+                    )
+                ]
+            )
+            with mock.patch("discord_agent_gateway.db.CHANNEL_HEAD_TTL_SECONDS", 0):
+                extended = client.get("/v1/inbox", headers={**headers, "If-None-Match": inbox_etag})
+            self.assertEqual(extended.status_code, 200)
+            self.assertEqual([a["filename"] for a in extended.json()["events"][0]["attachments"]], ["late.txt"])
+
+            context_etag = client.get("/v1/context", headers=headers).headers["etag"]
+            client.put(
+                "/v1/admin/profile",
+                headers={"X-Admin-Token": admin_token},
+                json={"name": "Room", "mission": "Ship it"},
+            )
+            edited = client.get("/v1/context", headers={**headers, "If-None-Match": context_etag})
+            self.assertEqual(edited.status_code, 200)
+            self.assertEqual(edited.json()["name"], "Room")
+
+    def test_inbox_long_poll_wakes_on_new_post(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = _build_client(tmp, registration_mode="open")
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            state = client.app.state.gateway
+
+            started = time.monotonic()
+            idle = client.get("/v1/inbox", params={"wait": 0.2}, headers=headers)
+            self.assertEqual(idle.status_code, 200)
+            self.assertEqual(idle.json()["events"], [])
+            self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+            def _publish() -> None:
+                time.sleep(0.2)
+                seq = state.db.post_insert(
+                    author_kind="human",
+                    author_id="u1",
+                    author_name="Human",
+                    body="hello",
+                    created_at="t",
+                    discord_message_id="m1",
+                    discord_channel_id="123",
+                    source_channel_id="123",
+                )
+                state.notifier.notify(seq)
+
+            publisher = threading.Thread(target=_publish)
+            publisher.start()
+            started = time.monotonic()
+            woken = client.get("/v1/inbox", params={"wait": 10}, headers=headers)
+            publisher.join()
+
+            self.assertEqual(woken.status_code, 200)
+            self.assertLess(time.monotonic() - started, 5)
+            self.assertEqual([e["body"] for e in woken.json()["events"]], ["hello"])
+
+    def test_long_poll_and_stream_see_posts_from_another_process(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, mock.patch(
+            "discord_agent_gateway.api.agent_routes.LONG_POLL_RECHECK_SECONDS", 0.05
+        ), mock.patch("discord_agent_gateway.db.CHANNEL_HEAD_TTL_SECONDS", 0.05):
+            client = _build_client(tmp, registration_mode="open")
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            state = client.app.state.gateway
+            agent = state.db.agent_by_token(token)
+
+            def _external_insert(message_id: str, body: str) -> None:
+                # Like `--mode bot`: another connection, no notifier call.
+                conn = sqlite3.connect(Path(tmp) / "test.db")
+                with conn:
+                    conn.execute(
+                        "INSERT INTO posts(post_id,author_kind,author_id,author_name,body,created_at,"
+                        "discord_message_id,discord_channel_id,source_channel_id) VALUES(?,?,?,?,?,?,?,?,?)",
+                        (f"p-{message_id}", "human", "u1", "Human", body, "t", message_id, "123", "123"),
+                    )
+                conn.close()
+
+            publisher = threading.Timer(0.2, _external_insert, args=("m1", "from bot"))
+            publisher.start()
+            started = time.monotonic()
+            woken = client.get("/v1/inbox", params={"wait": 10}, headers=headers)
+            publisher.join()
+            self.assertLess(time.monotonic() - started, 5)
+            self.assertEqual([e["body"] for e in woken.json()["events"]], ["from bot"])
+
+            async def _next_frame() -> str:
+                cursor = woken.json()["next_cursor"]
+                frames = _stream_events(state=state, agent=agent, token=token, cursor=cursor, auto_ack=False)
+                await frames.__anext__()  # retry hint
+                threading.Timer(0.1, _external_insert, args=("m2", "streamed")).start()
+                frame = await asyncio.wait_for(frames.__anext__(), timeout=5)
+                await frames.aclose()
+                return frame
+
+            self.assertIn('"body":"streamed"', asyncio.run(_next_frame()))
+
+    def test_stream_pushes_inbox_events(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            client = _build_client(tmp, registration_mode="open")
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            state = client.app.state.gateway
+            agent = state.db.agent_by_token(token)
+            seq = state.db.post_insert(
+                author_kind="human",
+                author_id="u1",
+                author_name="Human",
+                body="hello",
+                created_at="t",
+                discord_message_id="m1",
+                discord_channel_id="123",
+                source_channel_id="123",
+            )
+
+            async def _first_frames() -> list[str]:
+                frames = _stream_events(state=state, agent=agent, token=token, cursor=0, auto_ack=False)
+                out = [await frames.__anext__(), await frames.__anext__()]
+                await frames.aclose()
+                return out
+
+            retry, frame = asyncio.run(_first_frames())
+            self.assertTrue(retry.startswith("retry:"))
+            lines = frame.strip().split("\n")
+            self.assertEqual(lines[0], f"id: {seq}")
+            self.assertEqual(lines[1], "event: post")
+            event = json.loads(lines[2][len("data: ") :])
+            self.assertEqual(event["body"], "hello")
+            self.assertTrue(event["is_human"])
+
+    def test_stream_ends_when_the_agent_is_revoked(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            admin_token = "admin-secret"
+            client = _build_client(tmp, registration_mode="open", admin_api_token=admin_token)
+            reg = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()
+            state = client.app.state.gateway
+            agent = state.db.agent_by_token(reg["token"])
+
+            async def _frames_after_revoke() -> list[str]:
+                frames = _stream_events(state=state, agent=agent, token=reg["token"], cursor=0, auto_ack=False)
+                out = [await frames.__anext__()]  # retry hint; the stream is now waiting
+                state.db.agent_revoke(reg["agent_id"])
+                async for frame in frames:
+                    out.append(frame)
+                return out
+
+            with mock.patch("discord_agent_gateway.api.agent_routes.LONG_POLL_RECHECK_SECONDS", 0.05):
+                frames = asyncio.run(asyncio.wait_for(_frames_after_revoke(), timeout=5))
+            self.assertEqual(len(frames), 1)
+
+    def test_post_sends_chunks_through_async_webhooks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            webhooks = _RecordingWebhooks()
+            client = _build_client(tmp, registration_mode="open", webhooks=webhooks)
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            resp = client.post("/v1/post", headers=headers, json={"body": "hello"})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json()["last_discord_message_id"], "901")
+            self.assertEqual(webhooks.sent, ["hello"])
+
+            events = client.get("/v1/inbox", headers=headers).json()["events"]
+            self.assertEqual([e["body"] for e in events], ["hello"])
+            self.assertTrue(events[0]["is_self"])
+
+    def test_async_post_is_queued_and_delivered(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            webhooks = _RecordingWebhooks()
+            # Entering the client runs the app lifespan, which starts the outbox dispatcher.
+            with _build_client(tmp, registration_mode="open", webhooks=webhooks) as client:
+                token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+                other = client.post("/v1/agents/register", json={"name": "B", "avatar_url": None}).json()["token"]
+                headers = {"Authorization": f"Bearer {token}"}
+
+                resp = client.post("/v1/post?async=true", headers=headers, json={"body": "queued hello"})
+                self.assertEqual(resp.status_code, 202)
+                job = resp.json()
+                self.assertEqual(job["status"], "queued")
+
+                deadline = time.monotonic() + 5.0
+                while job["status"] != "sent" and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                    job = client.get(f"/v1/post/{job['job_id']}", headers=headers).json()
+
+                self.assertEqual(job["status"], "sent")
+                self.assertEqual(job["chunks_sent"], 1)
+                self.assertIsNotNone(job["last_seq"])
+                self.assertEqual(webhooks.sent, ["queued hello"])
+
+                hidden = client.get(f"/v1/post/{job['job_id']}", headers={"Authorization": f"Bearer {other}"})
+                self.assertEqual(hidden.status_code, 404)
+
+    def test_async_posts_from_other_agents_are_not_held_up_by_a_backoff(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            webhooks = _RateLimitedWebhooks("A")
+            with _build_client(tmp, registration_mode="open", webhooks=webhooks) as client:
+                slow = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+                fast = client.post("/v1/agents/register", json={"name": "B", "avatar_url": None}).json()["token"]
+
+                client.post("/v1/post?async=true", headers={"Authorization": f"Bearer {slow}"}, json={"body": "a1"})
+                resp = client.post("/v1/post?async=true", headers={"Authorization": f"Bearer {fast}"}, json={"body": "b1"})
+                job = _wait_for_job(client, fast, resp.json())
+
+                # A is backing off (1s, 2s, ...) on its first job; B's job queued after it is already out.
+                self.assertEqual(job["status"], "sent")
+                self.assertEqual(webhooks.sent, ["b1"])
+
+    def test_async_post_checkpoint_failure_does_not_resend_chunks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            webhooks = _RecordingWebhooks()
+            with _build_client(tmp, registration_mode="open", webhooks=webhooks) as client:
+                token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+                db = client.app.state.gateway.db
+                record_chunk = db.outbox_record_chunk
+                failures = [RuntimeError("database is locked")]
+
+                def _flaky_record_chunk(*args, **kwargs):
+                    if failures:
+                        raise failures.pop()
+                    return record_chunk(*args, **kwargs)
+
+                body = "first " * 200 + "\n\n" + "second " * 200
+                with (
+                    mock.patch.object(db, "outbox_record_chunk", side_effect=_flaky_record_chunk),
+                    mock.patch("discord_agent_gateway.outbox.OUTBOX_RETRY_BASE_SECONDS", 0.05),
+                ):
+                    headers = {"Authorization": f"Bearer {token}"}
+                    resp = client.post("/v1/post?async=true", headers=headers, json={"body": body})
+                    job = _wait_for_job(client, token, resp.json())
+
+                self.assertEqual(job["status"], "sent")
+                self.assertEqual(job["chunks_sent"], 2)
+                self.assertEqual(len(webhooks.sent), 2)
+                self.assertTrue(webhooks.sent[0].startswith("first"))
+                self.assertTrue(webhooks.sent[1].startswith("second"))
+
+    def test_attachment_download_is_served_from_disk_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            attachments = _ServingAttachments(b"cached bytes")
+            cache = AttachmentDiskCache(directory=Path(tmp) / "cache", max_bytes=1024)
+            client = _build_client(tmp, attachments=attachments, attachment_cache=cache)
+            client.app.state.gateway.db.ingest_messages(
+                [
+                    IngestMessage(
+                        author_kind="human",
+                        author_id="u1",
+                        author_name="Human",
+                        body="file",
+                        created_at="2024-01-01T00:00:00+00:00",
+                        discord_message_id="2",
+                        discord_channel_id="123",
+                        source_channel_id="123",
+                        attachments=(
+                            Attachment(
+                                attachment_id="a1",
+                                post_seq=0,
+                                discord_message_id="2",
+                                source_channel_id="123",
+                                filename="notes.txt",
+                                url=None,
+                                proxy_url=None,
+                                content_type="text/plain",
+                                size_bytes=12,
+                                height=None,
+                                width=None,
+                            ),
+                        ),
+                    )
+                ]
+            )
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            inbox = client.get("/v1/inbox", headers=headers)
+            self.assertEqual(inbox.headers["content-type"], "application/json")
+            [att] = inbox.json()["events"][0]["attachments"]
+            self.assertEqual((att["filename"], att["size_bytes"]), ("notes.txt", 12))
+            self.assertTrue(att["download_url"].endswith("/v1/attachments/a1"))
+
+            first = client.get("/v1/attachments/a1", headers=headers)
+            second = client.get("/v1/attachments/a1", headers=headers)
+
+            self.assertEqual(first.content, b"cached bytes")
+            self.assertEqual(second.content, b"cached bytes")
+            self.assertIn('filename="notes.txt"', second.headers["content-disposition"])
+            self.assertEqual(attachments.downloads, 1)
+            self.assertEqual(cache.stats()["hits"], 1)
+
+            etag = second.headers["etag"]
+            not_modified = client.get("/v1/attachments/a1", headers={**headers, "If-None-Match": etag})
+            self.assertEqual(not_modified.status_code, 304)
+
+            partial = client.get("/v1/attachments/a1", headers={**headers, "Range": "bytes=7-"})
+            self.assertEqual(partial.status_code, 206)
+            self.assertEqual(partial.content, b"bytes")
+            self.assertEqual(partial.headers["content-range"], "bytes 7-11/12")
+
+            # Evicted between the index lookup and serving the file: falls back to Discord.
+            with mock.patch.object(cache, "lookup", return_value=Path(tmp) / "cache" / "evicted"):
+                evicted = client.get("/v1/attachments/a1", headers=headers)
+            self.assertEqual(evicted.status_code, 200)
+            self.assertEqual(evicted.content, b"cached bytes")
+            self.assertEqual(attachments.downloads, 2)
+
+    def test_attachment_range_and_etag_without_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            attachments = _ServingAttachments(b"0123456789")
+            client = _build_client(tmp, attachments=attachments)
+            token = client.post("/v1/agents/register", json={"name": "A", "avatar_url": None}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            partial = client.get("/v1/attachments/a1", headers={**headers, "Range": "bytes=-4"})
+            self.assertEqual(partial.status_code, 206)
+            self.assertEqual(partial.content, b"6789")
+            self.assertEqual(partial.headers["content-range"], "bytes 6-9/10")
+            self.assertEqual(attachments.ranges, ["bytes=6-9"])
+
+            unsatisfiable = client.get("/v1/attachments/a1", headers={**headers, "Range": "bytes=20-"})
+            self.assertEqual(unsatisfiable.status_code, 416)
+            self.assertEqual(unsatisfiable.headers["content-range"], "bytes */10")
+
+            full = client.get("/v1/attachments/a1", headers=headers)
+            self.assertEqual(full.headers["accept-ranges"], "bytes")
+            not_modified = client.get("/v1/attachments/a1", headers={**headers, "If-None-Match": full.headers["etag"]})
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(attachments.downloads, 2)
+
     def test_registration_closed(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
             client = _build_client(tmp, registration_mode="closed")
@@ -0,0 +1,95 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from discord_agent_gateway import attachment_cache
+from discord_agent_gateway.attachment_cache import AttachmentDiskCache
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def _drain(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+class AttachmentDiskCacheTests(unittest.TestCase):
+    def test_tee_stores_complete_body_and_lookup_hits(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AttachmentDiskCache(directory=Path(tmp), max_bytes=1024)
+            self.assertIsNone(cache.lookup("a1"))
+
+            body = asyncio.run(_drain(cache.tee("a1", _chunks(b"hello ", b"world"))))
+            self.assertEqual(body, b"hello world")
+
+            path = cache.lookup("a1")
+            self.assertIsNotNone(path)
+            self.assertEqual(path.read_bytes(), b"hello world")
+            cache.record_served(11)
+            stats = cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+            self.assertEqual(stats["bytes_served_from_cache"], 11)
+            self.assertEqual(stats["bytes_served_from_upstream"], 11)
+
+            # The index survives a restart.
+            self.assertIsNotNone(AttachmentDiskCache(directory=Path(tmp), max_bytes=1024).lookup("a1"))
+
+    def test_evicts_least_recently_used_beyond_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AttachmentDiskCache(directory=Path(tmp), max_bytes=10)
+            asyncio.run(_drain(cache.tee("a1", _chunks(b"12345"))))
+            asyncio.run(_drain(cache.tee("a2", _chunks(b"12345"))))
+            cache.lookup("a1")  # a2 is now least recently used
+            asyncio.run(_drain(cache.tee("a3", _chunks(b"12345"))))
+
+            self.assertIsNone(cache.lookup("a2"))
+            self.assertIsNotNone(cache.lookup("a1"))
+            self.assertIsNotNone(cache.lookup("a3"))
+            self.assertEqual(cache.stats()["bytes"], 10)
+
+    def test_interrupted_stream_is_not_cached(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AttachmentDiskCache(directory=Path(tmp), max_bytes=1024)
+
+            async def partial() -> None:
+                stream = cache.tee("a1", _chunks(b"part", b"rest"))
+                await stream.__anext__()
+                await stream.aclose()
+
+            asyncio.run(partial())
+            self.assertIsNone(cache.lookup("a1"))
+            self.assertEqual(list(Path(tmp).iterdir()), [])
+
+    def test_tee_does_file_work_off_the_event_loop(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AttachmentDiskCache(directory=Path(tmp), max_bytes=5)
+            loop_thread = threading.current_thread()
+            calls: list[tuple[str, threading.Thread]] = []
+
+            def spy(target, name):
+                real = getattr(target, name)
+
+                def wrapper(*args, **kwargs):
+                    calls.append((name, threading.current_thread()))
+                    return real(*args, **kwargs)
+
+                return mock.patch.object(target, name, wrapper)
+
+            with spy(attachment_cache.tempfile, "mkstemp"), spy(attachment_cache.os, "replace"), spy(
+                attachment_cache.os, "unlink"
+            ):
+                asyncio.run(_drain(cache.tee("a1", _chunks(b"12345"))))
+                asyncio.run(_drain(cache.tee("a2", _chunks(b"12345"))))  # evicts a1
+                asyncio.run(_drain(cache.tee("a3", _chunks(b"123456"))))  # over budget, discarded
+
+            self.assertEqual(sorted({name for name, _ in calls}), ["mkstemp", "replace", "unlink"])
+            self.assertTrue(all(thread is not loop_thread for _, thread in calls))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from discord_agent_gateway.attachments import AsyncAttachmentProxy, AttachmentURLCache, AttachmentURLRefresher
+from discord_agent_gateway.db import Database
+from discord_agent_gateway.discord_api import DiscordAPIError
+from discord_agent_gateway.models import Attachment, IngestMessage
+from discord_agent_gateway.util import utc_now_iso
+
+
+def _signed(path: str, *, expires_in: int) -> str:
+    ex = format(int(time.time()) + expires_in, "x")
+    return f"https://cdn.discordapp.com/attachments/1/2/{path}?ex={ex}&is=0&hm=abc"
+
+
+class _FakeDiscord:
+    def __init__(self, fresh_url: str) -> None:
+        self.fresh_url = fresh_url
+        self.lookups = 0
+
+    async def get_channel_message(self, *, channel_id: int, message_id: int):
+        self.lookups += 1
+        return {"attachments": [{"id": "a1", "url": self.fresh_url, "proxy_url": None}]}
+
+
+def _message(attachment_id: str, message_id: str, url: str) -> IngestMessage:
+    return IngestMessage(
+        author_kind="human",
+        author_id="u1",
+        author_name="Human",
+        body="pic",
+        created_at=utc_now_iso(),
+        discord_message_id=message_id,
+        discord_channel_id="1",
+        source_channel_id="1",
+        attachments=(
+            Attachment(
+                attachment_id=attachment_id,
+                post_seq=0,
+                discord_message_id=message_id,
+                source_channel_id="1",
+                filename="f.png",
+                url=url,
+                proxy_url=None,
+                content_type="image/png",
+                size_bytes=10,
+                height=None,
+                width=None,
+            ),
+        ),
+    )
+
+
+def _db_with_attachment(tmp: str, url: str) -> Database:
+    db = Database(Path(tmp) / "test.db")
+    db.init_schema()
+    db.ingest_messages([_message("a1", "2", url)])
+    return db
+
+
+class AsyncAttachmentProxyTests(unittest.TestCase):
+    def test_unexpired_signed_url_skips_discord_lookup(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            stored = _signed("f.png", expires_in=3600)
+            db = _db_with_attachment(tmp, stored)
+            discord = _FakeDiscord(_signed("fresh.png", expires_in=7200))
+            proxy = AsyncAttachmentProxy(db=db, discord=discord)
+
+            first = asyncio.run(proxy.resolve("a1"))
+            second = asyncio.run(proxy.resolve("a1"))
+
+            self.assertEqual(first.url, stored)
+            self.assertEqual(second.url, stored)
+            self.assertEqual(discord.lookups, 0)
+            stats = proxy.stats()
+            self.assertEqual(stats["url_db_hits"], 1)
+            self.assertEqual(stats["url_memory_hits"], 1)
+
+    def test_expired_url_is_refreshed_and_written_back(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = _db_with_attachment(tmp, _signed("f.png", expires_in=-60))
+            fresh = _signed("fresh.png", expires_in=7200)
+            discord = _FakeDiscord(fresh)
+            proxy = AsyncAttachmentProxy(db=db, discord=discord)
+
+            resolved = asyncio.run(proxy.resolve("a1"))
+
+            self.assertEqual(resolved.url, fresh)
+            self.assertEqual(discord.lookups, 1)
+            self.assertEqual(db.attachment_get("a1").url, fresh)
+
+            # A new proxy (e.g. after restart) reuses the written-back URL.
+            again = AsyncAttachmentProxy(db=db, discord=discord)
+            self.assertEqual(asyncio.run(again.resolve("a1")).url, fresh)
+            self.assertEqual(discord.lookups, 1)
+
+
+
+class _FakeRefreshDiscord:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def refresh_attachment_urls(self, urls: list[str]) -> dict[str, str]:
+        self.calls.append(urls)
+        return {url: _signed("renewed.png", expires_in=86_400) for url in urls if "soon.png" in url}
+
+
+class _ShortLivedRefreshDiscord:
+    """Re-signs URLs with an expiry that is still inside the refresh window."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def refresh_attachment_urls(self, urls: list[str]) -> dict[str, str]:
+        self.calls.append(urls)
+        return {url: url.replace(".png", "-again.png") for url in urls}
+
+
+class _RejectingRefreshDiscord:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.calls = 0
+
+    async def refresh_attachment_urls(self, urls: list[str]) -> dict[str, str]:
+        self.calls += 1
+        raise DiscordAPIError(status_code=self.status_code, message="Discord API error")
+
+
+def _refresher(db: Database, discord) -> AttachmentURLRefresher:
+    return AttachmentURLRefresher(
+        db=db,
+        discord=discord,
+        url_cache=AttachmentURLCache(),
+        interval_seconds=300,
+        refresh_ahead_seconds=3600,
+        max_post_age_seconds=3600,
+    )
+
+
+class AttachmentURLRefresherTests(unittest.TestCase):
+    def test_refreshes_urls_close_to_expiry_in_batches(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            soon = _signed("soon.png", expires_in=60)
+            gone = _signed("gone.png", expires_in=60)
+            db.ingest_messages(
+                [
+                    _message("a1", "2", soon),
+                    _message("a2", "3", gone),
+                    _message("a3", "4", _signed("later.png", expires_in=86_400)),
+                ]
+            )
+            discord = _FakeRefreshDiscord()
+            refresher = AttachmentURLRefresher(
+                db=db,
+                discord=discord,
+                url_cache=AttachmentURLCache(),
+                interval_seconds=300,
+                refresh_ahead_seconds=3600,
+                max_post_age_seconds=3600,
+            )
+
+            self.assertEqual(asyncio.run(refresher.refresh_once()), 1)
+            self.assertEqual(len(discord.calls), 1)
+            self.assertEqual(sorted(discord.calls[0]), sorted([soon, gone]))
+            self.assertIn("renewed.png", db.attachment_get("a1").url)
+
+            # Nothing is due any more: renewed URLs moved out of the window, unrefreshable ones were dropped.
+            self.assertEqual(asyncio.run(refresher.refresh_once()), 0)
+            self.assertEqual(len(discord.calls), 1)
+            self.assertEqual(refresher.stats()["urls_unrefreshable"], 1)
+
+    def test_pages_past_rows_that_stay_due(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            db.ingest_messages(
+                [_message(f"a{i:03d}", str(100 + i), _signed(f"f{i}.png", expires_in=60)) for i in range(60)]
+            )
+            discord = _ShortLivedRefreshDiscord()
+
+            self.assertEqual(asyncio.run(_refresher(db, discord).refresh_once()), 60)
+            self.assertEqual([len(urls) for urls in discord.calls], [50, 10])
+
+    def test_permanently_rejected_batch_is_not_retried(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = _db_with_attachment(tmp, _signed("f.png", expires_in=60))
+            discord = _RejectingRefreshDiscord(400)
+            refresher = _refresher(db, discord)
+
+            self.assertEqual(asyncio.run(refresher.refresh_once()), 0)
+            self.assertEqual(asyncio.run(refresher.refresh_once()), 0)
+            self.assertEqual(discord.calls, 1)
+            self.assertEqual(refresher.stats()["urls_unrefreshable"], 1)
+
+            # Transient failures propagate (the run is retried next tick) and keep the rows due.
+            db = _db_with_attachment(str(Path(tmp) / "other"), _signed("f.png", expires_in=60))
+            with self.assertRaises(DiscordAPIError):
+                asyncio.run(_refresher(db, _RejectingRefreshDiscord(503)).refresh_once())
+            self.assertEqual(len(db.attachments_expiring(expires_before=2**40, posted_after="", limit=10)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from discord_agent_gateway.coalesce import DownloadCoalescer
+from discord_agent_gateway.discord_api import DiscordAPIError, DownloadStream
+
+
+async def _drain(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+class DownloadCoalescerTests(unittest.TestCase):
+    def test_concurrent_opens_share_one_upstream_download(self) -> None:
+        starts = 0
+
+        async def start() -> DownloadStream:
+            nonlocal starts
+            starts += 1
+
+            async def chunks():
+                for part in (b"one ", b"two ", b"three"):
+                    await asyncio.sleep(0.01)
+                    yield part
+
+            return DownloadStream(status_code=200, content_length=13, content_range=None, chunks=chunks())
+
+        async def scenario():
+            coalescer = DownloadCoalescer()
+            shared = await asyncio.gather(*(coalescer.open("a1", start) for _ in range(3)))
+            bodies = await asyncio.gather(*(_drain(s.chunks) for s in shared))
+            # Once finished, a new request starts a fresh download.
+            late = await coalescer.open("a1", start)
+            return bodies, await _drain(late.chunks), coalescer.stats()
+
+        bodies, late_body, stats = asyncio.run(scenario())
+        self.assertEqual(bodies, [b"one two three"] * 3)
+        self.assertEqual(late_body, b"one two three")
+        self.assertEqual(starts, 2)
+        self.assertEqual((stats["upstream_downloads"], stats["coalesced_requests"], stats["in_flight"]), (2, 2, 0))
+
+    def test_upstream_error_reaches_every_waiter(self) -> None:
+        async def start() -> DownloadStream:
+            await asyncio.sleep(0.01)
+            raise DiscordAPIError(status_code=404, message="Download failed")
+
+        async def scenario():
+            coalescer = DownloadCoalescer()
+            return await asyncio.gather(*(coalescer.open("a1", start) for _ in range(2)), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(r, DiscordAPIError) and r.status_code == 404 for r in results))
+
+    def test_buffer_is_trimmed_once_closed_to_new_readers(self) -> None:
+        async def start() -> DownloadStream:
+            async def chunks():
+                for _ in range(4):
+                    await asyncio.sleep(0)
+                    yield b"x" * 4
+
+            return DownloadStream(status_code=200, content_length=16, content_range=None, chunks=chunks())
+
+        async def scenario():
+            coalescer = DownloadCoalescer(max_buffer_bytes=6)
+            shared = await coalescer.open("a1", start)
+            return await _drain(shared.chunks)
+
+        self.assertEqual(asyncio.run(scenario()), b"x" * 16)
+
+    def test_slow_reader_bounds_the_buffer(self) -> None:
+        produced = 0
+
+        async def start() -> DownloadStream:
+            async def chunks():
+                nonlocal produced
+                for _ in range(50):
+                    produced += 1
+                    yield b"x" * 1024
+
+            return DownloadStream(status_code=200, content_length=50 * 1024, content_range=None, chunks=chunks())
+
+        async def scenario():
+            coalescer = DownloadCoalescer(max_buffer_bytes=4096)
+            shared = await coalescer.open("a1", start)
+            received, ahead = 0, 0
+            async for chunk in shared.chunks:
+                received += len(chunk)
+                ahead = max(ahead, produced - received // 1024)
+                await asyncio.sleep(0.001)  # slow client
+            return received, ahead, coalescer.stats()
+
+        received, ahead, stats = asyncio.run(scenario())
+        self.assertEqual(received, 50 * 1024)
+        # Upstream is never pulled more than the buffer (plus the chunk being handed over) ahead.
+        self.assertLessEqual(ahead, 6)
+        self.assertLessEqual(stats["peak_buffered_bytes"], 4096 + 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,12 @@
 import tempfile
+import threading
 import unittest
 from pathlib import Path
+from unittest import mock
 
+from discord_agent_gateway import db as db_module
 from discord_agent_gateway.db import Database
+from discord_agent_gateway.models import Attachment, InboxFilter, IngestMessage
 
 
 class TestDatabase(unittest.TestCase):
@@ -81,3 +85,251 @@ class TestDatabase(unittest.TestCase):
 
             rotated = db.agent_rotate_token(created.agent_id)
             self.assertIsNone(rotated)
+
+    def test_connections_are_pooled(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+
+            creds = db.agent_create("A", None)
+            for _ in range(5):
+                self.assertIsNotNone(db.agent_by_token(creds.token))
+                db.receipts_advance({creds.agent_id: 1})
+            self.assertEqual(db.receipt_get(creds.agent_id), 1)
+
+            stats = db.pool_stats()
+            # One writer + one reader for this thread, regardless of call count.
+            self.assertEqual(stats["connections_opened"], 2)
+            self.assertEqual(stats["readers_open"], 1)
+            self.assertTrue(stats["writer_open"])
+
+            db.close()
+            self.assertEqual(db.pool_stats()["readers_open"], 0)
+            self.assertEqual(db.receipt_get(creds.agent_id), 1)
+
+    def test_auth_cache_hits_and_invalidates_on_rotate(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+
+            creds = db.agent_create("A", None)
+            self.assertIsNotNone(db.agent_by_token(creds.token))
+            self.assertIsNotNone(db.agent_by_token(creds.token))
+            stats = db.auth_cache.stats()
+            self.assertEqual(stats["hits"], 1)
+            self.assertEqual(stats["misses"], 1)
+
+            new_token = db.agent_rotate_token(creds.agent_id)
+            self.assertIsNotNone(new_token)
+            assert new_token is not None
+            self.assertIsNone(db.agent_by_token(creds.token))
+            self.assertIsNotNone(db.agent_by_token(new_token))
+
+    def test_ingest_messages_writes_posts_attachments_and_checkpoint(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+
+            def _msg(msg_id: str, source: str, *, with_attachment: bool = False) -> IngestMessage:
+                attachments: tuple[Attachment, ...] = ()
+                if with_attachment:
+                    attachments = (
+                        Attachment(
+                            attachment_id=f"a-{msg_id}",
+                            post_seq=0,
+                            discord_message_id=msg_id,
+                            source_channel_id=source,
+                            filename="f.png",
+                            url=None,
+                            proxy_url=None,
+                            content_type="image/png",
+                            size_bytes=10,
+                            height=None,
+                            width=None,
+                        ),
+                    )
+                return IngestMessage(
+                    author_kind="human",
+                    author_id="u1",
+                    author_name="Human",
+                    body=f"body {msg_id}",
+                    created_at="t",
+                    discord_message_id=msg_id,
+                    discord_channel_id="c1",
+                    source_channel_id=source,
+                    attachments=attachments,
+                )
+
+            seqs = db.ingest_messages([_msg("1", "c1"), _msg("2", "t1", with_attachment=True), _msg("3", "c1")])
+            self.assertEqual(len(seqs), 3)
+            self.assertTrue(all(isinstance(s, int) for s in seqs))
+
+            # Re-ingesting returns the existing seq without duplicating the post.
+            again = db.ingest_messages([_msg("2", "t1", with_attachment=True)])
+            self.assertEqual(again, [seqs[1]])
+            self.assertEqual(len(db.inbox_fetch("c1", cursor=0, limit=10)), 3)
+
+            atts = db.attachments_for_posts([seqs[1]])
+            self.assertEqual([a.attachment_id for a in atts[seqs[1]]], ["a-2"])
+            self.assertEqual(db.ingestion_state_get("c1"), "3")
+            self.assertEqual(db.ingestion_state_get("t1"), "2")
+
+    def test_channel_head_tracks_inserts(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            self.assertEqual(db.channel_head("c1"), 0)
+
+            seq = db.post_insert(
+                author_kind="human",
+                author_id="u1",
+                author_name="Human",
+                body="hi",
+                created_at="t",
+                discord_message_id="m1",
+                discord_channel_id="c1",
+                source_channel_id="c1",
+            )
+            self.assertEqual(db.channel_head("c1"), seq)
+
+            [seq2] = db.ingest_messages(
+                [
+                    IngestMessage(
+                        author_kind="human",
+                        author_id="u1",
+                        author_name="Human",
+                        body="again",
+                        created_at="t",
+                        discord_message_id="m2",
+                        discord_channel_id="c1",
+                        source_channel_id="c1",
+                    )
+                ]
+            )
+            self.assertEqual(db.channel_head("c1"), seq2)
+            self.assertEqual(db.channel_head("other"), 0)
+
+            # A second Database on the same file (another process) reads the stored head.
+            self.assertEqual(Database(Path(tmp) / "test.db").channel_head("c1"), seq2)
+
+    def test_recent_posts_buffer_is_fed_on_commit(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+
+            def _msg(msg_id: str) -> IngestMessage:
+                return IngestMessage(
+                    author_kind="webhook",
+                    author_id="wh1",
+                    author_name="Webhook",
+                    body=f"body {msg_id}",
+                    created_at="t",
+                    discord_message_id=msg_id,
+                    discord_channel_id="c1",
+                    source_channel_id="c1",
+                )
+
+            seqs = db.ingest_messages([_msg("1"), _msg("2"), _msg("2")])
+            head = db.channel_head("c1")
+            entries = db.recent_posts.read("c1", cursor=0, limit=10, head_seq=head)
+            self.assertIsNotNone(entries)
+            assert entries is not None
+            self.assertEqual([post.seq for post, _ in entries], sorted(set(seqs)))
+
+            db.post_mark_as_agent_by_discord_message_id(
+                discord_message_id="2", discord_channel_id="c1", agent_id="ag1", agent_name="A"
+            )
+            entries = db.recent_posts.read("c1", cursor=seqs[0], limit=10, head_seq=head)
+            assert entries is not None
+            self.assertEqual((entries[0][0].author_kind, entries[0][0].author_id), ("agent", "ag1"))
+
+    def test_recent_posts_buffer_sees_posts_committed_by_another_process(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            api = Database(Path(tmp) / "test.db")
+            api.init_schema()
+            bot = Database(Path(tmp) / "test.db")  # the `--mode bot` process
+
+            def _insert(db: Database, msg_id: str) -> None:
+                db.post_insert(
+                    author_kind="human",
+                    author_id="u1",
+                    author_name="Human",
+                    body=f"body {msg_id}",
+                    created_at="t",
+                    discord_message_id=msg_id,
+                    discord_channel_id="c1",
+                    source_channel_id="c1",
+                )
+
+            _insert(api, "1")
+            read_head = db_module._channel_max_seq
+            raced: list[threading.Thread] = []
+
+            def _head_then_other_process_commits(conn, channel_id):
+                head = read_head(conn, channel_id)
+                if not raced:
+                    # Between this process reading the head and inserting, the bot commits.
+                    raced.append(threading.Thread(target=_insert, args=(bot, "2")))
+                    raced[0].start()
+                    raced[0].join(0.2)
+                return head
+
+            with mock.patch.object(db_module, "_channel_max_seq", side_effect=_head_then_other_process_commits):
+                _insert(api, "3")
+            raced[0].join(5)
+
+            stored = [post.seq for post in api.inbox_fetch("c1", cursor=0, limit=10)]
+            self.assertEqual(len(stored), 3)
+            entries = api.recent_posts.read("c1", cursor=0, limit=10, head_seq=stored[-1])
+            if entries is not None:
+                self.assertEqual([post.seq for post, _ in entries], stored)
+
+    def test_inbox_fetch_filters_run_in_sql(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db", recent_posts_capacity=0)
+            db.init_schema()
+
+            def _msg(msg_id: str, kind: str, author: str, source: str) -> IngestMessage:
+                return IngestMessage(
+                    author_kind=kind,
+                    author_id=author,
+                    author_name=author,
+                    body=msg_id,
+                    created_at="t",
+                    discord_message_id=msg_id,
+                    discord_channel_id="c1",
+                    source_channel_id=source,
+                )
+
+            db.ingest_messages(
+                [
+                    _msg("1", "human", "u1", "c1"),
+                    _msg("2", "agent", "ag1", "c1"),
+                    _msg("3", "bot", "b1", "t1"),
+                    _msg("4", "human", "u2", "t1"),
+                    _msg("5", "agent", "ag2", "t1"),
+                ]
+            )
+
+            def bodies(inbox_filter: InboxFilter) -> list[str]:
+                return [p.body for p in db.inbox_fetch("c1", 0, 10, inbox_filter)]
+
+            self.assertEqual(bodies(InboxFilter(source_channel_id="t1")), ["3", "4", "5"])
+            self.assertEqual(bodies(InboxFilter(author_kinds=("human",))), ["1", "4"])
+            self.assertEqual(bodies(InboxFilter(exclude_agent_id="ag1")), ["1", "3", "4", "5"])
+            self.assertEqual(
+                bodies(InboxFilter(source_channel_id="t1", author_kinds=("agent", "human"), exclude_agent_id="ag2")),
+                ["4"],
+            )
+
+            with db.reader() as conn:
+                plan = " ".join(
+                    str(row["detail"])
+                    for row in conn.execute(
+                        "EXPLAIN QUERY PLAN SELECT seq FROM posts "
+                        "WHERE discord_channel_id=? AND source_channel_id=? AND seq > ? ORDER BY seq LIMIT 5",
+                        ("c1", "t1", 0),
+                    )
+                )
+            self.assertIn("idx_posts_channel_source_seq", plan)
+
@@ -0,0 +1,114 @@
+import json
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+from discord_agent_gateway.db import Database
+from discord_agent_gateway.events import render_event
+from discord_agent_gateway.models import Attachment, IngestMessage
+
+
+def _message(msg_id: str, body: str) -> IngestMessage:
+    return IngestMessage(
+        author_kind="webhook",
+        author_id="w1",
+        author_name="Hook",
+        body=body,
+        created_at="2024-01-01T00:00:00+00:00",
+        discord_message_id=msg_id,
+        discord_channel_id="c1",
+        source_channel_id="c1",
+        attachments=(
+            Attachment(
+                attachment_id=f"a{msg_id}",
+                post_seq=0,
+                discord_message_id=msg_id,
+                source_channel_id="c1",
+                filename='say "hi".txt',
+                url=None,
+                proxy_url=None,
+                content_type="text/plain",
+                size_bytes=3,
+                height=None,
+                width=None,
+            ),
+        ),
+    )
+
+
+class EventBlobTests(unittest.TestCase):
+    def test_stored_blob_renders_per_agent_event(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db", recent_posts_capacity=0)
+            db.init_schema()
+            # A body that looks like the download_url key must not be rewritten.
+            body = '"download_url":"/v1/attachments/x" ✓'
+            [seq] = db.ingest_messages([_message("1", body)])
+
+            [post] = db.inbox_fetch("c1", cursor=0, limit=10)
+            self.assertIsNotNone(post.event_json)
+            event = json.loads(render_event(post, (), is_self=False, base_url="https://gw.example"))
+            self.assertEqual((event["seq"], event["is_self"], event["is_human"], event["body"]), (seq, False, False, body))
+            [att] = event["attachments"]
+            self.assertEqual(att["filename"], 'say "hi".txt')
+            self.assertEqual(att["download_url"], "https://gw.example/v1/attachments/a1")
+
+            # Claiming the webhook message rewrites the stored blob.
+            db.post_mark_as_agent_by_discord_message_id(
+                discord_message_id="1", discord_channel_id="c1", agent_id="ag1", agent_name="A"
+            )
+            [post] = db.inbox_fetch("c1", cursor=0, limit=10)
+            event = json.loads(render_event(post, (), is_self=True, base_url="https://gw.example"))
+            self.assertEqual((event["author_kind"], event["author_id"], event["is_self"]), ("agent", "ag1", True))
+            self.assertEqual(len(event["attachments"]), 1)
+
+    def test_new_attachments_on_an_existing_post_rebuild_its_event(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db", recent_posts_capacity=16)
+            db.init_schema()
+            [seq] = db.ingest_messages([replace(_message("1", "late upload"), attachments=())])
+            # Re-ingested (e.g. backfill after an edit) with an attachment it did not have before.
+            self.assertEqual(db.ingest_messages([_message("1", "late upload")]), [seq])
+            revision = db.channel_revision("c1")
+            self.assertGreater(revision, 0)
+            # Re-ingesting the same attachments again leaves the event (and inbox ETags) alone.
+            db.ingest_messages([_message("1", "late upload")])
+            self.assertEqual(db.channel_revision("c1"), revision)
+
+            [post] = db.inbox_fetch("c1", cursor=0, limit=10)
+            [(buffered, buffered_attachments)] = db.recent_posts.read(
+                "c1", cursor=0, limit=10, head_seq=db.channel_head("c1")
+            )
+            self.assertEqual([a.attachment_id for a in buffered_attachments], ["a1"])
+            for stored in (post, buffered):
+                event = json.loads(render_event(stored, (), is_self=False, base_url="http://h"))
+                self.assertEqual([a["attachment_id"] for a in event["attachments"]], ["a1"])
+
+            # Attachments added directly are reflected the same way.
+            extra = replace(_message("1", "").attachments[0], attachment_id="a2", post_seq=seq)
+            db.attachments_insert([extra])
+            [post] = db.inbox_fetch("c1", cursor=0, limit=10)
+            [(buffered, _)] = db.recent_posts.read("c1", cursor=0, limit=10, head_seq=db.channel_head("c1"))
+            for stored in (post, buffered):
+                event = json.loads(render_event(stored, (), is_self=False, base_url="http://h"))
+                self.assertEqual([a["attachment_id"] for a in event["attachments"]], ["a1", "a2"])
+
+    def test_rows_without_blob_are_serialized_at_read_time(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db", recent_posts_capacity=0)
+            db.init_schema()
+            db.ingest_messages([_message("1", "old row")])
+            with db.transaction() as conn:
+                conn.execute("UPDATE posts SET event_json=NULL")
+
+            [post] = db.inbox_fetch("c1", cursor=0, limit=10)
+            self.assertIsNone(post.event_json)
+            attachments = db.attachments_for_posts([post.seq])[post.seq]
+            event = json.loads(render_event(post, attachments, is_self=False, base_url="http://h"))
+            self.assertEqual(event["body"], "old row")
+            self.assertEqual(event["attachments"][0]["download_url"], "http://h/v1/attachments/a1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+from unittest import mock
+
+import discord
+
+from discord_agent_gateway import backfill
+from discord_agent_gateway.db import Database
+from discord_agent_gateway.ingest import IngestionWriter
+from discord_agent_gateway.models import IngestMessage
+from discord_agent_gateway.notify import PostNotifier
+
+
+def _msg(msg_id: str) -> IngestMessage:
+    return IngestMessage(
+        author_kind="human",
+        author_id="u1",
+        author_name="Human",
+        body=f"body {msg_id}",
+        created_at="t",
+        discord_message_id=msg_id,
+        discord_channel_id="c1",
+        source_channel_id="c1",
+    )
+
+
+class TestIngestionWriter(unittest.TestCase):
+    def test_group_commits_and_reports_stats(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            notifier = PostNotifier()
+            writer = IngestionWriter(db=db, notifier=notifier, max_batch_delay_seconds=0.05)
+            writer.start()
+            try:
+                futures = [writer.submit(_msg(str(i))) for i in range(1, 21)]
+                seqs = [f.result(timeout=5) for f in futures]
+            finally:
+                writer.stop()
+
+            self.assertEqual(seqs, sorted(seqs))
+            self.assertEqual(notifier.latest_seq, seqs[-1])
+            self.assertEqual(db.ingestion_state_get("c1"), "20")
+
+            stats = writer.stats()
+            self.assertEqual(stats["messages_committed"], 20)
+            self.assertLess(stats["batches_committed"], 20)
+            self.assertEqual(stats["queue_depth"], 0)
+            self.assertIsNotNone(stats["commit_latency_ms_avg"])
+
+    def test_submit_async_waits_for_space_when_full(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            writer = IngestionWriter(db=db, notifier=PostNotifier(), max_queue_size=1)
+            writer.start()
+
+            async def _produce() -> list[int]:
+                futures = [await writer.submit_async(_msg(str(i))) for i in range(1, 11)]
+                return [await asyncio.wrap_future(f) for f in futures]
+
+            try:
+                seqs = asyncio.run(_produce())
+            finally:
+                writer.stop()
+
+            self.assertEqual(len(seqs), 10)
+            self.assertEqual(writer.stats()["messages_committed"], 10)
+
+    def test_submit_many_commits_page_in_one_transaction(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            writer = IngestionWriter(db=db, notifier=PostNotifier(), max_batch_delay_seconds=0)
+            writer.start()
+            before = db.pool_stats()["write_transactions"]
+
+            async def _produce() -> list:
+                fut = await writer.submit_many_async([_msg(str(i)) for i in range(1, 101)])
+                return await asyncio.wrap_future(fut)
+
+            try:
+                seqs = asyncio.run(_produce())
+            finally:
+                writer.stop()
+
+            self.assertEqual(len(seqs), 100)
+            self.assertEqual(db.pool_stats()["write_transactions"] - before, 1)
+            self.assertEqual(db.ingestion_state_get("c1"), "100")
+
+    def test_cancelled_waiters_do_not_stop_the_writer(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            writer = IngestionWriter(db=db, notifier=PostNotifier(), max_batch_delay_seconds=0)
+            committing, release = threading.Event(), threading.Event()
+            ingest = db.ingest_messages
+
+            def _slow_ingest(messages):
+                committing.set()
+                release.wait(5)
+                return ingest(messages)
+
+            writer.start()
+            try:
+                # The awaiting side gives up mid-commit (wrap_future cancellation).
+                with mock.patch.object(db, "ingest_messages", side_effect=_slow_ingest):
+                    abandoned = writer.submit(_msg("1"))
+                    self.assertTrue(committing.wait(5))
+                    self.assertTrue(abandoned.cancel())
+                    release.set()
+                    seq = writer.submit(_msg("2")).result(timeout=5)
+                running = writer.stats()["running"]
+            finally:
+                writer.stop()
+
+            self.assertIsNotNone(seq)
+            self.assertTrue(running)
+            self.assertEqual(db.ingestion_state_get("c1"), "2")
+
+
+class _FailingPageWriter:
+    """Commits pages in order; the page at `fail_at` fails."""
+
+    def __init__(self, fail_at: int) -> None:
+        self.fail_at = fail_at
+        self.submitted: list[list[str]] = []
+
+    async def submit_many_async(self, messages):
+        self.submitted.append([m.discord_message_id for m in messages])
+        future: Future = Future()
+        if len(self.submitted) - 1 == self.fail_at:
+            future.set_exception(RuntimeError("disk I/O error"))
+        else:
+            future.set_result([None] * len(messages))
+        return future
+
+
+class _Channel:
+    id = 42
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+
+    async def history(self, **_kwargs):
+        for i in range(self.count):
+            yield SimpleNamespace(guild=object(), id=i)
+
+
+class _Thread(_Channel):
+    parent_id = 42
+    last_message_id = None
+
+    def __init__(self, thread_id: int, count: int, error: Optional[Exception] = None) -> None:
+        super().__init__(count)
+        self.id = thread_id
+        self.error = error
+
+    async def history(self, **kwargs):
+        if self.error is not None:
+            raise self.error
+        async for message in super().history(**kwargs):
+            yield message
+
+
+class TestBackfillChannel(unittest.TestCase):
+    def test_failed_page_stops_the_channel(self) -> None:
+        writer = _FailingPageWriter(fail_at=1)
+        settings = SimpleNamespace(backfill_seed_limit=1000)
+
+        async def _run() -> None:
+            await backfill.backfill_channel(
+                channel=_Channel(3 * backfill.HISTORY_PAGE_SIZE),
+                settings=settings,
+                db=None,
+                writer=writer,
+                logger=logging.getLogger("test"),
+                last_message_id="",
+            )
+
+        with mock.patch.object(backfill, "ingest_message_from_discord", lambda *, message, settings: _msg(str(message.id))):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(_run())
+        # The page after the failed one is never submitted, so its checkpoint cannot skip the lost messages.
+        self.assertEqual(len(writer.submitted), 2)
+
+    def test_root_and_thread_failures_are_logged_and_do_not_stop_other_threads(self) -> None:
+        writer = _FailingPageWriter(fail_at=0)  # the root channel's only page
+        forbidden = discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "Missing Access")
+        threads = [_Thread(7, 1), _Thread(8, 1, error=RuntimeError("database is locked")), _Thread(9, 1, error=forbidden)]
+        root = _Channel(1)
+        root.guild = SimpleNamespace(active_threads=mock.AsyncMock(return_value=threads))
+        settings = SimpleNamespace(backfill_seed_limit=1000, backfill_archived_thread_limit=0, backfill_concurrency=1)
+        progress = backfill.BackfillProgress()
+
+        async def _run() -> None:
+            await backfill.backfill_root_and_threads(
+                bot=SimpleNamespace(),
+                root_channel=root,
+                settings=settings,
+                db=SimpleNamespace(ingestion_state_all=dict, ingestion_state_get=lambda _channel_id: None),
+                writer=writer,
+                logger=logging.getLogger("test.backfill"),
+                progress=progress,
+            )
+
+        with (
+            mock.patch.object(backfill, "ingest_message_from_discord", lambda *, message, settings: _msg(str(message.id))),
+            mock.patch.object(backfill.discord, "Thread", _Thread),
+            self.assertLogs("test.backfill", level="DEBUG") as logs,
+        ):
+            asyncio.run(_run())
+
+        self.assertEqual(len(writer.submitted), 2)  # the root page, then thread 7's page
+        errors = [r.getMessage() for r in logs.records if r.levelno == logging.ERROR]
+        self.assertEqual(errors, ["Backfill failed for channel_id=42", "Backfill failed for thread_id=8"])
+        self.assertIn("Skipping thread_id=9 (not accessible)", [r.getMessage() for r in logs.records])
+        self.assertEqual(progress.snapshot()["threads_failed"], 2)
@@ -0,0 +1,50 @@
+import unittest
+
+from discord_agent_gateway.models import Post
+from discord_agent_gateway.post_buffer import RecentPostsBuffer
+
+
+def _post(seq: int, *, author_kind: str = "human") -> Post:
+    return Post(
+        seq=seq,
+        post_id=f"p{seq}",
+        author_kind=author_kind,
+        author_id="u1",
+        author_name="Human",
+        body=f"post {seq}",
+        created_at="t",
+        discord_message_id=f"m{seq}",
+        source_channel_id="c1",
+    )
+
+
+class RecentPostsBufferTests(unittest.TestCase):
+    def test_reads_inside_window_and_misses_outside(self) -> None:
+        buf = RecentPostsBuffer(capacity=3)
+        buf.append("c1", after_seq=10, entries=[(_post(s), ()) for s in (11, 12, 13, 14)])
+
+        # Capacity 3 keeps 12..14, so the window answers cursors >= 11.
+        self.assertEqual([p.seq for p, _ in buf.read("c1", cursor=11, limit=10, head_seq=14)], [12, 13, 14])
+        self.assertEqual([p.seq for p, _ in buf.read("c1", cursor=12, limit=1, head_seq=14)], [13])
+        self.assertIsNone(buf.read("c1", cursor=10, limit=10, head_seq=14))
+        # Behind the known head (posts written elsewhere): fall back to SQLite.
+        self.assertIsNone(buf.read("c1", cursor=12, limit=10, head_seq=20))
+
+        stats = buf.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (3, 2, 2))
+        self.assertGreater(stats["approx_bytes"], 0)
+
+    def test_gap_restarts_window_and_update_replaces(self) -> None:
+        buf = RecentPostsBuffer(capacity=10)
+        buf.append("c1", after_seq=0, entries=[(_post(1), ())])
+        buf.append("c1", after_seq=5, entries=[(_post(6), ())])
+        self.assertIsNone(buf.read("c1", cursor=0, limit=10, head_seq=6))
+        self.assertEqual(buf.stats()["resets"], 1)
+
+        buf.update("c1", _post(6, author_kind="agent"))
+        [(post, _)] = buf.read("c1", cursor=5, limit=10, head_seq=6)
+        self.assertEqual(post.author_kind, "agent")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+import httpx
+
+from discord_agent_gateway.discord_api import DiscordAPI
+from discord_agent_gateway.rate_limit import DiscordRateLimiter, discord_route_key
+
+
+def _headers(*, bucket: str, limit: int, remaining: int, reset_after: float) -> dict[str, str]:
+    return {
+        "x-ratelimit-bucket": bucket,
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset-after": str(reset_after),
+    }
+
+
+class DiscordRouteKeyTests(unittest.TestCase):
+    def test_keeps_major_params_and_hides_webhook_token(self):
+        self.assertEqual(
+            discord_route_key("post", "/webhooks/123/secret-token"),
+            "POST /webhooks/123/:token",
+        )
+        self.assertEqual(
+            discord_route_key("GET", "/channels/42/messages/999"),
+            "GET /channels/42/messages/:id",
+        )
+
+
+class DiscordRateLimiterTests(unittest.TestCase):
+    def test_unknown_route_is_not_delayed(self):
+        limiter = DiscordRateLimiter()
+        self.assertEqual(limiter.reserve("GET /channels/1"), 0.0)
+
+    def test_schedules_into_next_window_when_bucket_exhausted(self):
+        limiter = DiscordRateLimiter()
+        route = "POST /webhooks/1/:token"
+        limiter.update(route, status_code=200, headers=_headers(bucket="abc", limit=2, remaining=1, reset_after=2.0))
+
+        self.assertEqual(limiter.reserve(route, global_scope=False), 0.0)
+        delay = limiter.reserve(route, global_scope=False)
+        self.assertGreater(delay, 1.5)
+        self.assertLessEqual(delay, 2.0)
+
+        stats = limiter.stats()["buckets"]["abc:webhooks/1"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["delayed"], 1)
+
+    def test_buckets_are_split_by_major_param(self):
+        limiter = DiscordRateLimiter()
+        a, b = "POST /webhooks/1/:token", "POST /webhooks/2/:token"
+        limiter.update(a, status_code=200, headers=_headers(bucket="abc", limit=1, remaining=0, reset_after=5.0))
+        limiter.update(b, status_code=200, headers=_headers(bucket="abc", limit=1, remaining=1, reset_after=5.0))
+
+        self.assertGreater(limiter.reserve(a, global_scope=False), 4.0)
+        self.assertEqual(limiter.reserve(b, global_scope=False), 0.0)
+
+    def test_global_429_blocks_bot_routes_only(self):
+        limiter = DiscordRateLimiter()
+        limiter.update(
+            "GET /channels/1",
+            status_code=429,
+            headers={"x-ratelimit-global": "true"},
+            retry_after=3.0,
+        )
+        self.assertGreater(limiter.reserve("GET /channels/1"), 2.5)
+        self.assertEqual(limiter.reserve("POST /webhooks/1/:token", global_scope=False), 0.0)
+        self.assertEqual(limiter.stats()["global"]["rate_limited"], 1)
+
+    def test_global_per_second_budget(self):
+        limiter = DiscordRateLimiter(global_per_second=2)
+        self.assertEqual(limiter.reserve("GET /channels/1"), 0.0)
+        self.assertEqual(limiter.reserve("GET /channels/2"), 0.0)
+        self.assertGreater(limiter.reserve("GET /channels/3"), 0.9)
+
+    def test_released_reservations_do_not_leak(self):
+        limiter = DiscordRateLimiter()
+        route = "POST /webhooks/1/:token"
+        limiter.update(route, status_code=200, headers=_headers(bucket="abc", limit=5, remaining=5, reset_after=60.0))
+        for _ in range(5):
+            limiter.reserve(route, global_scope=False)
+            limiter.release(route)
+
+        # No reservations are outstanding, so the server's count is taken as-is.
+        limiter.update(route, status_code=200, headers=_headers(bucket="abc", limit=5, remaining=4, reset_after=60.0))
+        self.assertEqual(limiter.stats()["buckets"]["abc:webhooks/1"]["remaining"], 4)
+        self.assertEqual(limiter.reserve(route, global_scope=False), 0.0)
+
+    def test_failed_request_releases_its_slot(self):
+        def _fail(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("down", request=request)
+
+        limiter = DiscordRateLimiter()
+        route = "GET /channels/1"
+        limiter.update(route, status_code=200, headers=_headers(bucket="abc", limit=5, remaining=5, reset_after=60.0))
+        api = DiscordAPI(bot_token="x", api_base="https://discord.test/api", rate_limiter=limiter)
+        api._http = httpx.Client(transport=httpx.MockTransport(_fail))
+        for _ in range(3):
+            with self.assertRaises(httpx.ConnectError):
+                api.get_channel(channel_id=1)
+
+        # The failed requests may have reached Discord, so the server's count decides;
+        # none of them is still counted as in flight.
+        limiter.update(route, status_code=200, headers=_headers(bucket="abc", limit=5, remaining=2, reset_after=60.0))
+        self.assertEqual(limiter.stats()["buckets"]["abc:channels/1"]["remaining"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from discord_agent_gateway.db import Database
+from discord_agent_gateway.receipts import ReceiptStore
+
+
+def _db(tmp: str) -> tuple[Database, str, str]:
+    db = Database(Path(tmp) / "test.db")
+    db.init_schema()
+    return db, db.agent_create("A", None).agent_id, db.agent_create("B", None).agent_id
+
+
+class ReceiptStoreTests(unittest.TestCase):
+    def test_acks_are_monotonic_and_flushed_in_batch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db, a1, a2 = _db(tmp)
+            db.receipts_advance({a1: 5})
+            store = ReceiptStore(db=db, flush_interval_seconds=60.0)
+
+            self.assertEqual(store.get(a1), 5)
+            self.assertEqual(store.advance(a1, 9), 9)
+            self.assertEqual(store.advance(a1, 7), 9)  # stale ack is ignored
+            self.assertEqual(store.advance(a2, 3), 3)
+
+            # Reads come from memory; nothing is written until a flush.
+            self.assertEqual(store.get(a1), 9)
+            self.assertEqual(db.receipt_get(a1), 5)
+
+            self.assertEqual(store.flush(), 2)
+            self.assertEqual((db.receipt_get(a1), db.receipt_get(a2)), (9, 3))
+            self.assertEqual(store.flush(), 0)
+
+            stats = store.stats()
+            self.assertEqual((stats["acks"], stats["stale_acks"], stats["flushes"], stats["rows_flushed"]), (3, 1, 1, 2))
+            self.assertEqual(stats["dirty"], 0)
+
+    def test_flush_never_moves_stored_cursor_backwards(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db, a1, a2 = _db(tmp)
+            db.receipts_advance({a1: 10})
+            db.receipts_advance({a1: 4, a2: 2})
+            self.assertEqual((db.receipt_get(a1), db.receipt_get(a2)), (10, 2))
+
+    def test_failed_flush_keeps_cursors_dirty(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db, a1, a2 = _db(tmp)
+            store = ReceiptStore(db=db, flush_interval_seconds=60.0)
+            store.advance(a1, 4)
+
+            original = db.receipts_advance
+
+            def _fail(cursors: dict[str, int]) -> None:
+                raise RuntimeError("disk full")
+
+            db.receipts_advance = _fail  # type: ignore[method-assign]
+            with self.assertRaises(RuntimeError):
+                store.flush()
+            db.receipts_advance = original  # type: ignore[method-assign]
+
+            self.assertEqual(store.stats()["dirty"], 1)
+            self.assertEqual(store.flush(), 1)
+            self.assertEqual(db.receipt_get(a1), 4)
+
+    def test_stop_flushes_and_zero_interval_writes_through(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db, a1, a2 = _db(tmp)
+            store = ReceiptStore(db=db, flush_interval_seconds=60.0)
+
+            async def _run() -> None:
+                store.start()
+                store.advance(a1, 6)
+                await store.stop()
+
+            asyncio.run(_run())
+            self.assertEqual(db.receipt_get(a1), 6)
+
+            through = ReceiptStore(db=db, flush_interval_seconds=0)
+            through.advance(a1, 8)
+            self.assertEqual(db.receipt_get(a1), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,15 @@
 import unittest
 
-from discord_agent_gateway.util import credential_path, gateway_slug, split_for_discord
+from fastapi.responses import JSONResponse
+
+from discord_agent_gateway.util import (
+    cdn_url_expires_at,
+    credential_path,
+    gateway_slug,
+    json_dumps_bytes,
+    parse_range_header,
+    split_for_discord,
+)
 
 
 class TestSplitForDiscord(unittest.TestCase):
@@ -11,6 +20,40 @@ class TestSplitForDiscord(unittest.TestCase):
         self.assertEqual("".join(parts), text)
 
 
+class TestCdnUrlExpiresAt(unittest.TestCase):
+    def test_parses_hex_expiry(self) -> None:
+        url = "https://cdn.discordapp.com/attachments/1/2/f.png?ex=6650a1b2&is=664f5032&hm=deadbeef&"
+        self.assertEqual(cdn_url_expires_at(url), 0x6650A1B2)
+
+    def test_unsigned_url(self) -> None:
+        self.assertIsNone(cdn_url_expires_at("https://cdn.discordapp.com/attachments/1/2/f.png"))
+        self.assertIsNone(cdn_url_expires_at("https://cdn.discordapp.com/a.png?ex=zz&hm=x"))
+
+
+class TestParseRangeHeader(unittest.TestCase):
+    def test_ranges(self) -> None:
+        self.assertEqual(parse_range_header("bytes=0-3", 10), (0, 3))
+        self.assertEqual(parse_range_header("bytes=4-", 10), (4, 9))
+        self.assertEqual(parse_range_header("bytes=-3", 10), (7, 9))
+        self.assertEqual(parse_range_header("bytes=5-100", 10), (5, 9))
+
+    def test_ignored_headers(self) -> None:
+        for value in (None, "", "items=0-1", "bytes=0-1,4-5", "bytes=x-", "bytes=5-2"):
+            self.assertIsNone(parse_range_header(value, 10))
+
+    def test_unsatisfiable(self) -> None:
+        with self.assertRaises(ValueError):
+            parse_range_header("bytes=10-", 10)
+        with self.assertRaises(ValueError):
+            parse_range_header("bytes=-0", 10)
+
+
+class TestJsonDumpsBytes(unittest.TestCase):
+    def test_matches_fastapi_encoding(self) -> None:
+        value = {"seq": 1, "body": "héllo ✓", "is_self": False, "attachments": [{"size_bytes": None}]}
+        self.assertEqual(json_dumps_bytes(value), JSONResponse(value).body)
+
+
 class TestGatewaySlug(unittest.TestCase):
     def test_http_with_port(self) -> None:
         self.assertEqual(gateway_slug("http://localhost:8000"), "localhost_8000")
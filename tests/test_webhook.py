@@ -0,0 +1,73 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from discord_agent_gateway.config import Settings
+from discord_agent_gateway.db import Database
+from discord_agent_gateway.rate_limit import DiscordRateLimiter
+from discord_agent_gateway.webhook import AsyncGatewayWebhookManager, WebhookCredentials, webhook_route_key
+
+
+class _FakeDiscord:
+    def __init__(self) -> None:
+        self.rate_limiter = DiscordRateLimiter()
+        self.created = 0
+        self.sent_via: list[str] = []
+
+    async def get_webhook_with_token(self, *, webhook_id: str, webhook_token: str):
+        return {"id": webhook_id, "channel_id": "123"}
+
+    async def create_webhook(self, *, channel_id: int, name: str):
+        self.created += 1
+        return {"id": f"w{self.created}", "token": f"t{self.created}"}
+
+    async def execute_webhook(self, *, webhook_id: str, webhook_token: str, **_kwargs):
+        self.sent_via.append(webhook_id)
+        return {"id": "1"}
+
+
+def _limit(discord: _FakeDiscord, creds: WebhookCredentials, *, remaining: int) -> None:
+    discord.rate_limiter.update(
+        webhook_route_key(creds),
+        status_code=200,
+        headers={
+            "x-ratelimit-bucket": "webhook",
+            "x-ratelimit-limit": "5",
+            "x-ratelimit-remaining": str(remaining),
+            "x-ratelimit-reset-after": "5",
+        },
+    )
+
+
+class AsyncWebhookPoolTests(unittest.TestCase):
+    def test_pool_grows_only_when_every_webhook_is_limited(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(Path(tmp) / "test.db")
+            db.init_schema()
+            settings = Settings(_env_file=None, DISCORD_BOT_TOKEN="x", DISCORD_CHANNEL_ID=123, WEBHOOK_POOL_SIZE=2)
+            discord = _FakeDiscord()
+            manager = AsyncGatewayWebhookManager(settings=settings, db=db, discord=discord, pool_size=2)
+
+            async def run() -> None:
+                await manager.execute(content="a", username=None, avatar_url=None)
+                self.assertEqual(discord.created, 1)
+
+                _limit(discord, WebhookCredentials("w1", "t1"), remaining=0)
+                await manager.execute(content="b", username=None, avatar_url=None)
+                self.assertEqual(discord.created, 2)
+
+                # w2 is free and w1 is still limited: no third webhook, send via w2.
+                _limit(discord, WebhookCredentials("w2", "t2"), remaining=4)
+                await manager.execute(content="c", username=None, avatar_url=None)
+
+            asyncio.run(run())
+
+            self.assertEqual(discord.created, 2)
+            self.assertEqual(discord.sent_via, ["w1", "w2", "w2"])
+            self.assertEqual(db.setting_get("gateway_webhook_id_1"), "w2")
+            self.assertEqual(db.setting_get("gateway_webhook_token_1"), "t2")
+
+
+if __name__ == "__main__":
+    unittest.main()